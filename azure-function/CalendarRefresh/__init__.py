@@ -1,11 +1,12 @@
 import datetime
 import logging
-import requests
-import json
-import os
-from azure.storage.blob import BlobServiceClient
 import azure.functions as func
 
+from shared_code.refresh import refresh_is_due, run_refresh
+from shared_code.refresh_lock import RefreshInProgress, single_flight
+from shared_code.rooms import calendars
+from shared_code.storage import CONTAINER_NAME, ensure_container, get_blob_service_client
+
 def main(mytimer: func.TimerRequest) -> None:
     utc_timestamp = datetime.datetime.utcnow().replace(
         tzinfo=datetime.timezone.utc).isoformat()
@@ -15,123 +16,34 @@ def main(mytimer: func.TimerRequest) -> None:
 
     logging.info(f'Calendar refresh timer trigger function ran at {utc_timestamp}')
 
-    # Calendar URLs from your config.js
-    calendar_urls = [
-        'https://outlook.office365.com/owa/calendar/4207f27aa0d54d318d660537325a3856@virginia.edu/64228c013c3c425ca3ec6682642a970e8523251041637520167/calendar.ics',
-        'https://outlook.office365.com/owa/calendar/cf706332e50c45009e2b3164e0b68ca0@virginia.edu/6960c19164584f9cbb619329600a490a16019380931273154626/calendar.ics',
-        'https://outlook.office365.com/owa/calendar/4cedc3f0284648fcbee80dd7f6563bab@virginia.edu/211f4d478ee94feb8fe74fa4ed82a0b22636302730039956374/calendar.ics',
-        'https://outlook.office365.com/owa/calendar/bfd63ea7933c4c3d965a632e5d6b703d@virginia.edu/05f41146b7274347a5e374b91f0e7eda6953039659626971784/calendar.ics',
-        'https://outlook.office365.com/owa/calendar/52b9b2d41868473fac5d3e9963512a9b@virginia.edu/311e34fd14384759b006ccf185c1db677813060047149602177/calendar.ics',
-        'https://outlook.office365.com/owa/calendar/fa3ecb9b47824ac0a36733c7212ccc97@virginia.edu/d23afabf93da4fa4b49d2be3ce290f7911116129854936607531/calendar.ics',
-        'https://outlook.office365.com/owa/calendar/3f60cb3359dd40f7943b9de3b062b18d@virginia.edu/1e78265cf5eb44da903745ca3d872e6910017444746788834359/calendar.ics',
-        'https://outlook.office365.com/owa/calendar/4df4134c83844cef9d9357180ccfb48c@virginia.edu/e46a84ae5d8842d4b33a842ddc5ff66c11207228220277930183/calendar.ics',
-        'https://www.trumba.com/calendars/staff-ooo.ics'
-    ]
-
-    # Room mapping for better organization
-    room_mapping = {
-        '4207f27aa0d54d318d660537325a3856': 'confa',
-        'cf706332e50c45009e2b3164e0b68ca0': 'greathall',
-        '4cedc3f0284648fcbee80dd7f6563bab': 'seminar',
-        'bfd63ea7933c4c3d965a632e5d6b703d': 'studentlounge206',
-        '52b9b2d41868473fac5d3e9963512a9b': 'pavx-upper',
-        'fa3ecb9b47824ac0a36733c7212ccc97': 'pavx-b1',
-        '3f60cb3359dd40f7943b9de3b2b18d': 'pavx-b2',
-        '4df4134c83844cef9d9357180ccfb48c': 'pavx-exhibit',
-        'staff-ooo': 'staff-ooo'
-    }
-
-    # Initialize Azure Blob Storage
-    storage_connection_string = os.environ.get('AzureWebJobsStorage')
-    if not storage_connection_string:
+    # Storage client is created once per worker and reused
+    blob_service_client = get_blob_service_client()
+    if blob_service_client is None:
         logging.error('AzureWebJobsStorage environment variable not set')
         return
 
-    blob_service_client = BlobServiceClient.from_connection_string(storage_connection_string)
-    container_name = 'calendar-cache'
-    
-    # Ensure container exists
-    try:
-        blob_service_client.create_container(container_name)
-    except Exception as e:
-        logging.info(f'Container already exists or error creating: {e}')
-
-    successful_updates = 0
-    failed_updates = 0
+    container_name = CONTAINER_NAME
+    ensure_container(blob_service_client, container_name)
 
-    # Fetch each calendar
-    for url in calendar_urls:
-        try:
-            # Extract room ID from URL
-            room_id = None
-            for calendar_id, mapped_id in room_mapping.items():
-                if calendar_id in url:
-                    room_id = mapped_id
-                    break
-            
-            if not room_id:
-                # Fallback: use part of URL as ID
-                room_id = url.split('/')[-3][:8]
-
-            logging.info(f'Fetching calendar for room: {room_id}')
-            
-            # Fetch calendar data
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept': 'text/calendar,application/calendar,text/plain,*/*',
-                'Accept-Language': 'en-US,en;q=0.9',
-                'Cache-Control': 'no-cache',
-                'Pragma': 'no-cache'
-            }
-            
-            response = requests.get(url, headers=headers, timeout=30)
-            response.raise_for_status()
-            
-            if response.text:
-                # Store in blob storage
-                blob_name = f'{room_id}.ics'
-                blob_client = blob_service_client.get_blob_client(
-                    container=container_name, 
-                    blob=blob_name
-                )
-                
-                # Upload the calendar data
-                blob_client.upload_blob(
-                    response.text, 
-                    content_type='text/calendar',
-                    overwrite=True,
-                    metadata={'last_updated': utc_timestamp, 'room_id': room_id}
-                )
-                
-                logging.info(f'Successfully updated calendar for room {room_id} ({len(response.text)} bytes)')
-                successful_updates += 1
-            else:
-                logging.warning(f'Empty response for room {room_id}')
-                failed_updates += 1
-                
-        except Exception as e:
-            logging.error(f'Failed to fetch calendar for URL {url}: {str(e)}')
-            failed_updates += 1
-
-    # Store summary metadata
-    summary = {
-        'last_refresh': utc_timestamp,
-        'successful_updates': successful_updates,
-        'failed_updates': failed_updates,
-        'total_calendars': len(calendar_urls)
-    }
-    
+    # Rooms and calendar URLs come from the shared registry (shared_code/rooms.json).
+    # Fetch the rooms that are due concurrently; unchanged rooms are not rewritten
+    # If a manual refresh is already running, share its result instead of fetching everything again
+    to_refresh = calendars()
+    if not refresh_is_due(blob_service_client, container_name, [room_id for room_id, _ in to_refresh],
+                          datetime.datetime.fromisoformat(utc_timestamp)):
+        logging.info('No room is due for a refresh')
+        return
     try:
-        summary_blob = blob_service_client.get_blob_client(
-            container=container_name, 
-            blob='refresh-summary.json'
+        summary, shared = single_flight(
+            blob_service_client,
+            container_name,
+            [room_id for room_id, _ in to_refresh],
+            lambda: run_refresh(blob_service_client, container_name, to_refresh, utc_timestamp, scheduled=True)
         )
-        summary_blob.upload_blob(
-            json.dumps(summary, indent=2), 
-            content_type='application/json',
-            overwrite=True
-        )
-    except Exception as e:
-        logging.error(f'Failed to store summary: {str(e)}')
+    except RefreshInProgress as e:
+        logging.warning(f'Skipping timer refresh: {str(e)}')
+        return
+    if shared:
+        logging.info(f'Timer refresh joined the refresh started at {summary["last_refresh"]}')
 
-    logging.info(f'Calendar refresh completed: {successful_updates} successful, {failed_updates} failed')
\ No newline at end of file
+    logging.info(f'Calendar refresh completed: {summary["updated"]} updated, {summary["unchanged"]} unchanged, {summary["failed"]} failed, {summary["skipped"]} skipped, {summary["deferred"]} not due')
\ No newline at end of file
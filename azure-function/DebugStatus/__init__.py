@@ -2,82 +2,118 @@ import datetime
 import logging
 import json
 import os
-from azure.storage.blob import BlobServiceClient
 import azure.functions as func
 
+from shared_code.circuit_breaker import load_state
+from shared_code.freshness import SUMMARY_BLOB, freshness_report, list_inventory
+from shared_code.metrics import load_metrics, metrics_report
+from shared_code.rooms import room_ids
+from shared_code.storage import CONTAINER_NAME, get_blob_service_client
+
 def main(req: func.HttpRequest) -> func.HttpResponse:
+    # ?probe=1 is a cheap health check: one blob listing, no downloads
+    if req.params.get('probe', '').lower() in ('1', 'true', 'yes'):
+        return probe()
+
     logging.info('Debug status endpoint called')
-    
+
     debug_info = {
         'timestamp': datetime.datetime.utcnow().isoformat(),
         'environment': {},
         'blob_storage': {},
         'timer_info': {}
     }
-    
+
     # Check environment variables
     storage_conn = os.environ.get('AzureWebJobsStorage')
     debug_info['environment']['has_storage_connection'] = storage_conn is not None
     debug_info['environment']['storage_connection_preview'] = storage_conn[:50] + '...' if storage_conn else None
-    
+
     # Check other relevant env vars
     debug_info['environment']['function_app_name'] = os.environ.get('WEBSITE_SITE_NAME', 'unknown')
     debug_info['environment']['functions_version'] = os.environ.get('FUNCTIONS_EXTENSION_VERSION', 'unknown')
-    
+
     # Check blob storage
     if storage_conn:
         try:
-            blob_service_client = BlobServiceClient.from_connection_string(storage_conn)
-            container_name = 'calendar-cache'
-            
-            # Check if container exists
+            blob_service_client = get_blob_service_client()
+            container_client = blob_service_client.get_container_client(CONTAINER_NAME)
+
+            # One listing call returns every blob with its metadata
             try:
-                container_client = blob_service_client.get_container_client(container_name)
-                container_props = container_client.get_container_properties()
+                inventory = list_inventory(container_client)
                 debug_info['blob_storage']['container_exists'] = True
-                debug_info['blob_storage']['container_created'] = container_props.last_modified.isoformat()
-            except Exception as e:
-                debug_info['blob_storage']['container_exists'] = False
-                debug_info['blob_storage']['container_error'] = str(e)
-            
-            # List blobs in container
-            try:
-                blobs = list(blob_service_client.get_container_client(container_name).list_blobs())
-                debug_info['blob_storage']['blob_count'] = len(blobs)
-                debug_info['blob_storage']['blobs'] = []
-                
-                for blob in blobs[:10]:  # Show first 10 blobs
-                    blob_info = {
-                        'name': blob.name,
-                        'size': blob.size,
-                        'last_modified': blob.last_modified.isoformat() if blob.last_modified else None
+                debug_info['blob_storage']['blob_count'] = len(inventory)
+                debug_info['blob_storage']['total_bytes'] = sum(blob['size'] or 0 for blob in inventory.values())
+                debug_info['blob_storage']['blobs'] = [
+                    {
+                        'name': name,
+                        'size': blob['size'],
+                        'last_modified': blob['last_modified'].isoformat() if blob['last_modified'] else None,
+                        'metadata': blob['metadata']
                     }
-                    # Get metadata
-                    try:
-                        blob_client = blob_service_client.get_blob_client(container=container_name, blob=blob.name)
-                        props = blob_client.get_blob_properties()
-                        blob_info['metadata'] = props.metadata
-                    except:
-                        pass
-                    debug_info['blob_storage']['blobs'].append(blob_info)
-                        
+                    for name, blob in sorted(inventory.items())
+                ]
+                debug_info['freshness'] = freshness_report(inventory, room_ids())
             except Exception as e:
+                debug_info['blob_storage']['container_exists'] = False
                 debug_info['blob_storage']['list_error'] = str(e)
-                
+
         except Exception as e:
             debug_info['blob_storage']['connection_error'] = str(e)
-    
-    # Check for refresh summary
-    if storage_conn:
+
+        # Check for refresh summary
         try:
-            blob_client = blob_service_client.get_blob_client(container='calendar-cache', blob='refresh-summary.json')
-            summary_data = blob_client.download_blob().readall().decode('utf-8')
+            blob_client = blob_service_client.get_blob_client(container=CONTAINER_NAME, blob=SUMMARY_BLOB)
+            summary_data = blob_client.download_blob().readall()
             debug_info['timer_info']['last_refresh_summary'] = json.loads(summary_data)
         except Exception as e:
             debug_info['timer_info']['summary_error'] = str(e)
-    
+
+        # Circuit breaker and adaptive schedule state per room
+        try:
+            debug_info['feed_state'], _ = load_state(blob_service_client, CONTAINER_NAME)
+        except Exception as e:
+            debug_info['feed_state'] = {'error': str(e)}
+
+        # Per-room p50/p95 timings over the rolling refresh history
+        try:
+            history, _ = load_metrics(blob_service_client, CONTAINER_NAME)
+            debug_info['refresh_metrics'] = metrics_report(history)
+        except Exception as e:
+            debug_info['refresh_metrics'] = {'error': str(e)}
+
     return func.HttpResponse(
         json.dumps(debug_info, indent=2),
         status_code=200,
         headers={'Content-Type': 'application/json'}
-    )
\ No newline at end of file
+    )
+
+
+def probe() -> func.HttpResponse:
+    """Overall health and stale rooms; 503 when storage is unreachable or the refresh has stopped."""
+    blob_service_client = get_blob_service_client()
+    if blob_service_client is None:
+        return func.HttpResponse(
+            json.dumps({'status': 'down', 'error': 'AzureWebJobsStorage not configured'}),
+            status_code=503,
+            headers={'Content-Type': 'application/json', 'Cache-Control': 'no-store'}
+        )
+
+    try:
+        inventory = list_inventory(blob_service_client.get_container_client(CONTAINER_NAME))
+    except Exception as e:
+        logging.error(f'Health probe could not list blobs: {str(e)}')
+        return func.HttpResponse(
+            json.dumps({'status': 'down', 'error': 'Blob storage unavailable'}),
+            status_code=503,
+            headers={'Content-Type': 'application/json', 'Cache-Control': 'no-store'}
+        )
+
+    report = freshness_report(inventory, room_ids())
+    health = {key: report[key] for key in ('status', 'last_refresh', 'last_refresh_age', 'unhealthy_rooms')}
+    return func.HttpResponse(
+        json.dumps(health),
+        status_code=503 if report['status'] == 'down' else 200,
+        headers={'Content-Type': 'application/json', 'Cache-Control': 'no-store'}
+    )
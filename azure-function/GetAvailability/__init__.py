@@ -0,0 +1,115 @@
+import datetime
+import logging
+import json
+import azure.functions as func
+
+from shared_code.availability import common_free, find_slots, room_availability
+from shared_code.blob_cache import load_event_indexes
+from shared_code.event_query import parse_time_param
+from shared_code.ics_parser import get_timezone
+from shared_code.rooms import parse_room_list
+from shared_code.storage import get_blob_service_client
+
+DEFAULT_SEARCH_DAYS = 7
+DEFAULT_SLOT_LIMIT = 10
+MAX_WINDOW_DAYS = 62
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Free/busy and free-slot search across rooms.
+
+    Query parameters:
+    - rooms: comma-separated room IDs (default: every bookable room in the registry)
+    - start: window start (default now); same formats as GetCalendar
+    - end: window end (default end of the local day, or 7 days when searching for slots)
+    - duration: minutes; when given, free slots at least this long are returned
+    - mode: `any` (default) lists slots per room, `all` lists times when every room is free
+    - hours: local opening hours such as `8-20`; free time outside them is ignored
+    - limit: maximum slots per room (default 10)
+    """
+    logging.info('Availability API request received')
+
+    try:
+        start = parse_time_param(req.params.get('start') or 'now')
+        duration = int(req.params['duration']) * 60 if req.params.get('duration') else None
+        if duration is not None and duration <= 0:
+            raise ValueError('duration must be positive')
+
+        if req.params.get('end'):
+            end = parse_time_param(req.params['end'])
+        elif duration:
+            end = start + DEFAULT_SEARCH_DAYS * 86400
+        else:
+            local_start = datetime.datetime.fromtimestamp(start, get_timezone())
+            end_of_day = datetime.datetime.combine(local_start.date() + datetime.timedelta(days=1), datetime.time(), get_timezone())
+            end = int(end_of_day.timestamp())
+        if end <= start:
+            raise ValueError('end must be after start')
+        if end - start > MAX_WINDOW_DAYS * 86400:
+            raise ValueError(f'window is limited to {MAX_WINDOW_DAYS} days')
+
+        hours = None
+        if req.params.get('hours'):
+            first_hour, last_hour = (int(hour) for hour in req.params['hours'].split('-'))
+            if not 0 <= first_hour < last_hour <= 24:
+                raise ValueError('hours must look like 8-20')
+            hours = (first_hour, last_hour)
+
+        limit = int(req.params.get('limit') or DEFAULT_SLOT_LIMIT)
+        if limit < 1:
+            raise ValueError('limit must be at least 1')
+        mode = req.params.get('mode', 'any')
+        if mode not in ('any', 'all'):
+            raise ValueError('mode must be any or all')
+    except ValueError as e:
+        return error_response(f"Invalid parameters: {str(e)}", 400)
+
+    blob_service_client = get_blob_service_client()
+    if blob_service_client is None:
+        return error_response("Storage not configured", 500)
+
+    room_ids, unknown = parse_room_list(req.params.get('rooms'))
+
+    indexes, errors = load_event_indexes(room_ids, blob_service_client)
+    errors.update({room_id: f"Unknown room: {room_id}" for room_id in unknown})
+
+    rooms = {}
+    for room_id, index in indexes.items():
+        availability = room_availability(index, start, end, hours)
+        if duration and mode == 'any':
+            availability['slots'] = find_slots(availability['free'], duration, limit)
+        rooms[room_id] = availability
+
+    response = {
+        'start': start,
+        'end': end,
+        'hours': list(hours) if hours else None,
+        'duration': duration // 60 if duration else None,
+        'mode': mode,
+        'free_at_start': sorted(room_id for room_id, room in rooms.items() if room['free_at_start']),
+        'free_for_window': sorted(room_id for room_id, room in rooms.items() if room['free_all_window']),
+        'rooms': rooms,
+        'errors': errors
+    }
+    if duration and mode == 'all':
+        response['common_slots'] = find_slots(common_free(rooms.values()), duration, limit) if not errors else []
+
+    return func.HttpResponse(
+        json.dumps(response, separators=(',', ':')),
+        status_code=200,
+        headers={
+            'Content-Type': 'application/json; charset=utf-8',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Methods': 'GET',
+            'Access-Control-Allow-Headers': 'Content-Type',
+            'Cache-Control': 'public, max-age=60'
+        }
+    )
+
+
+def error_response(message: str, status_code: int) -> func.HttpResponse:
+    return func.HttpResponse(
+        json.dumps({"error": message}),
+        status_code=status_code,
+        headers={'Content-Type': 'application/json'}
+    )
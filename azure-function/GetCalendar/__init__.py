@@ -1,10 +1,30 @@
+import hashlib
 import logging
 import json
-import os
-from azure.storage.blob import BlobServiceClient
 import azure.functions as func
 
+from shared_code.blob_cache import blob_cache, entry_json
+from shared_code.circuit_breaker import STATE_BLOB, staleness
+from shared_code.compression import ENCODINGS, choose_encoding, gzip_bytes
+from shared_code.event_query import parse_time_param, query_index
+from shared_code.freshness import REFRESH_PERIOD
+from shared_code.http_cache import derived_hash, http_date, is_not_modified, make_etag, parse_timestamp
+from shared_code.rooms import get_room
+from shared_code.storage import get_blob_service_client
+
+# format -> (blob suffix, response content type, metadata key holding the update time)
+FORMATS = {
+    'ics': ('.ics', 'text/calendar; charset=utf-8', 'last_updated'),
+    'events': ('.events.json', 'application/json; charset=utf-8', 'generated')
+}
+
+# Window-query responses smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 1024
+
 def main(req: func.HttpRequest) -> func.HttpResponse:
+    # Deferred like the storage SDK itself (see shared_code.storage)
+    from azure.core.exceptions import ResourceNotFoundError
+
     logging.info('Calendar API request received')
 
     # Get room ID from query parameter
@@ -16,50 +36,156 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             headers={'Content-Type': 'application/json'}
         )
 
-    # Initialize Azure Blob Storage
-    storage_connection_string = os.environ.get('AzureWebJobsStorage')
-    if not storage_connection_string:
+    # Unknown rooms are rejected without a storage round trip
+    if get_room(room_id) is None:
         return func.HttpResponse(
-            json.dumps({"error": "Storage not configured"}),
-            status_code=500,
+            json.dumps({"error": f"Calendar not found for room: {room_id}"}),
+            status_code=404,
             headers={'Content-Type': 'application/json'}
         )
 
+    # start/end/limit slice the event index to a time window; they imply format=events
+    start_param = req.params.get('start')
+    end_param = req.params.get('end')
+    limit_param = req.params.get('limit')
+    is_window_query = bool(start_param or end_param or limit_param)
+
+    # format=ics (default) returns the raw feed, format=events the pre-parsed event index
+    output_format = req.params.get('format', 'events' if is_window_query else 'ics')
+    if is_window_query and output_format != 'events':
+        return func.HttpResponse(
+            json.dumps({"error": "start/end/limit require format=events"}),
+            status_code=400,
+            headers={'Content-Type': 'application/json'}
+        )
+    if output_format not in FORMATS:
+        return func.HttpResponse(
+            json.dumps({"error": f"Unsupported format: {output_format}"}),
+            status_code=400,
+            headers={'Content-Type': 'application/json'}
+        )
+    blob_suffix, content_type, updated_key = FORMATS[output_format]
+
     try:
-        blob_service_client = BlobServiceClient.from_connection_string(storage_connection_string)
-        container_name = 'calendar-cache'
-        blob_name = f'{room_id}.ics'
-        
-        # Get the cached calendar data
-        blob_client = blob_service_client.get_blob_client(
-            container=container_name, 
-            blob=blob_name
+        start = parse_time_param(start_param) if start_param else None
+        end = parse_time_param(end_param) if end_param else None
+        limit = int(limit_param) if limit_param else None
+        if limit is not None and limit < 1:
+            raise ValueError('limit must be positive')
+    except ValueError as e:
+        return func.HttpResponse(
+            json.dumps({"error": f"Invalid start/end/limit: {str(e)}"}),
+            status_code=400,
+            headers={'Content-Type': 'application/json'}
         )
-        
-        blob_data = blob_client.download_blob()
-        calendar_content = blob_data.readall().decode('utf-8')
-        
-        # Get blob metadata for cache info
-        blob_properties = blob_client.get_blob_properties()
-        last_updated = blob_properties.metadata.get('last_updated', 'unknown')
-        
+
+    # Storage client is created once per worker and reused
+    blob_service_client = get_blob_service_client()
+    if blob_service_client is None:
         return func.HttpResponse(
-            calendar_content,
-            status_code=200,
-            headers={
-                'Content-Type': 'text/calendar; charset=utf-8',
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Cache-Control': 'public, max-age=900',  # Cache for 15 minutes
-                'X-Last-Updated': last_updated
-            }
+            json.dumps({"error": "Storage not configured"}),
+            status_code=500,
+            headers={'Content-Type': 'application/json'}
         )
-        
+
+    blob_name = f'{room_id}{blob_suffix}'
+    encoding = choose_encoding(req.headers.get('Accept-Encoding'))
+
+    try:
+        # Served from the worker's in-memory cache when warm
+        entry = None
+        if encoding and not is_window_query:
+            # Pre-compressed variant written at refresh time
+            try:
+                entry, cache_status = blob_cache.get(f'{blob_name}{ENCODINGS[encoding]}', blob_service_client)
+            except ResourceNotFoundError:
+                encoding = None
+        if entry is None:
+            entry, cache_status = blob_cache.get(blob_name, blob_service_client)
+
+        metadata = entry['metadata']
+        content_hash = metadata.get('content_sha256') or entry_hash(entry)
+        last_updated = metadata.get(updated_key, 'unknown')
+        last_modified = parse_timestamp(last_updated)
+
+        if is_window_query:
+            content_hash = derived_hash(content_hash, start, end, limit)
+
+        headers = {
+            'Content-Type': content_type,
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Methods': 'GET',
+            'Access-Control-Allow-Headers': 'Content-Type, If-None-Match, If-Modified-Since',
+            'Access-Control-Expose-Headers': 'ETag, Last-Modified, X-Last-Updated, X-Cache, Warning, X-Calendar-Stale, X-Calendar-Last-Success, X-Changes-Version',
+            # No longer than one refresh slot; after that the ETag makes revalidation cheap
+            'Cache-Control': f'public, max-age={REFRESH_PERIOD}',
+            'Vary': 'Accept-Encoding',
+            'X-Last-Updated': last_updated,
+            'X-Cache': cache_status
+        }
+        if last_modified is not None:
+            headers['Last-Modified'] = http_date(last_modified)
+        # Version of the room's change log this index reflects (see GetChanges)
+        if metadata.get('changes_version'):
+            headers['X-Changes-Version'] = metadata['changes_version']
+
+        # The feed is failing: this is the last good copy, so say so
+        stale = feed_staleness(room_id, blob_service_client)
+        if stale:
+            headers['Warning'] = '110 - "Response is Stale"'
+            headers['X-Calendar-Stale'] = 'true'
+            if stale['last_success']:
+                headers['X-Calendar-Last-Success'] = stale['last_success']
+
+        # Window results are tagged weak, whichever encoding they are sent in
+        headers['ETag'] = make_etag(content_hash, None if is_window_query else encoding, weak=is_window_query)
+        if is_not_modified(req.headers, headers['ETag'], last_modified):
+            return func.HttpResponse(status_code=304, headers=headers)
+
+        calendar_content = entry['content']
+        if is_window_query:
+            calendar_content = json.dumps(
+                query_index(entry_json(entry), start, end, limit),
+                separators=(',', ':'),
+                ensure_ascii=False
+            ).encode('utf-8')
+            # Window results are small and per-request, so only gzip them on the fly
+            encoding = choose_encoding(req.headers.get('Accept-Encoding'), ['gzip'])
+            if encoding and len(calendar_content) >= MIN_COMPRESS_SIZE:
+                calendar_content = gzip_bytes(calendar_content)
+            else:
+                encoding = None
+
+        if encoding:
+            headers['Content-Encoding'] = encoding
+
+        return func.HttpResponse(calendar_content, status_code=200, headers=headers)
+
     except Exception as e:
         logging.error(f'Error retrieving calendar for room {room_id}: {str(e)}')
         return func.HttpResponse(
             json.dumps({"error": f"Calendar not found for room: {room_id}"}),
             status_code=404,
             headers={'Content-Type': 'application/json'}
-        )
\ No newline at end of file
+        )
+
+
+def feed_staleness(room_id: str, blob_service_client):
+    """Staleness of a room's stored copy from the (cached) feed state, or None if it is current."""
+    from azure.core.exceptions import ResourceNotFoundError
+
+    try:
+        entry, _ = blob_cache.get(STATE_BLOB, blob_service_client)
+        return staleness(entry_json(entry).get(room_id))
+    except ResourceNotFoundError:
+        return None
+    except Exception as e:
+        logging.warning(f'Could not read feed state: {str(e)}')
+        return None
+
+
+def entry_hash(entry: dict) -> str:
+    """Content hash for cache entries from blobs written before content_sha256 was recorded."""
+    if 'sha256' not in entry:
+        entry['sha256'] = hashlib.sha256(entry['content']).hexdigest()
+    return entry['sha256']
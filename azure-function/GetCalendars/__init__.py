@@ -0,0 +1,88 @@
+import datetime
+import logging
+import json
+import azure.functions as func
+
+from shared_code.blob_cache import load_event_indexes
+from shared_code.event_query import parse_time_param, query_index, room_status
+from shared_code.freshness import REFRESH_PERIOD
+from shared_code.rooms import parse_room_list
+from shared_code.storage import get_blob_service_client
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Batch version of GetCalendar for the dashboard.
+
+    Returns every requested room in one response instead of one request per
+    room. The per-room index blobs are read concurrently over a shared client
+    and served from the worker's blob cache when warm.
+
+    Query parameters:
+    - rooms: comma-separated room IDs (default: every bookable room in the registry)
+    - view: `events` (default) for each room's event index, or `summary` for
+      an availability summary (busy now, current and next event)
+    - start / end / limit: time window applied to each room (events view)
+    - at: time the summary is computed for (summary view, default now)
+    """
+    logging.info('Batch calendar API request received')
+
+    view = req.params.get('view', 'events')
+    if view not in ('events', 'summary'):
+        return error_response(f"Unsupported view: {view}", 400)
+
+    try:
+        start = parse_time_param(req.params['start']) if req.params.get('start') else None
+        end = parse_time_param(req.params['end']) if req.params.get('end') else None
+        at = parse_time_param(req.params.get('at') or 'now')
+        limit = int(req.params['limit']) if req.params.get('limit') else None
+        if limit is not None and limit < 1:
+            raise ValueError('limit must be positive')
+    except ValueError as e:
+        return error_response(f"Invalid time parameters: {str(e)}", 400)
+
+    blob_service_client = get_blob_service_client()
+    if blob_service_client is None:
+        return error_response("Storage not configured", 500)
+
+    room_ids, unknown = parse_room_list(req.params.get('rooms'))
+
+    # Index blobs are read concurrently (and from the worker cache when warm)
+    indexes, errors = load_event_indexes(room_ids, blob_service_client)
+    errors.update({room_id: f"Unknown room: {room_id}" for room_id in unknown})
+
+    rooms = {}
+    for room_id, index in indexes.items():
+        if view == 'summary':
+            rooms[room_id] = room_status(index, at)
+            rooms[room_id]['generated'] = index['generated']
+        else:
+            rooms[room_id] = query_index(index, start, end, limit)
+
+    response = {
+        'generated': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'view': view,
+        'rooms': rooms,
+        'errors': errors
+    }
+    if view == 'summary':
+        response['at'] = at
+
+    return func.HttpResponse(
+        json.dumps(response, separators=(',', ':'), ensure_ascii=False),
+        status_code=200,
+        headers={
+            'Content-Type': 'application/json; charset=utf-8',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Methods': 'GET',
+            'Access-Control-Allow-Headers': 'Content-Type',
+            'Cache-Control': 'public, max-age=60' if view == 'summary' else f'public, max-age={REFRESH_PERIOD}'
+        }
+    )
+
+
+def error_response(message: str, status_code: int) -> func.HttpResponse:
+    return func.HttpResponse(
+        json.dumps({"error": message}),
+        status_code=status_code,
+        headers={'Content-Type': 'application/json'}
+    )
@@ -0,0 +1,75 @@
+import logging
+import json
+import azure.functions as func
+
+from shared_code.blob_cache import blob_cache, entry_json
+from shared_code.change_log import change_log_blob, changes_since
+from shared_code.rooms import get_room
+from shared_code.storage import get_blob_service_client
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Event changes for one room since a change log version.
+
+    Query parameters:
+    - room: room ID
+    - since: last version the client has seen (default 0). The version a
+      cached index reflects is in GetCalendar's X-Changes-Version header.
+    - limit: maximum number of change entries to return
+
+    When the log no longer reaches back to `since`, `reset` is true and the
+    client should reload the room with GetCalendar?format=events.
+    """
+    from azure.core.exceptions import ResourceNotFoundError
+
+    logging.info('Change feed request received')
+
+    room_id = req.params.get('room')
+    if not room_id:
+        return error_response("Missing 'room' parameter", 400)
+    if get_room(room_id) is None:
+        return error_response(f"Calendar not found for room: {room_id}", 404)
+
+    try:
+        since = int(req.params.get('since') or 0)
+        limit = int(req.params['limit']) if req.params.get('limit') else None
+        if since < 0 or (limit is not None and limit < 1):
+            raise ValueError('since must be non-negative and limit positive')
+    except ValueError as e:
+        return error_response(f"Invalid since/limit: {str(e)}", 400)
+
+    blob_service_client = get_blob_service_client()
+    if blob_service_client is None:
+        return error_response("Storage not configured", 500)
+
+    try:
+        entry, cache_status = blob_cache.get(change_log_blob(room_id), blob_service_client)
+        log = entry_json(entry)
+    except ResourceNotFoundError:
+        # No changes recorded yet
+        log, cache_status = {'room_id': room_id, 'version': 0, 'entries': []}, 'MISS'
+    except Exception as e:
+        logging.error(f'Error retrieving change log for room {room_id}: {str(e)}')
+        return error_response(f"Change log unavailable for room: {room_id}", 500)
+
+    return func.HttpResponse(
+        json.dumps(changes_since(log, since, limit), separators=(',', ':'), ensure_ascii=False),
+        status_code=200,
+        headers={
+            'Content-Type': 'application/json; charset=utf-8',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Methods': 'GET',
+            'Access-Control-Expose-Headers': 'X-Changes-Version, X-Cache',
+            'Cache-Control': 'no-cache',
+            'X-Changes-Version': str(log['version']),
+            'X-Cache': cache_status
+        }
+    )
+
+
+def error_response(message: str, status_code: int) -> func.HttpResponse:
+    return func.HttpResponse(
+        json.dumps({"error": message}),
+        status_code=status_code,
+        headers={'Content-Type': 'application/json'}
+    )
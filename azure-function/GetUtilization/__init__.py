@@ -0,0 +1,119 @@
+import datetime
+import logging
+import json
+import azure.functions as func
+
+from shared_code.blob_cache import blob_cache, entry_json
+from shared_code.ics_parser import get_timezone
+from shared_code.rooms import parse_room_list
+from shared_code.storage import get_blob_service_client
+from shared_code.utilization import PERIODS, UTILIZATION_BLOB, add_aggregate, describe, empty_aggregate
+
+DEFAULT_PERIOD = 30
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Precomputed room utilization for the analytics dashboard.
+
+    Query parameters:
+    - rooms: comma-separated room IDs (default: every bookable room)
+    - period: days of history to summarize, one of PERIODS (default 30)
+    - daily: 1 to include each room's booked hours and occupancy per day
+      over the period and the bookings ahead
+
+    Every room gets occupancy, booked hours per weekday, an hourly profile
+    and a weekday x hour heatmap (see shared_code.utilization.describe);
+    `all` is the same over the requested rooms together. Rooms without
+    data yet are listed in `missing`.
+    """
+    from azure.core.exceptions import ResourceNotFoundError
+
+    logging.info('Utilization request received')
+
+    room_ids, unknown = parse_room_list(req.params.get('rooms'))
+    if unknown:
+        return error_response(f"Unknown rooms: {', '.join(unknown)}", 404)
+
+    try:
+        period = int(req.params.get('period') or DEFAULT_PERIOD)
+        if period not in PERIODS:
+            raise ValueError(f"period must be one of {', '.join(str(p) for p in PERIODS)}")
+    except ValueError as e:
+        return error_response(f"Invalid period: {str(e)}", 400)
+    daily = req.params.get('daily', '').lower() in ('1', 'true', 'yes')
+
+    blob_service_client = get_blob_service_client()
+    if blob_service_client is None:
+        return error_response("Storage not configured", 500)
+
+    try:
+        entry, cache_status = blob_cache.get(UTILIZATION_BLOB, blob_service_client)
+        utilization = entry_json(entry)
+    except ResourceNotFoundError:
+        # Nothing refreshed since aggregates were introduced
+        utilization, cache_status = {'generated': None, 'rooms': {}}, 'MISS'
+    except Exception as e:
+        logging.error(f'Error retrieving utilization: {str(e)}')
+        return error_response("Utilization unavailable", 500)
+
+    open_hours = utilization.get('open_hours')
+    first_day = (datetime.datetime.now(get_timezone()).date() - datetime.timedelta(days=period)).isoformat()
+    total = empty_aggregate()
+    rooms = {}
+    for room_id in room_ids:
+        stored = utilization['rooms'].get(room_id)
+        if stored is None:
+            continue
+        aggregate = stored['periods'][str(period)]
+        add_aggregate(total, aggregate)
+        room = describe(aggregate, open_hours)
+        room.update(updated=stored['updated'], first_day=stored['first_day'])
+        if daily:
+            room['daily'] = daily_series(stored['daily'], first_day, open_hours)
+        rooms[room_id] = room
+
+    response = {
+        'generated': utilization['generated'],
+        'timezone': utilization.get('timezone'),
+        'open_hours': open_hours,
+        'period': period,
+        'rooms': rooms,
+        'all': describe(total, open_hours) if rooms else None,
+        'missing': [room_id for room_id in room_ids if room_id not in rooms]
+    }
+
+    return func.HttpResponse(
+        json.dumps(response, separators=(',', ':')),
+        status_code=200,
+        headers={
+            'Content-Type': 'application/json; charset=utf-8',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Methods': 'GET',
+            'Access-Control-Allow-Headers': 'Content-Type',
+            'Access-Control-Expose-Headers': 'X-Cache',
+            'Cache-Control': 'public, max-age=300',
+            'X-Cache': cache_status
+        }
+    )
+
+
+def daily_series(stored: dict, first_day: str, open_hours) -> dict:
+    """Booked hours and open-hours occupancy per day from `first_day` on."""
+    if not stored['start']:
+        return {'start': None, 'booked_hours': [], 'occupancy': []}
+    start = datetime.date.fromisoformat(stored['start'])
+    skip = max(0, (datetime.date.fromisoformat(first_day) - start).days)
+    open_minutes = (open_hours[1] - open_hours[0]) * 60
+    return {
+        'start': (start + datetime.timedelta(days=skip)).isoformat(),
+        'booked_hours': [round(minutes / 60, 2) if minutes is not None else None for minutes in stored['minutes'][skip:]],
+        'occupancy': [round(minutes / open_minutes, 3) if minutes is not None else None for minutes in stored['open_minutes'][skip:]]
+    }
+
+
+def error_response(message: str, status_code: int) -> func.HttpResponse:
+    return func.HttpResponse(
+        json.dumps({"error": message}),
+        status_code=status_code,
+        headers={'Content-Type': 'application/json'}
+    )
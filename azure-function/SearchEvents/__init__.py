@@ -0,0 +1,94 @@
+import logging
+import json
+import azure.functions as func
+
+from shared_code.blob_cache import blob_cache, entry_json
+from shared_code.event_query import parse_time_param
+from shared_code.rooms import get_room, parse_room_list
+from shared_code.search_index import SEARCH_INDEX_BLOB, search
+from shared_code.storage import get_blob_service_client
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 200
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Find events by keyword across every room.
+
+    Query parameters:
+    - q: words to look for in the title, location or organizer; every
+      word must match, as a word prefix ("fac sem" finds "Faculty Seminar")
+    - rooms: comma-separated room IDs (default: every bookable room)
+    - start / end: time window, same formats as GetCalendar (default: from now on)
+    - limit: maximum number of occurrences returned (default 20)
+
+    Answered from search-index.json (see shared_code.search_index); the
+    room calendars are not read.
+    """
+    from azure.core.exceptions import ResourceNotFoundError
+
+    logging.info('Event search request received')
+
+    query = req.params.get('q', '').strip()
+    if not query:
+        return error_response("Missing 'q' parameter", 400)
+
+    room_ids, unknown = parse_room_list(req.params.get('rooms'))
+    if unknown:
+        return error_response(f"Unknown rooms: {', '.join(unknown)}", 404)
+
+    try:
+        start = parse_time_param(req.params.get('start') or 'now')
+        end = parse_time_param(req.params['end']) if req.params.get('end') else None
+        limit = min(int(req.params.get('limit') or DEFAULT_LIMIT), MAX_LIMIT)
+        if (end is not None and end <= start) or limit < 1:
+            raise ValueError('end must be after start and limit positive')
+    except ValueError as e:
+        return error_response(f"Invalid start/end/limit: {str(e)}", 400)
+
+    blob_service_client = get_blob_service_client()
+    if blob_service_client is None:
+        return error_response("Storage not configured", 500)
+
+    try:
+        entry, cache_status = blob_cache.get(SEARCH_INDEX_BLOB, blob_service_client)
+        search_index = entry_json(entry)
+    except ResourceNotFoundError:
+        # Nothing refreshed since the search index was introduced
+        search_index, cache_status = {'generated': None, 'rooms': {}}, 'MISS'
+    except Exception as e:
+        logging.error(f'Error retrieving search index: {str(e)}')
+        return error_response("Search index unavailable", 500)
+
+    try:
+        result = search(search_index, query, room_ids, start, end, limit)
+    except ValueError as e:
+        return error_response(f"Invalid query: {str(e)}", 400)
+
+    for occurrence in result['results']:
+        occurrence['room_name'] = get_room(occurrence['room_id'])['name']
+    result['query'] = query
+    result['generated'] = search_index['generated']
+    result['missing'] = [room_id for room_id in room_ids if room_id not in search_index['rooms']]
+
+    return func.HttpResponse(
+        json.dumps(result, separators=(',', ':'), ensure_ascii=False),
+        status_code=200,
+        headers={
+            'Content-Type': 'application/json; charset=utf-8',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Methods': 'GET',
+            'Access-Control-Allow-Headers': 'Content-Type',
+            'Access-Control-Expose-Headers': 'X-Cache',
+            'Cache-Control': 'public, max-age=60',
+            'X-Cache': cache_status
+        }
+    )
+
+
+def error_response(message: str, status_code: int) -> func.HttpResponse:
+    return func.HttpResponse(
+        json.dumps({"error": message}),
+        status_code=status_code,
+        headers={'Content-Type': 'application/json'}
+    )
@@ -1,9 +1,10 @@
 import datetime
 import logging
-import requests
 import azure.functions as func
 
 def main(req: func.HttpRequest) -> func.HttpResponse:
+    import requests
+
     logging.info('Test function executed.')
     
     # Test fetching one of the calendar URLs
@@ -20,8 +21,8 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
         
         result = {
             'status_code': response.status_code,
-            'content_length': len(response.text) if response.text else 0,
-            'content_preview': response.text[:200] if response.text else 'No content',
+            'content_length': len(response.content),
+            'content_preview': response.content[:200].decode('utf-8', errors='replace') if response.content else 'No content',
             'headers': dict(response.headers),
             'url': response.url
         }
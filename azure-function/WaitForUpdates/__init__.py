@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import json
+import azure.functions as func
+
+from shared_code.notify import MAX_WAIT, POLL_INTERVAL, updates_since, watcher
+from shared_code.rooms import parse_room_list
+from shared_code.storage import CONTAINER_NAME, get_blob_service_client
+
+# EventSource reconnects this many milliseconds after each response
+SSE_RETRY_MS = 1000
+
+async def main(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Wait until one of the requested rooms has new data.
+
+    Query parameters:
+    - rooms: comma-separated room IDs (default: every bookable room)
+    - since: the `version` from the previous response. Without it the
+      current version of every room is returned straight away.
+    - timeout: seconds to wait at most (default and maximum NOTIFY_MAX_WAIT)
+
+    Returns as soon as a room changes, or with no rooms when the wait
+    times out; either way the client asks again with the returned version.
+    With `Accept: text/event-stream` the answer is a single Server-Sent
+    Event, so an EventSource keeps reconnecting with Last-Event-ID and
+    behaves like a subscription.
+
+    The function is async, so a waiting request holds no worker thread.
+    """
+    room_ids, unknown = parse_room_list(req.params.get('rooms'))
+    if unknown:
+        return error_response(f"Unknown rooms: {', '.join(unknown)}", 404)
+
+    stream = 'text/event-stream' in req.headers.get('Accept', '')
+    try:
+        since_param = req.params.get('since') or req.headers.get('Last-Event-ID')
+        since = int(since_param) if since_param else None
+        timeout = min(float(req.params.get('timeout') or MAX_WAIT), MAX_WAIT)
+        if (since is not None and since < 0) or timeout < 0:
+            raise ValueError('since and timeout must not be negative')
+    except ValueError as e:
+        return error_response(f"Invalid since/timeout: {str(e)}", 400)
+
+    blob_service_client = get_blob_service_client()
+    if blob_service_client is None:
+        return error_response("Storage not configured", 500)
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    try:
+        while True:
+            # The storage check runs off the event loop; waiting clients share it
+            versions = await loop.run_in_executor(None, watcher.current, blob_service_client, CONTAINER_NAME)
+            result = updates_since(versions, room_ids, since)
+            remaining = deadline - loop.time()
+            if since is None or result['rooms'] or result['reset'] or remaining <= 0:
+                break
+            await asyncio.sleep(min(POLL_INTERVAL, remaining))
+    except Exception as e:
+        logging.error(f'Error waiting for room updates: {str(e)}')
+        return error_response("Room versions unavailable", 503)
+
+    result['timeout'] = since is not None and not result['rooms'] and not result['reset']
+    headers = {
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': 'GET',
+        'Access-Control-Allow-Headers': 'Last-Event-ID',
+        'Cache-Control': 'no-store'
+    }
+
+    if stream:
+        headers['Content-Type'] = 'text/event-stream; charset=utf-8'
+        lines = [f'retry: {SSE_RETRY_MS}', f'id: {result["version"]}']
+        if result['timeout']:
+            # No event, but the id still moves the client's Last-Event-ID forward
+            lines.append(': no updates')
+        else:
+            lines += ['event: update', f'data: {json.dumps(result, separators=(",", ":"))}']
+        return func.HttpResponse('\n'.join(lines) + '\n\n', status_code=200, headers=headers)
+
+    headers['Content-Type'] = 'application/json'
+    return func.HttpResponse(json.dumps(result), status_code=200, headers=headers)
+
+
+def error_response(message: str, status_code: int) -> func.HttpResponse:
+    return func.HttpResponse(
+        json.dumps({"error": message}),
+        status_code=status_code,
+        headers={'Content-Type': 'application/json'}
+    )
@@ -0,0 +1,12 @@
+"""
+Helpers shared by the calendar functions.
+
+Azure Functions puts the function app root on sys.path, so each function
+imports these as `from shared_code import ...`.
+
+The worker imports every function module at startup, so nothing here
+imports azure-storage-blob, azure-core or requests at module level: they
+are imported inside the functions that talk to storage or the feeds.
+Clients, registries and role tables are created on first use and kept
+for the life of the worker. benchmarks/cold_start.py checks both.
+"""
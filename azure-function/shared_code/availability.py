@@ -0,0 +1,140 @@
+"""
+Room availability engine.
+
+Turns a room's event index into a merged, sorted list of busy intervals and
+answers free/busy and "find N free minutes" questions with interval
+arithmetic, so the browser no longer has to parse every room's ICS.
+
+All times are UTC epoch seconds and every interval is half-open [start, end).
+"""
+
+import datetime
+
+from shared_code.event_query import window_rows
+from shared_code.ics_parser import get_timezone
+
+
+def merge_intervals(intervals) -> list:
+    """Merge overlapping or touching intervals into a sorted, disjoint list."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def busy_intervals(index: dict, start: int, end: int) -> list:
+    """Merged busy time of one room inside [start, end). Events marked FREE do not count."""
+    status_field = index['series_fields'].index('status')
+    return merge_intervals(
+        (max(row_start, start), min(row_end, end))
+        for row_start, row_end, series_id in window_rows(index, start, end)
+        if index['series'][series_id][status_field] != 'FREE' and row_end > row_start
+    )
+
+
+def free_intervals(busy: list, start: int, end: int) -> list:
+    """Complement of a merged busy list within [start, end)."""
+    free = []
+    cursor = start
+    for busy_start, busy_end in busy:
+        if busy_start > cursor:
+            free.append([cursor, min(busy_start, end)])
+        cursor = max(cursor, busy_end)
+        if cursor >= end:
+            break
+    if cursor < end:
+        free.append([cursor, end])
+    return free
+
+
+def intersect_intervals(a: list, b: list) -> list:
+    """Intersection of two sorted, disjoint interval lists (two-pointer sweep)."""
+    result = []
+    i = j = 0
+    while i < len(a) and j < len(b):
+        start = max(a[i][0], b[j][0])
+        end = min(a[i][1], b[j][1])
+        if start < end:
+            result.append([start, end])
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+def opening_hours(start: int, end: int, first_hour: int, last_hour: int) -> list:
+    """Local-time daily windows [first_hour, last_hour) that fall within [start, end)."""
+    zone = get_timezone()
+    day = datetime.datetime.fromtimestamp(start, zone).date()
+    last_day = datetime.datetime.fromtimestamp(end, zone).date()
+    windows = []
+    while day <= last_day:
+        opens = datetime.datetime(day.year, day.month, day.day, first_hour, tzinfo=zone)
+        if last_hour >= 24:
+            closes = datetime.datetime(day.year, day.month, day.day, tzinfo=zone) + datetime.timedelta(days=1)
+        else:
+            closes = datetime.datetime(day.year, day.month, day.day, last_hour, tzinfo=zone)
+        window_start = max(int(opens.timestamp()), start)
+        window_end = min(int(closes.timestamp()), end)
+        if window_start < window_end:
+            windows.append([window_start, window_end])
+        day += datetime.timedelta(days=1)
+    return windows
+
+
+def find_slots(free: list, duration: int, limit: int = None) -> list:
+    """Free intervals at least `duration` seconds long, earliest first."""
+    slots = [interval for interval in free if interval[1] - interval[0] >= duration]
+    return slots if limit is None else slots[:limit]
+
+
+def room_availability(index: dict, start: int, end: int, hours=None) -> dict:
+    """
+    Free/busy picture of one room for [start, end).
+
+    `hours` is an optional (first_hour, last_hour) pair that limits free time
+    to local opening hours; `free_all_window` then means free for all of the
+    opening hours within the window. Times outside the index's window are
+    reported as `unknown` rather than free.
+    """
+    known_start = max(start, index['window'][0])
+    known_end = min(end, index['window'][1])
+    if known_start >= known_end:
+        return {'busy': [], 'free': [], 'unknown': [[start, end]], 'free_at_start': None, 'free_all_window': None}
+
+    busy = busy_intervals(index, known_start, known_end)
+    free = free_intervals(busy, known_start, known_end)
+    available = [[start, end]]
+    if hours:
+        available = opening_hours(start, end, *hours)
+        free = intersect_intervals(free, available)
+
+    unknown = []
+    if start < known_start:
+        unknown.append([start, known_start])
+    if known_end < end:
+        unknown.append([known_end, end])
+
+    return {
+        'busy': busy,
+        'free': free,
+        'unknown': unknown,
+        'free_at_start': bool(free) and free[0][0] <= start < free[0][1],
+        'free_all_window': not unknown and bool(available) and free == available
+    }
+
+
+def common_free(availabilities) -> list:
+    """Time when every room in `availabilities` is free."""
+    availabilities = list(availabilities)
+    if not availabilities:
+        return []
+    free = availabilities[0]['free']
+    for availability in availabilities[1:]:
+        free = intersect_intervals(free, availability['free'])
+    return free
@@ -0,0 +1,156 @@
+"""
+In-process LRU cache of calendar blobs for warm function workers.
+
+Entries are keyed by blob name and validated by the blob's ETag. An entry
+is served from memory until shortly after the next refresh slot
+(or CACHE_MAX_TTL, whichever comes first); after that the next request
+revalidates it with a conditional download, which costs one small 304
+round trip when nothing changed.
+
+Settings:
+- CACHE_MAX_ENTRIES: blobs kept per worker (default 64)
+- CACHE_MAX_TTL: longest time an entry is served without revalidation, in seconds (default 300)
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from shared_code.freshness import REFRESH_PERIOD
+from shared_code.storage import CONTAINER_NAME, get_blob_service_client
+
+MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '64'))
+MAX_TTL = float(os.environ.get('CACHE_MAX_TTL', '300'))
+MAX_READ_WORKERS = 10
+
+# Allow this long after each refresh slot for the run to finish
+REFRESH_GRACE = 90
+
+
+def expiry_time(now: float) -> float:
+    """When an entry loaded at `now` should be revalidated."""
+    next_refresh = (now // REFRESH_PERIOD + 1) * REFRESH_PERIOD + REFRESH_GRACE
+    if next_refresh - REFRESH_PERIOD > now:
+        # Still inside the grace period of the refresh that just started
+        next_refresh -= REFRESH_PERIOD
+    return min(now + MAX_TTL, next_refresh)
+
+
+class BlobCache:
+    """Thread-safe LRU of {blob_name: entry} with ETag revalidation."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, blob_name: str, blob_service_client=None):
+        """
+        Return (entry, cache_status) for a blob.
+
+        `entry` holds `content` (bytes), `etag`, `last_modified` and `metadata`;
+        `cache_status` is HIT, REVALIDATED or MISS. Raises ResourceNotFoundError
+        if the blob does not exist.
+        """
+        from azure.core import MatchConditions
+        from azure.core.exceptions import ResourceNotFoundError, ResourceNotModifiedError
+
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(blob_name)
+            if entry is not None:
+                self._entries.move_to_end(blob_name)
+                if entry['expires'] > now:
+                    return entry, 'HIT'
+
+        blob_service_client = blob_service_client or get_blob_service_client()
+        blob_client = blob_service_client.get_blob_client(container=CONTAINER_NAME, blob=blob_name)
+
+        try:
+            if entry is not None:
+                downloader = blob_client.download_blob(
+                    etag=entry['etag'],
+                    match_condition=MatchConditions.IfModified
+                )
+            else:
+                downloader = blob_client.download_blob()
+        except ResourceNotModifiedError:
+            entry['expires'] = expiry_time(now)
+            return entry, 'REVALIDATED'
+        except ResourceNotFoundError:
+            self.invalidate(blob_name)
+            raise
+
+        properties = downloader.properties
+        entry = {
+            'content': downloader.readall(),
+            'etag': properties.etag,
+            'last_modified': properties.last_modified,
+            'metadata': properties.metadata or {},
+            'expires': expiry_time(now)
+        }
+
+        with self._lock:
+            self._entries[blob_name] = entry
+            self._entries.move_to_end(blob_name)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return entry, 'MISS'
+
+    def invalidate(self, blob_name: str = None):
+        """Drop one entry, or everything."""
+        with self._lock:
+            if blob_name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(blob_name, None)
+
+
+blob_cache = BlobCache()
+
+
+def entry_json(entry: dict):
+    """Decode a cached JSON blob once and keep the result on the entry."""
+    if 'json' not in entry:
+        entry['json'] = json.loads(entry['content'])
+    return entry['json']
+
+
+def get_event_index(room_id: str, blob_service_client=None):
+    """Return (decoded event index, cache_status) for a room."""
+    entry, status = blob_cache.get(f'{room_id}.events.json', blob_service_client)
+    return entry_json(entry), status
+
+
+def load_event_indexes(room_ids, blob_service_client=None):
+    """
+    Load several rooms' event indexes concurrently.
+
+    Returns ({room_id: index}, {room_id: error message}); a room that cannot
+    be read does not fail the others.
+    """
+    room_ids = list(room_ids)
+    blob_service_client = blob_service_client or get_blob_service_client()
+
+    def load(room_id):
+        try:
+            return room_id, get_event_index(room_id, blob_service_client)[0], None
+        except Exception as e:
+            logging.error(f'Error retrieving events for room {room_id}: {str(e)}')
+            return room_id, None, f"Calendar not found for room: {room_id}"
+
+    indexes = {}
+    errors = {}
+    if room_ids:
+        with ThreadPoolExecutor(max_workers=min(MAX_READ_WORKERS, len(room_ids))) as executor:
+            for room_id, index, error in executor.map(load, room_ids):
+                if error:
+                    errors[room_id] = error
+                else:
+                    indexes[room_id] = index
+    return indexes, errors
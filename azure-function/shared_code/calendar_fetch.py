@@ -0,0 +1,220 @@
+"""
+Concurrent calendar fetch engine used by CalendarRefresh and ManualRefresh.
+
+All rooms are downloaded at the same time over one shared keep-alive
+session, so a refresh takes about as long as the slowest feed instead of
+the sum of all of them.
+
+Feeds stay bytes end to end: the body is read in chunks into one buffer, so
+callers can hash, compare and upload it without decoding it to text and
+encoding it again. With `parse`, the same chunks are fed to
+the streaming ICS reader as they arrive, so the event index is ready when
+the download finishes instead of being built afterwards.
+
+Settings (app settings / environment variables):
+- CALENDAR_FETCH_CONCURRENCY: max simultaneous downloads (default 8)
+- CALENDAR_FETCH_DEADLINE: seconds allowed per room, end to end (default 30)
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from shared_code.ics_parser import build_event_index
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/calendar,application/calendar,text/plain,*/*',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Cache-Control': 'no-cache',
+    'Pragma': 'no-cache'
+}
+
+MAX_WORKERS = int(os.environ.get('CALENDAR_FETCH_CONCURRENCY', '8'))
+ROOM_DEADLINE = float(os.environ.get('CALENDAR_FETCH_DEADLINE', '30'))
+CONNECT_TIMEOUT = 10
+CHUNK_SIZE = 64 * 1024
+
+# Outlook stamps every event with the time the feed was generated, not when it changed
+_VOLATILE_LINES = re.compile(rb'^DTSTAMP[:;][^\n]*\n?', re.MULTILINE)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Return the process-wide keep-alive session, creating it on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            # Imported here so workers that never refresh don't pay for it at startup
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers.update(DEFAULT_HEADERS)
+            _session = session
+        return _session
+
+
+def content_hash(content: bytes) -> str:
+    """
+    SHA-256 of a feed with its DTSTAMP lines left out, so two downloads of
+    an unchanged calendar hash the same.
+    """
+    return hashlib.sha256(_VOLATILE_LINES.sub(b'', content)).hexdigest()
+
+
+def fetch_calendar(room_id: str, url: str, validators: dict = None, deadline: float = None, parse: bool = False) -> dict:
+    """
+    Download one calendar feed, giving up once `deadline` seconds have passed.
+
+    `validators` may hold the `etag` / `last_modified` seen on the previous
+    fetch; they are sent as If-None-Match / If-Modified-Since and a 304 comes
+    back with `not_modified` set and no content.
+
+    `content` is the UTF-8 body as bytes (feeds declaring another charset are
+    transcoded), with its content_hash() in `sha256`. `timings` splits
+    `elapsed` into `connect` (DNS, connect, TLS and time to the response
+    headers) and `download` (reading the body); `bytes` is the size received
+    on the wire.
+
+    With `parse`, the body is parsed into the room's event index while it
+    downloads and returned as `index`; `timings` then also has `parse`, the
+    time spent parsing rather than waiting for data. `index` is None if the
+    feed could not be parsed or had to be transcoded; the caller can parse
+    `content` itself.
+
+    Never raises; the returned dict has `ok` set and either `content` or `error`.
+    """
+    deadline = deadline or ROOM_DEADLINE
+    validators = validators or {}
+    result = {
+        'room_id': room_id,
+        'url': url,
+        'ok': False,
+        'not_modified': False,
+        'content': None,
+        'sha256': None,
+        'etag': None,
+        'last_modified': None,
+        'error': None,
+        'bytes': 0,
+        'index': None,
+        'timings': {}
+    }
+    started = time.monotonic()
+
+    headers = {}
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+
+    try:
+        response = get_session().get(url, headers=headers, timeout=(CONNECT_TIMEOUT, deadline), stream=True)
+        headers_received = time.monotonic()
+        result['timings']['connect'] = round(headers_received - started, 3)
+        with response:
+            if response.status_code == 304:
+                result['ok'] = True
+                result['not_modified'] = True
+                result['etag'] = validators.get('etag')
+                result['last_modified'] = validators.get('last_modified')
+                result['elapsed'] = round(time.monotonic() - started, 3)
+                return result
+
+            response.raise_for_status()
+            result['etag'] = response.headers.get('ETag')
+            result['last_modified'] = response.headers.get('Last-Modified')
+
+            content = bytearray()
+            waiting = {'seconds': 0.0, 'error': None}
+
+            def body():
+                chunks = response.iter_content(CHUNK_SIZE)
+                while True:
+                    wait_started = time.monotonic()
+                    try:
+                        chunk = next(chunks, None)
+                        if time.monotonic() - started > deadline:
+                            raise TimeoutError(f'exceeded {deadline:.0f}s deadline')
+                    except Exception as e:
+                        waiting['error'] = e
+                        raise
+                    finally:
+                        waiting['seconds'] += time.monotonic() - wait_started
+                    if chunk is None:
+                        return
+                    content.extend(chunk)
+                    result['bytes'] += len(chunk)
+                    yield chunk
+
+            chunks = body()
+            if parse:
+                try:
+                    result['index'] = build_event_index(chunks, room_id)
+                except Exception as e:
+                    if waiting['error'] is not None:
+                        raise waiting['error']
+                    logging.warning(f'Could not parse feed for room {room_id} while downloading: {e}')
+            # Read whatever the parser did not
+            for _ in chunks:
+                pass
+
+            # ICS is UTF-8 by spec; only re-encode feeds that explicitly declare something else
+            # (requests' ISO-8859-1 default for text/* without a charset is ignored)
+            charset = response.encoding if 'charset' in response.headers.get('Content-Type', '') else None
+            if charset and charset.lower().replace('_', '-') not in ('utf-8', 'utf8', 'us-ascii', 'ascii'):
+                content = bytes(content).decode(charset, errors='replace').encode('utf-8')
+                # It was parsed as UTF-8 on the way in
+                result['index'] = None
+            result['timings']['download'] = round(waiting['seconds'], 3)
+            if parse:
+                result['timings']['parse'] = round(time.monotonic() - headers_received - waiting['seconds'], 3)
+
+        if content:
+            result['ok'] = True
+            result['content'] = bytes(content)
+            result['sha256'] = content_hash(result['content'])
+        else:
+            result['error'] = 'Empty response'
+    except Exception as e:
+        result['error'] = str(e)
+
+    result['elapsed'] = round(time.monotonic() - started, 3)
+    return result
+
+
+def fetch_all(calendars, max_workers: int = None, deadline: float = None, parse: bool = False):
+    """
+    Fetch (room_id, url) pairs or (room_id, url, validators) triples concurrently.
+
+    A fourth element overrides `deadline` for that room (the circuit
+    breaker retries failing feeds with a shorter one). With `parse`, each
+    feed is also parsed into its event index as it downloads.
+
+    Yields each result dict as soon as its download finishes, so callers can
+    store a room while the slower ones are still in flight.
+    """
+    calendars = list(calendars)
+    if not calendars:
+        return
+
+    workers = max(1, min(max_workers or MAX_WORKERS, len(calendars)))
+    logging.info(f'Fetching {len(calendars)} calendars with {workers} workers')
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(fetch_calendar, *calendar[:3], deadline=calendar[3] if len(calendar) > 3 else deadline, parse=parse)
+            for calendar in calendars
+        ]
+        for future in as_completed(futures):
+            yield future.result()
@@ -0,0 +1,138 @@
+"""
+Per-room event change log.
+
+When a room's feed changes, the refresh diffs the new event index against
+the previous one and appends the difference to `{room_id}.changes.json`:
+
+    {
+      "room_id": "confa",
+      "version": 42,
+      "entries": [
+        {"version": 42, "time": "...", "added": [event, ...],
+         "modified": [event, ...], "removed": [event, ...]}
+      ]
+    }
+
+Events are the flat dicts of ics_parser.iter_index_events. An occurrence is
+identified by its UID and start time. It counts as modified when its end,
+SEQUENCE or any other series field changed. A moved single meeting shows
+up as removed at the old start and added at the new one.
+
+Only the part of the calendar covered by both indexes' windows is
+compared. Occurrences that enter or leave the rolling window as it moves
+are not reported as changes.
+
+Versions only ever increase. Entries are never rewritten; the oldest are
+dropped once there are more than CHANGE_LOG_MAX_ENTRIES. A client whose
+version is older than the log reaches gets `reset: true` and should
+reload the full index.
+
+Settings:
+- CHANGE_LOG_MAX_ENTRIES: change entries kept per room (default 500)
+"""
+
+import logging
+import os
+
+from shared_code.ics_parser import iter_index_events
+from shared_code.storage import load_json_blob, update_json_blob
+
+MAX_ENTRIES = int(os.environ.get('CHANGE_LOG_MAX_ENTRIES', '500'))
+
+
+def change_log_blob(room_id: str) -> str:
+    return f'{room_id}.changes.json'
+
+
+def _occurrences(index: dict, fields: list, start: int, end: int) -> dict:
+    """{(uid, start): event} for the index's events starting in [start, end)."""
+    occurrences = {}
+    for event in iter_index_events(index):
+        if start <= event['start'] < end:
+            # Events without a UID fall back to their title to tell them apart
+            key = (event.get('uid') or event.get('summary', ''), event['start'])
+            occurrences[key] = {field: event.get(field) for field in fields + ['start', 'end']}
+    return occurrences
+
+
+def diff_indexes(old: dict, new: dict) -> dict:
+    """Return {added, modified, removed} lists of events between two indexes of one room."""
+    start = max(old['window'][0], new['window'][0])
+    end = min(old['window'][1], new['window'][1])
+    # Compare only the fields both indexes have, so adding a field is not a change to every event
+    fields = [field for field in new['series_fields'] if field in old['series_fields']]
+
+    before = _occurrences(old, fields, start, end)
+    after = _occurrences(new, fields, start, end)
+
+    return {
+        'added': [after[key] for key in sorted(after.keys() - before.keys(), key=lambda key: key[1])],
+        'modified': [after[key] for key in sorted(after.keys() & before.keys(), key=lambda key: key[1]) if after[key] != before[key]],
+        'removed': [before[key] for key in sorted(before.keys() - after.keys(), key=lambda key: key[1])]
+    }
+
+
+def empty_change_log(room_id: str) -> dict:
+    return {'room_id': room_id, 'version': 0, 'entries': []}
+
+
+def load_change_log(blob_service_client, container_name: str, room_id: str):
+    """Return (log, etag); an empty log at version 0 if the room has none yet."""
+    return load_json_blob(blob_service_client, container_name, change_log_blob(room_id), lambda: empty_change_log(room_id))
+
+
+def record_changes(blob_service_client, container_name: str, room_id: str, old_index: dict, new_index: dict, timestamp: str):
+    """
+    Append the difference between two indexes to the room's change log.
+
+    Returns (version, number of changed events). Nothing is written when
+    nothing changed. Never raises; on failure the version is None.
+    """
+    changes = diff_indexes(old_index, new_index)
+    count = sum(len(events) for events in changes.values())
+
+    def append_entry(log: dict):
+        if not count:
+            return False
+        version = log['version'] + 1
+        log['version'] = version
+        log['entries'] = (log['entries'] + [dict(version=version, time=timestamp, **changes)])[-MAX_ENTRIES:]
+
+    try:
+        log = update_json_blob(blob_service_client, container_name, change_log_blob(room_id), append_entry,
+                               lambda: empty_change_log(room_id),
+                               metadata=lambda log: {'room_id': room_id, 'version': str(log['version'])})
+    except Exception as e:
+        logging.error(f'Failed to record changes for room {room_id}: {str(e)}')
+        return None, count
+    return log['version'], count
+
+
+def changes_since(log: dict, since: int, limit: int = None) -> dict:
+    """
+    The entries after version `since`.
+
+    `reset` is true when the log no longer reaches back to `since` (or
+    `since` is ahead of it); the client should then reload the full index
+    and continue from `version`. With `limit`, at most that many entries are
+    returned and `more` says whether the client should ask again.
+    """
+    version = log['version']
+    entries = log['entries']
+    oldest = entries[0]['version'] if entries else version + 1
+    reset = since > version or since < oldest - 1
+
+    selected = [] if reset else [entry for entry in entries if entry['version'] > since]
+    more = limit is not None and len(selected) > limit
+    if more:
+        selected = selected[:limit]
+
+    return {
+        'room_id': log['room_id'],
+        'since': since,
+        'version': selected[-1]['version'] if more else version,
+        'latest_version': version,
+        'reset': reset,
+        'more': more,
+        'changes': selected
+    }
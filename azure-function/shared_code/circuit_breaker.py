@@ -0,0 +1,137 @@
+"""
+Per-feed circuit breaker with exponential backoff.
+
+Failure state for every room lives in one small state blob,
+`feed-state.json`:
+
+    {room_id: {"failures": 3, "last_success": ..., "last_failure": ...,
+               "last_error": ..., "next_attempt": ...}}
+
+After FEED_FAILURE_THRESHOLD consecutive failures a room's breaker opens
+and the refresh skips it until `next_attempt`. The wait doubles with each
+further failure, from FEED_BACKOFF_BASE_MINUTES up to
+FEED_BACKOFF_MAX_MINUTES. Once the wait is over the room is tried again
+(half-open) with a short deadline, so a feed that is still down costs
+seconds rather than the full CALENDAR_FETCH_DEADLINE. A success closes
+the breaker.
+
+GetCalendar reads the same blob to flag responses whose room has not
+refreshed successfully as stale.
+"""
+
+import datetime
+import json
+import logging
+import os
+
+from shared_code.freshness import REFRESH_PERIOD, STALE_AFTER, parse_time
+from shared_code.storage import content_settings
+
+STATE_BLOB = 'feed-state.json'
+
+FAILURE_THRESHOLD = int(os.environ.get('FEED_FAILURE_THRESHOLD', '2'))
+BACKOFF_BASE = float(os.environ.get('FEED_BACKOFF_BASE_MINUTES', '15')) * 60
+BACKOFF_MAX = float(os.environ.get('FEED_BACKOFF_MAX_MINUTES', '240')) * 60
+HALF_OPEN_DEADLINE = float(os.environ.get('FEED_HALF_OPEN_DEADLINE', '10'))
+
+
+def load_state(blob_service_client, container_name: str):
+    """Return (state, etag); an empty state if the blob does not exist yet."""
+    from azure.core.exceptions import ResourceNotFoundError
+
+    blob_client = blob_service_client.get_blob_client(container=container_name, blob=STATE_BLOB)
+    try:
+        downloader = blob_client.download_blob()
+    except ResourceNotFoundError:
+        return {}, None
+    except Exception as e:
+        logging.warning(f'Could not read feed state, treating every feed as healthy: {e}')
+        return {}, None
+    return json.loads(downloader.readall()), downloader.properties.etag
+
+
+def save_state(blob_service_client, container_name: str, state: dict, etag: str = None):
+    """
+    Write the state blob, conditional on the ETag it was read with.
+
+    If another refresh wrote it in the meantime the write is dropped; that
+    run's state is at least as recent. Never raises.
+    """
+    from azure.core import MatchConditions
+    from azure.core.exceptions import ResourceExistsError, ResourceModifiedError
+
+    blob_client = blob_service_client.get_blob_client(container=container_name, blob=STATE_BLOB)
+    data = json.dumps(state, indent=2, sort_keys=True).encode('utf-8')
+    settings = content_settings('application/json')
+    try:
+        if etag:
+            blob_client.upload_blob(data, overwrite=True, content_settings=settings,
+                                    etag=etag, match_condition=MatchConditions.IfNotModified)
+        else:
+            blob_client.upload_blob(data, overwrite=False, content_settings=settings)
+    except (ResourceModifiedError, ResourceExistsError):
+        logging.warning('Feed state changed during the refresh; keeping the other run\'s state')
+    except Exception as e:
+        logging.error(f'Failed to store feed state: {str(e)}')
+
+
+def backoff(failures: int) -> float:
+    """Seconds to wait before retrying a feed with this many consecutive failures."""
+    if failures < FAILURE_THRESHOLD:
+        return 0
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (failures - FAILURE_THRESHOLD))
+
+
+def check(room_state: dict, now: datetime.datetime):
+    """
+    Decide whether to fetch a room now.
+
+    Returns ('closed' | 'half-open', deadline or None) when the room should
+    be fetched, or ('open', None) while it is backing off.
+    """
+    if not room_state or room_state.get('failures', 0) < FAILURE_THRESHOLD:
+        return 'closed', None
+    next_attempt = parse_time(room_state.get('next_attempt'))
+    if next_attempt is not None and now < next_attempt:
+        return 'open', None
+    return 'half-open', HALF_OPEN_DEADLINE
+
+
+def record_success(room_state: dict, now: datetime.datetime) -> dict:
+    if room_state.get('failures'):
+        logging.info(f'Feed recovered after {room_state["failures"]} failed attempts')
+    room_state = {key: value for key, value in room_state.items() if key not in ('last_error', 'next_attempt')}
+    room_state.update(failures=0, last_success=now.isoformat())
+    return room_state
+
+
+def record_failure(room_state: dict, error: str, now: datetime.datetime) -> dict:
+    failures = room_state.get('failures', 0) + 1
+    room_state = dict(room_state, failures=failures, last_failure=now.isoformat(), last_error=error)
+    wait = backoff(failures)
+    if wait:
+        room_state['next_attempt'] = (now + datetime.timedelta(seconds=wait)).isoformat()
+    else:
+        room_state.pop('next_attempt', None)
+    return room_state
+
+
+def staleness(room_state: dict, now: datetime.datetime = None) -> dict:
+    """
+    None if the room's last refresh succeeded recently; otherwise
+    {last_success, failures, age} describing how stale its stored copy is.
+    """
+    if not room_state:
+        return None
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    last_success = parse_time(room_state.get('last_success'))
+    age = (now - last_success).total_seconds() if last_success else None
+    # Rooms the scheduler checks less often are allowed to be that much older
+    allowed_age = STALE_AFTER + max(0, room_state.get('interval', REFRESH_PERIOD) - REFRESH_PERIOD)
+    if not room_state.get('failures') and age is not None and age <= allowed_age:
+        return None
+    return {
+        'last_success': room_state.get('last_success'),
+        'failures': room_state.get('failures', 0),
+        'age': round(age) if age is not None else None
+    }
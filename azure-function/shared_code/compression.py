@@ -0,0 +1,66 @@
+"""
+Pre-compressed blob variants and Accept-Encoding negotiation.
+
+At refresh time every served blob is also stored gzip- and (if the Brotli
+package is installed) brotli-compressed as `{blob}.gz` / `{blob}.br`, so
+GetCalendar never compresses on the request path for whole-calendar
+responses.
+"""
+
+import gzip
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip is always available
+    brotli = None
+
+# Content-Encoding -> blob name suffix, in server preference order
+ENCODINGS = {'br': '.br', 'gzip': '.gz'}
+
+# Encodings this worker writes (and so expects to find) at refresh time
+AVAILABLE_ENCODINGS = [encoding for encoding in ENCODINGS if encoding != 'br' or brotli is not None]
+
+
+def compress_variants(data: bytes) -> dict:
+    """Return {content_encoding: compressed bytes} for every available encoding."""
+    variants = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(data, quality=11)
+    return variants
+
+
+def gzip_bytes(data: bytes) -> bytes:
+    """Fast gzip for small responses built per request."""
+    return gzip.compress(data, compresslevel=5, mtime=0)
+
+
+def accepted_encodings(accept_encoding: str) -> set:
+    """Parse an Accept-Encoding header into the set of codings with q > 0."""
+    accepted = set()
+    for part in (accept_encoding or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(coding)
+    if '*' in accepted:
+        accepted.update(ENCODINGS)
+    return accepted
+
+
+def choose_encoding(accept_encoding: str, available=AVAILABLE_ENCODINGS) -> str:
+    """Pick the preferred encoding the client accepts, or None for identity."""
+    accepted = accepted_encodings(accept_encoding)
+    for encoding in available:
+        if encoding in accepted:
+            return encoding
+    return None
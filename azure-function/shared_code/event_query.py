@@ -0,0 +1,118 @@
+"""
+Time-window queries over a room's event index.
+
+Index rows are sorted by start time, so a window is located with two binary
+searches instead of a scan. An event overlaps [start, end) when it starts
+before `end` and finishes after `start`; since no event is longer than the
+index's `max_duration`, only rows starting at or after
+`start - max_duration` can qualify.
+"""
+
+import bisect
+import datetime
+
+from shared_code.ics_parser import get_timezone, iter_index_events
+
+
+def parse_time_param(value: str) -> int:
+    """
+    Parse a query-string time into UTC epoch seconds.
+
+    Accepts epoch seconds, `now`, an ISO date (`2025-01-15`, local midnight)
+    or an ISO datetime. Times without an offset are taken as Charlottesville
+    local time. Raises ValueError for anything else.
+    """
+    value = value.strip()
+    if value == 'now':
+        return int(datetime.datetime.now(datetime.timezone.utc).timestamp())
+    if value.lstrip('-').isdigit():
+        return int(value)
+
+    parsed = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=get_timezone())
+    return int(parsed.timestamp())
+
+
+def max_duration(index: dict) -> int:
+    """Longest event in the index, in seconds (older indexes do not store it)."""
+    if 'max_duration' not in index:
+        index['max_duration'] = max((end - start for start, end, _ in index['events']), default=0)
+    return index['max_duration']
+
+
+def window_rows(index: dict, start: int = None, end: int = None, limit: int = None) -> list:
+    """Return the index rows overlapping [start, end), in start order."""
+    rows = index['events']
+    starts = index.get('_starts')
+    if starts is None:
+        starts = index['_starts'] = [row[0] for row in rows]
+
+    lo = 0 if start is None else bisect.bisect_left(starts, start - max_duration(index))
+    hi = len(rows) if end is None else bisect.bisect_left(starts, end)
+
+    selected = []
+    for row in rows[lo:hi]:
+        if start is not None and row[1] <= start and row[0] < start:
+            # Started inside the max_duration look-back but ended before the window
+            continue
+        selected.append(row)
+        if limit is not None and len(selected) >= limit:
+            break
+    return selected
+
+
+def query_index(index: dict, start: int = None, end: int = None, limit: int = None) -> dict:
+    """
+    Slice an event index to a time window.
+
+    The result has the same layout as the stored index, with `series`
+    trimmed and renumbered to the rows returned, plus a `query` block.
+    """
+    rows = window_rows(index, start, end, None if limit is None else limit + 1)
+    truncated = limit is not None and len(rows) > limit
+    if truncated:
+        rows = rows[:limit]
+
+    series_ids = {}
+    events = []
+    for row_start, row_end, series_id in rows:
+        if series_id not in series_ids:
+            series_ids[series_id] = len(series_ids)
+        events.append([row_start, row_end, series_ids[series_id]])
+
+    return {
+        'version': index['version'],
+        'room_id': index['room_id'],
+        'generated': index['generated'],
+        'window': index['window'],
+        'query': {'start': start, 'end': end, 'limit': limit, 'truncated': truncated},
+        'series_fields': index['series_fields'],
+        'series': [index['series'][series_id] for series_id in series_ids],
+        'events': events
+    }
+
+
+def room_status(index: dict, at: int) -> dict:
+    """
+    Summarize a room at time `at`: whether it is busy, the event(s) in
+    progress and the next one to start. Events marked FREE are ignored.
+    """
+    status_field = index['series_fields'].index('status')
+    current = [
+        row for row in window_rows(index, at, at + 1)
+        if index['series'][row[2]][status_field] != 'FREE'
+    ]
+
+    upcoming = None
+    for row in window_rows(index, at + 1):
+        if row[0] > at and index['series'][row[2]][status_field] != 'FREE':
+            upcoming = row
+            break
+
+    return {
+        'busy': bool(current),
+        'busy_until': max((row[1] for row in current), default=None),
+        'current': list(iter_index_events(index, current)),
+        'next': next(iter_index_events(index, [upcoming]), None) if upcoming else None
+    }
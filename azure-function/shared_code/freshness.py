@@ -0,0 +1,114 @@
+"""
+Per-room freshness from a single metadata-including blob listing.
+
+The refresh stores `last_refresh` and `failed_rooms` in the metadata of
+refresh-summary.json, so one `list_blobs(include=['metadata'])` call is
+enough to tell, for every room, when its calendar was last confirmed
+current and whether that is longer ago than the timer allows.
+
+A room counts as checked at the last refresh unless that refresh failed
+for it; then only its `last_updated` (the last content change) is known.
+Rooms the scheduler deferred count as checked: they are within their
+refresh interval.
+
+Settings:
+- STALE_AFTER_MINUTES: age after which a room is reported stale (default 35)
+"""
+
+import datetime
+import os
+
+# Matches the CalendarRefresh timer in CalendarRefresh/function.json; each run
+# only fetches the rooms that are due (see shared_code.scheduler)
+REFRESH_PERIOD = 5 * 60
+STALE_AFTER = float(os.environ.get('STALE_AFTER_MINUTES', '35')) * 60
+
+SUMMARY_BLOB = 'refresh-summary.json'
+
+
+def parse_time(value):
+    """Parse an ISO timestamp from blob metadata; None if missing or invalid."""
+    try:
+        parsed = datetime.datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=datetime.timezone.utc)
+
+
+def list_inventory(container_client) -> dict:
+    """{blob_name: {size, last_modified, metadata}} from one listing call."""
+    return {
+        blob.name: {'size': blob.size, 'last_modified': blob.last_modified, 'metadata': blob.metadata or {}}
+        for blob in container_client.list_blobs(include=['metadata'])
+    }
+
+
+def last_refresh(inventory: dict):
+    """(time of the last refresh run, set of rooms it failed for) from the summary blob's listing entry."""
+    summary = inventory.get(SUMMARY_BLOB)
+    if summary is None:
+        return None, set()
+    metadata = summary['metadata']
+    refreshed = parse_time(metadata.get('last_refresh')) or summary['last_modified']
+    failed = {room_id for room_id in metadata.get('failed_rooms', '').split(',') if room_id}
+    return refreshed, failed
+
+
+def room_freshness(room_id: str, inventory: dict, now: datetime.datetime = None, refresh=None) -> dict:
+    """
+    Freshness of one room: `status` is fresh, stale or missing; `age` is
+    seconds since the room was last confirmed current.
+    """
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    refreshed, failed = refresh if refresh is not None else last_refresh(inventory)
+    ics = inventory.get(f'{room_id}.ics')
+    if ics is None:
+        return {'status': 'missing', 'age': None, 'last_updated': None, 'last_checked': None, 'last_refresh_failed': room_id in failed}
+
+    last_updated = parse_time(ics['metadata'].get('last_updated')) or ics['last_modified']
+    if refreshed is not None and room_id not in failed and refreshed >= last_updated:
+        last_checked = refreshed
+    else:
+        last_checked = last_updated
+
+    age = (now - last_checked).total_seconds() if last_checked else None
+    return {
+        'status': 'fresh' if age is not None and age <= STALE_AFTER else 'stale',
+        'age': round(age) if age is not None else None,
+        'last_updated': last_updated.isoformat() if last_updated else None,
+        'last_checked': last_checked.isoformat() if last_checked else None,
+        'last_refresh_failed': room_id in failed
+    }
+
+
+def freshness_report(inventory: dict, room_ids, now: datetime.datetime = None) -> dict:
+    """
+    Overall health plus per-room freshness.
+
+    `status` is `ok` when every room is fresh, `degraded` when some are
+    stale or missing, and `down` when the refresh itself has not run
+    within STALE_AFTER.
+    """
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    refresh = last_refresh(inventory)
+    rooms = {room_id: room_freshness(room_id, inventory, now, refresh) for room_id in room_ids}
+
+    refreshed = refresh[0]
+    refresh_age = (now - refreshed).total_seconds() if refreshed else None
+    unhealthy = sorted(room_id for room_id, room in rooms.items() if room['status'] != 'fresh')
+    if refresh_age is None or refresh_age > STALE_AFTER:
+        status = 'down'
+    elif unhealthy:
+        status = 'degraded'
+    else:
+        status = 'ok'
+
+    return {
+        'status': status,
+        'last_refresh': refreshed.isoformat() if refreshed else None,
+        'last_refresh_age': round(refresh_age) if refresh_age is not None else None,
+        'refresh_period': REFRESH_PERIOD,
+        'stale_after': round(STALE_AFTER),
+        'unhealthy_rooms': unhealthy,
+        'rooms': rooms
+    }
@@ -0,0 +1,88 @@
+"""
+HTTP validator helpers: strong ETags from content hashes, If-None-Match /
+If-Modified-Since evaluation and HTTP-date formatting.
+"""
+
+import datetime
+import hashlib
+from email.utils import format_datetime, parsedate_to_datetime
+
+
+def make_etag(content_hash: str, encoding: str = None, weak: bool = False) -> str:
+    """
+    ETag for one representation. Stored blobs get strong tags, one per
+    Content-Encoding; responses built per request are tagged weak.
+    """
+    tag = content_hash[:32]
+    if encoding:
+        tag += f'-{encoding}'
+    return f'W/"{tag}"' if weak else f'"{tag}"'
+
+
+def derived_hash(*parts) -> str:
+    """Hash for a response computed from other content (e.g. a window query over an index)."""
+    return hashlib.sha256('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+def opaque_tag(etag: str) -> str:
+    """An ETag without its weak prefix, for weak comparison."""
+    return etag[2:] if etag.startswith('W/') else etag
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    True if any tag in If-None-Match is `etag`, the ETag of the
+    representation about to be sent (see make_etag).
+
+    Uses the weak comparison RFC 9110 requires for If-None-Match. Tags of
+    the same content in another Content-Encoding (`"hash-gzip"` against
+    `"hash"`) name a different representation and do not match.
+    """
+    if not if_none_match:
+        return False
+    tag = opaque_tag(etag)
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*' or opaque_tag(candidate) == tag:
+            return True
+    return False
+
+
+def parse_timestamp(value: str):
+    """Parse an ISO timestamp from blob metadata into an aware datetime, or None."""
+    try:
+        parsed = datetime.datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed
+
+
+def http_date(moment: datetime.datetime) -> str:
+    """Format an aware datetime as an HTTP-date."""
+    return format_datetime(moment.astimezone(datetime.timezone.utc), usegmt=True)
+
+
+def is_not_modified(headers, etag: str, last_modified: datetime.datetime = None) -> bool:
+    """
+    Evaluate conditional request headers against the ETag and modification
+    time of the representation about to be sent.
+
+    If-None-Match wins when present; If-Modified-Since is only consulted
+    without it, as RFC 9110 requires.
+    """
+    if_none_match = headers.get('If-None-Match')
+    if if_none_match:
+        return etag_matches(if_none_match, etag)
+
+    if_modified_since = headers.get('If-Modified-Since')
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=datetime.timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+    return False
@@ -0,0 +1,440 @@
+"""
+Server-side ICS parser.
+
+Parses a room feed once per refresh, expands RRULE recurrences over a
+rolling window with python-dateutil and produces a compact, start-sorted
+event index. Clients read the index from `GetCalendar?format=events`
+instead of downloading and parsing the raw ICS in the browser.
+
+Index layout (`{room_id}.events.json`):
+
+    {
+      "version": 1,
+      "room_id": "confa",
+      "generated": "2025-01-15T10:15:00+00:00",
+      "window": [1729000000, 1768000000],
+      "series_fields": ["summary", "location", "organizer", "uid", "all_day", "status", "sequence"],
+      "series": [["Faculty Affairs", "FBS-SeminarRoom-L039", "", "0400...", 0, "BUSY", 0], ...],
+      "max_duration": 7200,
+      "events": [[1736935200, 1736942400, 0], ...]
+    }
+
+Each event row is `[start, end, series]`: UTC epoch seconds plus an index
+into `series`, so a weekly meeting stores its title and UID once no matter
+how many occurrences it has. Rows are sorted by `start`; `max_duration`
+(seconds) lets shared_code.event_query binary-search a time window.
+
+The reader is streaming: iter_byte_lines decodes a body chunk by chunk,
+unfold_lines and iter_raw_events yield one logical line and one VEVENT at
+a time, and single (non-recurring) events are expanded as they arrive.
+Only recurring events and their overrides are held until the end, so a
+feed can be parsed while it downloads (see shared_code.calendar_fetch)
+without a decoded copy of the document in memory.
+
+Streaming saves memory, not work: the whole feed is always read. Nothing
+guarantees that a feed lists events in DTSTART order, and an override can
+come long after its series, so parsing never stops at the window end. The
+window only decides which occurrences are kept.
+
+Settings:
+- EVENT_INDEX_PAST_DAYS: days of history kept in the index (default 90)
+- EVENT_INDEX_FUTURE_DAYS: days of future occurrences expanded (default 365)
+"""
+
+import codecs
+import datetime
+import io
+import json
+import logging
+import os
+
+from dateutil import rrule, tz
+
+INDEX_VERSION = 1
+SERIES_FIELDS = ['summary', 'location', 'organizer', 'uid', 'all_day', 'status', 'sequence']
+
+PAST_DAYS = int(os.environ.get('EVENT_INDEX_PAST_DAYS', '90'))
+FUTURE_DAYS = int(os.environ.get('EVENT_INDEX_FUTURE_DAYS', '365'))
+
+# All Batten rooms are in Charlottesville; floating times and all-day events use this zone
+DEFAULT_TIMEZONE = 'America/New_York'
+
+# Outlook writes Windows zone names in TZID
+WINDOWS_TIMEZONES = {
+    'Eastern Standard Time': 'America/New_York',
+    'Central Standard Time': 'America/Chicago',
+    'Mountain Standard Time': 'America/Denver',
+    'Pacific Standard Time': 'America/Los_Angeles',
+    'GMT Standard Time': 'Europe/London',
+    'Greenwich Standard Time': 'UTC',
+    'UTC': 'UTC'
+}
+
+_tz_cache = {}
+
+
+def get_timezone(tzid: str = None):
+    """Resolve a TZID (IANA or Windows name) to a tzinfo, falling back to DEFAULT_TIMEZONE."""
+    tzid = tzid or DEFAULT_TIMEZONE
+    if tzid not in _tz_cache:
+        zone = tz.gettz(WINDOWS_TIMEZONES.get(tzid, tzid))
+        if zone is None:
+            logging.warning(f'Unknown TZID {tzid!r}, using {DEFAULT_TIMEZONE}')
+            zone = tz.gettz(DEFAULT_TIMEZONE)
+        _tz_cache[tzid] = zone
+    return _tz_cache[tzid]
+
+
+def unescape_text(value: str) -> str:
+    """Undo RFC 5545 TEXT escaping."""
+    return (value.replace('\\n', '\n').replace('\\N', '\n')
+            .replace('\\,', ',').replace('\\;', ';').replace('\\\\', '\\'))
+
+
+def iter_byte_lines(chunks, encoding: str = 'utf-8'):
+    """
+    Decode an iterable of byte chunks into lines as the chunks arrive.
+
+    Only the current partial line is buffered, so `chunks` can be an HTTP
+    body or a blob download that is still in progress. Lines may keep a
+    trailing '\r'; unfold_lines strips it.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    pending = ''
+    for chunk in chunks:
+        lines = (pending + decoder.decode(chunk)).split('\n')
+        pending = lines.pop()
+        yield from lines
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+def unfold_lines(lines):
+    """Join RFC 5545 folded continuation lines, yielding one logical line at a time."""
+    current = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t'):
+            if current is not None:
+                current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current:
+        yield current
+
+
+def parse_property(line: str):
+    """Split `NAME;PARAM=X:value` into (name, {param: value}, value)."""
+    colon = line.find(':')
+    # Quoted parameter values may contain ':'
+    if '"' in line[:colon]:
+        in_quotes = False
+        for i, char in enumerate(line):
+            if char == '"':
+                in_quotes = not in_quotes
+            elif char == ':' and not in_quotes:
+                colon = i
+                break
+    if colon == -1:
+        return None, {}, ''
+
+    head, value = line[:colon], line[colon + 1:]
+    parts = head.split(';')
+    params = {}
+    for part in parts[1:]:
+        key, _, param_value = part.partition('=')
+        params[key.upper()] = param_value.strip('"')
+    return parts[0].upper(), params, value
+
+
+def iter_raw_events(lines):
+    """
+    Yield each VEVENT as {NAME: (params, value)}.
+
+    Properties that may repeat (EXDATE, RDATE) are kept as lists.
+    """
+    event = None
+    depth = 0
+    for line in unfold_lines(lines):
+        if line == 'BEGIN:VEVENT':
+            event = {}
+            depth = 0
+        elif line == 'END:VEVENT':
+            if event is not None:
+                yield event
+            event = None
+        elif event is not None:
+            # Skip nested components such as VALARM
+            if line.startswith('BEGIN:'):
+                depth += 1
+                continue
+            if line.startswith('END:'):
+                depth -= 1
+                continue
+            if depth:
+                continue
+
+            name, params, value = parse_property(line)
+            if not name:
+                continue
+            if name in ('EXDATE', 'RDATE'):
+                event.setdefault(name, []).append((params, value))
+            elif name not in event:
+                event[name] = (params, value)
+
+
+def parse_datetime(params: dict, value: str):
+    """
+    Parse a DATE or DATE-TIME value into an aware datetime.
+
+    Returns (datetime, all_day).
+    """
+    value = value.strip()
+    if params.get('VALUE') == 'DATE' or len(value) == 8:
+        day = datetime.datetime.strptime(value[:8], '%Y%m%d')
+        return day.replace(tzinfo=get_timezone()), True
+
+    if value.endswith('Z'):
+        parsed = datetime.datetime.strptime(value[:15], '%Y%m%dT%H%M%S')
+        return parsed.replace(tzinfo=datetime.timezone.utc), False
+
+    parsed = datetime.datetime.strptime(value[:15], '%Y%m%dT%H%M%S')
+    return parsed.replace(tzinfo=get_timezone(params.get('TZID'))), False
+
+
+def parse_duration(value: str) -> datetime.timedelta:
+    """Parse an RFC 5545 DURATION such as PT1H30M or P1D."""
+    sign = -1 if value.startswith('-') else 1
+    value = value.lstrip('+-').lstrip('P')
+    total = datetime.timedelta()
+    number = ''
+    in_time = False
+    units = {'W': 'weeks', 'D': 'days', 'H': 'hours', 'M': 'minutes', 'S': 'seconds'}
+    for char in value:
+        if char == 'T':
+            in_time = True
+        elif char.isdigit():
+            number += char
+        elif char in units and number:
+            if char == 'M' and not in_time:
+                # Months are not valid in DURATION; ignore rather than guess
+                number = ''
+                continue
+            total += datetime.timedelta(**{units[char]: int(number)})
+            number = ''
+    return sign * total
+
+
+def _date_list(entries):
+    """Flatten EXDATE/RDATE entries (which may hold comma-separated values) into datetimes."""
+    dates = []
+    for params, value in entries or []:
+        for item in value.split(','):
+            if item.strip():
+                try:
+                    dates.append(parse_datetime(params, item)[0])
+                except ValueError:
+                    logging.warning(f'Skipping unparseable date {item!r}')
+    return dates
+
+
+def _expand_rrule(rule_text: str, dtstart, window_start, window_end):
+    """Return the occurrence starts of an RRULE that fall inside the window."""
+    try:
+        rule = rrule.rrulestr(rule_text, dtstart=dtstart)
+    except ValueError:
+        # Floating UNTIL with an aware DTSTART: expand in local wall time instead
+        naive = rrule.rrulestr(rule_text, dtstart=dtstart.replace(tzinfo=None), ignoretz=True)
+        return [
+            occurrence.replace(tzinfo=dtstart.tzinfo)
+            for occurrence in naive.between(
+                window_start.astimezone(dtstart.tzinfo).replace(tzinfo=None),
+                window_end.astimezone(dtstart.tzinfo).replace(tzinfo=None),
+                inc=True
+            )
+        ]
+    return rule.between(window_start, window_end, inc=True)
+
+
+def _series_key(event: dict, all_day: bool) -> tuple:
+    """The per-series fields shared by every occurrence of an event."""
+    organizer = event.get('ORGANIZER', ({}, ''))
+    organizer_name = organizer[0].get('CN') or organizer[1].replace('MAILTO:', '').replace('mailto:', '')
+
+    if event.get('TRANSP', ({}, ''))[1] == 'TRANSPARENT':
+        status = 'FREE'
+    else:
+        status = event.get('X-MICROSOFT-CDO-BUSYSTATUS', ({}, 'BUSY'))[1] or 'BUSY'
+
+    return (
+        unescape_text(event.get('SUMMARY', ({}, ''))[1]),
+        unescape_text(event.get('LOCATION', ({}, ''))[1]),
+        organizer_name,
+        event.get('UID', ({}, ''))[1],
+        1 if all_day else 0,
+        status,
+        _sequence(event)
+    )
+
+
+def _sequence(event: dict) -> int:
+    """The event's SEQUENCE (revision number), 0 if missing."""
+    try:
+        return int(event.get('SEQUENCE', ({}, '0'))[1] or 0)
+    except ValueError:
+        return 0
+
+
+def expand_events(raw_events, window_start, window_end) -> list:
+    """
+    Expand parsed VEVENTs into (start, end, series) tuples for every occurrence
+    overlapping the window, sorted by start. `series` is the tuple of
+    SERIES_FIELDS values.
+
+    Handles RRULE, RDATE, EXDATE, RECURRENCE-ID overrides and cancelled events.
+
+    `raw_events` is consumed as it is produced: single events become rows
+    straight away, and only recurring events and overrides are kept until
+    the input ends.
+    """
+    masters = []
+    overrides = {}
+    rows = []
+
+    def add_occurrence(event, start, duration, all_day):
+        end = start + duration
+        if end > window_start and start < window_end:
+            rows.append((int(start.timestamp()), int(end.timestamp()), _series_key(event, all_day)))
+
+    def event_times(event):
+        """(dtstart, duration, all_day), or None for cancelled or unparseable events."""
+        if event.get('STATUS', ({}, ''))[1] == 'CANCELLED':
+            return None
+        try:
+            dtstart, all_day = parse_datetime(*event['DTSTART'])
+            if 'DTEND' in event:
+                dtend = parse_datetime(*event['DTEND'])[0]
+            elif 'DURATION' in event:
+                dtend = dtstart + parse_duration(event['DURATION'][1])
+            else:
+                dtend = dtstart + (datetime.timedelta(days=1) if all_day else datetime.timedelta())
+        except ValueError as e:
+            logging.warning(f'Skipping event with bad date: {e}')
+            return None
+        return dtstart, dtend - dtstart, all_day
+
+    for event in raw_events:
+        if 'DTSTART' not in event:
+            continue
+        if 'RECURRENCE-ID' in event:
+            params, value = event['RECURRENCE-ID']
+            try:
+                original = parse_datetime(params, value)[0]
+            except ValueError:
+                continue
+            overrides[(event.get('UID', ({}, ''))[1], int(original.timestamp()))] = event
+        elif 'RRULE' in event or 'RDATE' in event:
+            masters.append(event)
+        else:
+            times = event_times(event)
+            if times is not None:
+                add_occurrence(event, times[0], times[1], times[2])
+
+    for event in overrides.values():
+        times = event_times(event)
+        if times is not None:
+            add_occurrence(event, times[0], times[1], times[2])
+
+    for event in masters:
+        times = event_times(event)
+        if times is None:
+            continue
+        dtstart, duration, all_day = times
+
+        uid = event.get('UID', ({}, ''))[1]
+        excluded = {int(date.timestamp()) for date in _date_list(event.get('EXDATE'))}
+        starts = set()
+        if 'RRULE' in event:
+            try:
+                starts.update(_expand_rrule(event['RRULE'][1], dtstart, window_start - duration, window_end))
+            except (ValueError, TypeError) as e:
+                logging.warning(f'Could not expand RRULE for {uid}: {e}')
+                starts.add(dtstart)
+        starts.update(_date_list(event.get('RDATE')))
+        if window_start - duration <= dtstart <= window_end:
+            starts.add(dtstart)
+
+        for start in starts:
+            key = int(start.timestamp())
+            if key in excluded or (uid, key) in overrides:
+                continue
+            add_occurrence(event, start, duration, all_day)
+
+    rows.sort(key=lambda row: (row[0], row[1]))
+    return rows
+
+
+def iter_text_lines(ics_data):
+    """
+    Lines of an ICS document given as str, UTF-8 bytes, a binary file or an
+    iterable of UTF-8 byte chunks.
+
+    Bytes are decoded line by line as they are read, so no decoded copy of
+    the whole document is built.
+    """
+    if isinstance(ics_data, str):
+        return iter(ics_data.splitlines())
+    if isinstance(ics_data, (bytes, bytearray, memoryview)):
+        return io.TextIOWrapper(io.BytesIO(ics_data), encoding='utf-8', errors='replace', newline='')
+    if hasattr(ics_data, 'read'):
+        return iter_byte_lines(iter(lambda: ics_data.read(64 * 1024), b''))
+    return iter_byte_lines(ics_data)
+
+
+def build_event_index(ics_data, room_id: str, now: datetime.datetime = None) -> dict:
+    """
+    Parse an ICS document and return the compact event index for one room.
+
+    `ics_data` is anything iter_text_lines accepts; given a chunk iterator
+    it is parsed while the chunks are still arriving.
+    """
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    window_start = (now - datetime.timedelta(days=PAST_DAYS)).replace(hour=0, minute=0, second=0, microsecond=0)
+    window_end = now + datetime.timedelta(days=FUTURE_DAYS)
+
+    series_ids = {}
+    events = []
+    for start, end, series in expand_events(iter_raw_events(iter_text_lines(ics_data)), window_start, window_end):
+        if series not in series_ids:
+            series_ids[series] = len(series_ids)
+        events.append([start, end, series_ids[series]])
+
+    return {
+        'version': INDEX_VERSION,
+        'room_id': room_id,
+        'generated': now.isoformat(),
+        'window': [int(window_start.timestamp()), int(window_end.timestamp())],
+        'series_fields': SERIES_FIELDS,
+        'series': [list(series) for series in series_ids],
+        'max_duration': max((end - start for start, end, _ in events), default=0),
+        'events': events
+    }
+
+
+def iter_index_events(index: dict, rows=None):
+    """Yield index rows (all of them, or just `rows`) as flat event dicts."""
+    fields = index['series_fields']
+    series = index['series']
+    for start, end, series_id in (index['events'] if rows is None else rows):
+        event = dict(zip(fields, series[series_id]))
+        event['start'] = start
+        event['end'] = end
+        yield event
+
+
+def dump_event_index(index: dict) -> str:
+    """Serialize an index as compact JSON."""
+    return json.dumps(index, separators=(',', ':'), ensure_ascii=False)
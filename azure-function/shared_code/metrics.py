@@ -0,0 +1,123 @@
+"""
+Refresh metrics: per-room timings kept as a rolling history.
+
+Every refresh appends one run to `refresh-metrics.json`:
+
+    {"runs": [{"time": ..., "duration": ..., "rooms": {room_id: {
+        "status", "bytes", "events", "connect", "download", "parse", "upload", "total"}}}]}
+
+Timings are seconds; `upload` includes compressing the .gz/.br variants
+and `total` is the room's whole fetch-and-store time. Phases a room did
+not go through (a 304 is never parsed or uploaded) are left out rather
+than recorded as zero, so they do not drag the percentiles down. Rooms
+the scheduler deferred are not recorded, nor are runs that fetched
+nothing. DebugStatus summarises the history as
+p50/p95 per room and phase.
+
+Settings:
+- METRICS_HISTORY: number of runs kept (default 288)
+"""
+
+import logging
+import math
+import os
+
+from shared_code.storage import load_json_blob, update_json_blob
+
+METRICS_BLOB = 'refresh-metrics.json'
+HISTORY_LENGTH = int(os.environ.get('METRICS_HISTORY', '288'))
+PHASES = ('connect', 'download', 'parse', 'upload', 'total')
+
+
+def run_metrics(summary: dict) -> dict:
+    """The history entry for one refresh summary."""
+    rooms = {}
+    for room_id, room in summary['rooms'].items():
+        if room['status'] == 'deferred':
+            continue
+        entry = {'status': room['status'], 'bytes': room.get('bytes', 0)}
+        if 'events' in room:
+            entry['events'] = room['events']
+        entry.update(room.get('timings', {}))
+        rooms[room_id] = entry
+    return {'time': summary['last_refresh'], 'duration': summary.get('duration'), 'rooms': rooms}
+
+
+def load_metrics(blob_service_client, container_name: str):
+    """Return (history, etag); an empty history if the blob does not exist yet."""
+    return load_json_blob(blob_service_client, container_name, METRICS_BLOB, lambda: {'runs': []})
+
+
+def record_refresh(blob_service_client, container_name: str, summary: dict):
+    """
+    Append a refresh to the metrics history, keeping the last HISTORY_LENGTH runs.
+
+    The write is conditional on the ETag that was read, so two refreshes
+    finishing together do not drop each other's run. Failures are logged
+    and never fail the refresh itself.
+    """
+    run = run_metrics(summary)
+
+    def append_run(history: dict):
+        history['runs'] = (history.get('runs', []) + [run])[-HISTORY_LENGTH:]
+
+    try:
+        update_json_blob(blob_service_client, container_name, METRICS_BLOB, append_run, lambda: {'runs': []})
+    except Exception as e:
+        logging.error(f'Failed to store refresh metrics: {str(e)}')
+
+
+def percentile(values: list, pct: float):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def room_stats(history: dict) -> dict:
+    """
+    Per-room summary of the history:
+    {room_id: {runs, failures, bytes_p50, events, {phase}: {p50, p95}}}.
+    """
+    samples = {}
+    for run in history.get('runs', []):
+        for room_id, room in run.get('rooms', {}).items():
+            room_samples = samples.setdefault(room_id, {'runs': 0, 'failures': 0, 'bytes': [], 'events': None})
+            room_samples['runs'] += 1
+            if room.get('status') == 'failed':
+                room_samples['failures'] += 1
+            if room.get('bytes'):
+                room_samples['bytes'].append(room['bytes'])
+            if 'events' in room:
+                room_samples['events'] = room['events']
+            for phase in PHASES:
+                if phase in room:
+                    room_samples.setdefault(phase, []).append(room[phase])
+
+    stats = {}
+    for room_id, room_samples in sorted(samples.items()):
+        summary = {
+            'runs': room_samples['runs'],
+            'failures': room_samples['failures'],
+            'bytes_p50': percentile(room_samples['bytes'], 50) if room_samples['bytes'] else 0,
+            'events': room_samples['events']
+        }
+        for phase in PHASES:
+            values = room_samples.get(phase)
+            if values:
+                summary[phase] = {'p50': percentile(values, 50), 'p95': percentile(values, 95)}
+        stats[room_id] = summary
+    return stats
+
+
+def metrics_report(history: dict) -> dict:
+    """Run count, refresh duration percentiles and per-room stats, as shown by DebugStatus."""
+    runs = history.get('runs', [])
+    durations = [run['duration'] for run in runs if run.get('duration') is not None]
+    return {
+        'runs': len(runs),
+        'first_run': runs[0]['time'] if runs else None,
+        'last_run': runs[-1]['time'] if runs else None,
+        'duration': {'p50': percentile(durations, 50), 'p95': percentile(durations, 95)} if durations else None,
+        'rooms': room_stats(history)
+    }
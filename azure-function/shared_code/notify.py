@@ -0,0 +1,139 @@
+"""
+Room update notifications for long-polling and Server-Sent Events clients.
+
+Every refresh that changes a room's events bumps a global version counter
+in `room-versions.json` and stamps the room with it:
+
+    {"version": 17, "updated": "...",
+     "rooms": {room_id: {"version": 17, "updated": "...", "changes_version": 3}}}
+
+A client remembers the last `version` it saw and asks which of its rooms
+have a higher one. WaitForUpdates holds the request open until one does,
+so an idle dashboard makes one cheap request every NOTIFY_MAX_WAIT seconds
+instead of downloading every room on a timer.
+
+Waiting requests do not each poll storage. Each worker keeps one copy of
+the versions blob and revalidates it with a conditional download at most
+every NOTIFY_POLL_SECONDS, however many clients are waiting on it.
+
+Settings:
+- NOTIFY_MAX_WAIT: longest time a request is held open, in seconds (default 50)
+- NOTIFY_POLL_SECONDS: how often a worker checks for new versions while clients wait (default 2)
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+from shared_code.storage import load_json_blob, update_json_blob
+
+VERSIONS_BLOB = 'room-versions.json'
+MAX_WAIT = float(os.environ.get('NOTIFY_MAX_WAIT', '50'))
+POLL_INTERVAL = float(os.environ.get('NOTIFY_POLL_SECONDS', '2'))
+
+
+def empty_versions() -> dict:
+    return {'version': 0, 'updated': None, 'rooms': {}}
+
+
+def load_versions(blob_service_client, container_name: str):
+    """Return (versions, etag); version 0 with no rooms if nothing has been published yet."""
+    return load_json_blob(blob_service_client, container_name, VERSIONS_BLOB, empty_versions)
+
+
+def publish_updates(blob_service_client, container_name: str, rooms: dict, timestamp: str):
+    """
+    Bump the version of every room in a refresh summary's `rooms` whose
+    events changed (`changed`, see shared_code.refresh). A feed that was
+    rewritten with the same events does not wake anyone, while an unchanged
+    feed whose index only now caught up with it (after a failed change log
+    write) does.
+
+    Returns the new global version, or None if nothing changed (nothing is
+    written then) or the write failed. Never raises.
+    """
+    updated = {room_id: room for room_id, room in rooms.items() if room.get('changed')}
+    if not updated:
+        return None
+
+    def bump_rooms(versions: dict):
+        version = versions['version'] + 1
+        versions['version'] = version
+        versions['updated'] = timestamp
+        for room_id, room in updated.items():
+            entry = {'version': version, 'updated': timestamp}
+            if 'changes_version' in room:
+                entry['changes_version'] = room['changes_version']
+            versions['rooms'][room_id] = entry
+
+    try:
+        versions = update_json_blob(blob_service_client, container_name, VERSIONS_BLOB, bump_rooms, empty_versions)
+    except Exception as e:
+        logging.error(f'Failed to publish room updates: {str(e)}')
+        return None
+    return versions['version']
+
+
+def updates_since(versions: dict, room_ids, since: int = None) -> dict:
+    """
+    The requested rooms that changed after version `since`.
+
+    Without `since` (a new client) every requested room is returned.
+    `reset` is true when `since` is ahead of the counter, which means the
+    versions blob was recreated; the client should reload everything.
+    """
+    version = versions['version']
+    reset = since is not None and since > version
+    rooms = {
+        room_id: versions['rooms'][room_id]
+        for room_id in room_ids
+        if room_id in versions['rooms'] and (since is None or reset or versions['rooms'][room_id]['version'] > since)
+    }
+    return {'version': version, 'since': since, 'reset': reset, 'rooms': rooms}
+
+
+class VersionWatcher:
+    """A worker's shared, periodically revalidated copy of the versions blob."""
+
+    def __init__(self, poll_interval: float = POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self._versions = None
+        self._etag = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def current(self, blob_service_client, container_name: str) -> dict:
+        """Return the versions, checking storage if the copy is older than the poll interval."""
+        from azure.core import MatchConditions
+        from azure.core.exceptions import ResourceNotFoundError, ResourceNotModifiedError
+
+        with self._lock:
+            now = time.monotonic()
+            if self._versions is not None and now - self._checked < self.poll_interval:
+                return self._versions
+
+            blob_client = blob_service_client.get_blob_client(container=container_name, blob=VERSIONS_BLOB)
+            try:
+                if self._etag:
+                    downloader = blob_client.download_blob(etag=self._etag, match_condition=MatchConditions.IfModified)
+                else:
+                    downloader = blob_client.download_blob()
+                self._versions = json.loads(downloader.readall())
+                self._etag = downloader.properties.etag
+            except ResourceNotModifiedError:
+                pass
+            except ResourceNotFoundError:
+                self._versions, self._etag = empty_versions(), None
+            except Exception as e:
+                # Keep waiting on the copy we have; the next poll tries again
+                logging.warning(f'Could not check room versions: {e}')
+                if self._versions is None:
+                    raise
+            self._checked = now
+            return self._versions
+
+
+watcher = VersionWatcher()
+
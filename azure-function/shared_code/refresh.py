@@ -0,0 +1,467 @@
+"""
+Refresh pipeline shared by CalendarRefresh and ManualRefresh.
+
+Each room is fetched with a conditional GET using the ETag / Last-Modified
+stored in its blob metadata by the previous run. A 304, or a 200 whose body
+hashes to the stored content hash, counts as unchanged and the blob is not
+rewritten.
+
+Whenever a room's content changes, its feed is also parsed into the compact
+event index (`{room_id}.events.json`, see shared_code.ics_parser). Unchanged
+rooms get their index rebuilt from the stored blob once it is older than
+INDEX_MAX_AGE, so the rolling window keeps moving.
+
+Feed bodies stay bytes throughout: the hash of the downloaded body is
+compared with the stored one and the same bytes are uploaded. The index is
+parsed from the chunks while they download, so it is ready as soon as the
+body is.
+
+Feeds that keep failing are skipped for a while by the circuit breaker
+(see shared_code.circuit_breaker) and reported as 'skipped'; their last
+good copy stays in storage and is still served.
+
+The timer refreshes each room on its own adaptive interval (see
+shared_code.scheduler); rooms that are not due are reported as 'deferred'.
+A room counts as changed for its schedule only when its event index
+differs from the previous one (`changed` in its summary entry), not
+whenever its feed was rewritten. When no room is due the timer returns
+before taking the refresh lock (see refresh_is_due).
+
+feed-state.json is only written when a room's state changed, and
+refresh-summary.json only when a room was updated, the set of failing
+rooms changed or the stored summary is older than SUMMARY_MAX_AGE, so
+quiet runs do not rewrite them.
+
+Each room's summary entry carries its phase timings (see
+shared_code.metrics), which are also kept in a rolling history.
+
+When a room's content changes, the new index is diffed against the
+previous one and the added / modified / removed events are appended to
+the room's change log (see shared_code.change_log). The log's version is
+stored in the index metadata as `changes_version`. Rooms whose events
+changed also get a new version in room-versions.json, which wakes clients
+waiting in WaitForUpdates (see shared_code.notify).
+
+The indexes rebuilt during a run are collected and, at the end of it,
+folded into each room's utilization history with the aggregates
+republished to utilization.json (see shared_code.utilization), and merged
+into the cross-room search index (see shared_code.search_index).
+"""
+
+import datetime
+import json
+import logging
+import time
+
+from shared_code import circuit_breaker, scheduler
+from shared_code.calendar_fetch import content_hash, fetch_all
+from shared_code.change_log import record_changes
+from shared_code.freshness import STALE_AFTER, SUMMARY_BLOB, parse_time
+from shared_code.ics_parser import build_event_index, dump_event_index
+from shared_code.metrics import record_refresh
+from shared_code.notify import publish_updates
+from shared_code.search_index import publish_search_index
+from shared_code.storage import content_settings, upload_with_variants
+from shared_code.utilization import publish_utilization, record_utilization
+
+INDEX_MAX_AGE = datetime.timedelta(days=1)
+# Rewritten at least this often even when nothing changed, so DebugStatus still sees the refresh running
+SUMMARY_MAX_AGE = datetime.timedelta(seconds=STALE_AFTER / 2)
+
+
+def load_blob_metadata(container_client) -> dict:
+    """Return {blob_name: metadata} for the whole container in one listing call."""
+    try:
+        return {
+            blob.name: blob.metadata or {}
+            for blob in container_client.list_blobs(include=['metadata'])
+        }
+    except Exception as e:
+        logging.warning(f'Could not list existing blob metadata: {e}')
+        return {}
+
+
+def index_is_stale(index_metadata: dict, digest: str) -> bool:
+    """True if the stored event index is missing, built from other content, or too old."""
+    if not index_metadata or index_metadata.get('source_sha256') != digest:
+        return True
+    try:
+        generated = datetime.datetime.fromisoformat(index_metadata['generated'])
+    except (KeyError, ValueError):
+        return True
+    return datetime.datetime.now(datetime.timezone.utc) - generated > INDEX_MAX_AGE
+
+
+def load_event_index(blob_service_client, container_name: str, room_id: str):
+    """The room's stored event index, or None if it is missing or unreadable."""
+    try:
+        blob_client = blob_service_client.get_blob_client(container=container_name, blob=f'{room_id}.events.json')
+        return json.loads(blob_client.download_blob().readall())
+    except Exception as e:
+        logging.warning(f'Could not read previous event index for room {room_id}: {e}')
+        return None
+
+
+def store_event_index(blob_service_client, container_name: str, room_id: str, content, digest: str, timings: dict = None,
+                      previous_index: dict = None, changes_version: str = None, index: dict = None, rebuilt: dict = None):
+    """
+    Parse `content` into the room's event index blob. Returns (event count,
+    changes_version, changed events), the last None without a `previous_index`.
+
+    `content` is bytes or an iterable of byte chunks (see
+    ics_parser.iter_text_lines). An `index` already parsed while the feed
+    downloaded is stored as is instead.
+
+    With a `previous_index`, the differences from it are appended to the
+    room's change log first. Otherwise `changes_version` (the version the
+    old index was stored with) is carried over unchanged. If the events
+    changed but the change log could not be written, the new index is not
+    stored and RuntimeError is raised: stored under the old version, it
+    would tell GetChanges clients they are current. The next refresh diffs
+    against the old index again (see update_event_index).
+
+    If `timings` is given, the seconds spent parsing and uploading are added
+    to its `parse` / `upload` entries. If `rebuilt` is given, the new index
+    is added to it ({room_id: index}) for publish_aggregates().
+    """
+    timings = {} if timings is None else timings
+    started = time.monotonic()
+    if index is None:
+        index = build_event_index(content, room_id)
+    data = dump_event_index(index).encode('utf-8')
+    parsed = time.monotonic()
+    count = None
+    if previous_index is not None:
+        version, count = record_changes(blob_service_client, container_name, room_id, previous_index, index, index['generated'])
+        if version is not None:
+            changes_version = str(version)
+            if count:
+                logging.info(f'Recorded {count} event changes for room {room_id} (version {version})')
+        elif count:
+            raise RuntimeError(f'could not record {count} event changes, keeping the previous index')
+    metadata = {'generated': index['generated'], 'room_id': room_id, 'source_sha256': digest}
+    if changes_version:
+        metadata['changes_version'] = changes_version
+    upload_with_variants(
+        blob_service_client,
+        container_name,
+        f'{room_id}.events.json',
+        data,
+        'application/json',
+        metadata
+    )
+    add_timing(timings, 'parse', parsed - started)
+    add_timing(timings, 'upload', time.monotonic() - parsed)
+    if rebuilt is not None:
+        rebuilt[room_id] = index
+    return len(index['events']), changes_version, count
+
+
+def update_event_index(blob_service_client, container_name: str, room_id: str, content, digest: str, index_metadata: dict,
+                       timings: dict = None, index: dict = None, rebuilt: dict = None) -> dict:
+    """
+    Store the room's event index for `content` and return its summary
+    fields: `events`, `changes_version` (if any) and `changed`.
+
+    A stored index built from other content is diffed against the new one,
+    and `changed` says whether any event differs. A rebuild of the same
+    content only moves the window and is not a change; a room without a
+    readable stored index counts as changed. If the index could not be
+    stored, `changed` is set whenever the content differs from what the
+    stored index was built from. Never raises.
+    """
+    lagging = not index_metadata or index_metadata.get('source_sha256') != digest
+    previous_version = index_metadata.get('changes_version') if index_metadata else None
+    previous_index = load_event_index(blob_service_client, container_name, room_id) if index_metadata and lagging else None
+    room = {'changed': lagging}
+    try:
+        count, changes_version, changes = store_event_index(blob_service_client, container_name, room_id, content, digest, timings,
+                                                            previous_index=previous_index,
+                                                            changes_version=previous_version,
+                                                            index=index, rebuilt=rebuilt)
+    except Exception as e:
+        # The raw .ics is stored; clients can still fall back to it
+        logging.error(f'Failed to build event index for room {room_id}: {str(e)}')
+        return room
+
+    room['events'] = count
+    if changes_version:
+        room['changes_version'] = int(changes_version)
+    if previous_index is not None:
+        room['changed'] = changes > 0
+    return room
+
+
+def publish_aggregates(blob_service_client, container_name: str, rebuilt: dict, timestamp: str):
+    """Update the utilization aggregates and the search index from the indexes rebuilt in a run."""
+    if not rebuilt:
+        return
+    utilization = {}
+    for room_id, index in rebuilt.items():
+        document = record_utilization(blob_service_client, container_name, room_id, index)
+        if document is not None:
+            utilization[room_id] = document
+    publish_utilization(blob_service_client, container_name, utilization, timestamp)
+    publish_search_index(blob_service_client, container_name, rebuilt, timestamp)
+
+
+def add_timing(timings: dict, phase: str, seconds: float):
+    timings[phase] = round(timings.get(phase, 0) + seconds, 3)
+
+
+def refresh_stale_index(blob_service_client, container_name: str, room_id: str, metadata: dict, index_metadata: dict, timings: dict = None,
+                        rebuilt: dict = None):
+    """
+    Rebuild an unchanged room's index from its stored blob if the index is
+    stale. Returns the fields update_event_index() returns, or None.
+    """
+    digest = metadata.get('content_sha256')
+    if not digest or not index_is_stale(index_metadata, digest):
+        return None
+    try:
+        blob_client = blob_service_client.get_blob_client(container=container_name, blob=f'{room_id}.ics')
+        # Parsed straight from the download stream
+        content = blob_client.download_blob().chunks()
+    except Exception as e:
+        logging.error(f'Failed to rebuild event index for room {room_id}: {str(e)}')
+        return None
+    room = update_event_index(blob_service_client, container_name, room_id, content, digest, index_metadata, timings, rebuilt=rebuilt)
+    if 'events' in room:
+        logging.info(f'Rebuilt event index for unchanged room {room_id} ({room["events"]} events)')
+    return room
+
+
+def store_validators(blob_service_client, container_name: str, room_id: str, metadata: dict, result: dict):
+    """
+    Save a feed's new ETag / Last-Modified on its stored .ics when the body
+    itself did not change, so the next fetch sends the current validators
+    and can get a 304. Failures are logged; the next fetch just downloads.
+    """
+    validators = {'source_etag': result['etag'] or '', 'source_last_modified': result['last_modified'] or ''}
+    if all(metadata.get(key, '') == value for key, value in validators.items()):
+        return
+    try:
+        blob_client = blob_service_client.get_blob_client(container=container_name, blob=f'{room_id}.ics')
+        blob_client.set_blob_metadata(dict(metadata, **validators))
+    except Exception as e:
+        logging.warning(f'Could not save new validators for room {room_id}: {e}')
+
+
+def store_result(blob_service_client, container_name: str, result: dict, previous: dict, utc_timestamp: str, timings: dict,
+                 rebuilt: dict = None) -> dict:
+    """Store one fetch result and return the room's summary entry."""
+    room_id = result['room_id']
+    metadata = previous.get(f'{room_id}.ics', {})
+    index_metadata = previous.get(f'{room_id}.events.json')
+
+    if not result['ok']:
+        logging.error(f'Failed to fetch calendar for room {room_id} ({result["url"]}): {result["error"]}')
+        return {'status': 'failed', 'error': result['error']}
+
+    if result['not_modified']:
+        logging.info(f'Calendar for room {room_id} not modified (304 in {result["elapsed"]}s)')
+        room = {'status': 'unchanged', 'bytes': 0}
+        room.update(refresh_stale_index(blob_service_client, container_name, room_id, metadata, index_metadata, timings, rebuilt) or {})
+        return room
+
+    content = result['content']
+    digest = result['sha256'] or content_hash(content)
+    if digest == metadata.get('content_sha256'):
+        logging.info(f'Calendar for room {room_id} unchanged (same content hash), skipping upload')
+        room = {'status': 'unchanged', 'bytes': len(content)}
+        store_validators(blob_service_client, container_name, room_id, metadata, result)
+        if index_is_stale(index_metadata, digest):
+            room.update(update_event_index(blob_service_client, container_name, room_id, content, digest, index_metadata, timings,
+                                           index=result['index'], rebuilt=rebuilt))
+        return room
+
+    try:
+        upload_started = time.monotonic()
+        upload_with_variants(
+            blob_service_client,
+            container_name,
+            f'{room_id}.ics',
+            content,
+            'text/calendar',
+            {
+                'last_updated': utc_timestamp,
+                'room_id': room_id,
+                'source_etag': result['etag'] or '',
+                'source_last_modified': result['last_modified'] or ''
+            },
+            digest
+        )
+        add_timing(timings, 'upload', time.monotonic() - upload_started)
+
+        logging.info(f'Successfully updated calendar for room {room_id} ({len(content)} bytes in {result["elapsed"]}s)')
+        room = {'status': 'updated', 'bytes': len(content)}
+
+    except Exception as e:
+        logging.error(f'Failed to store calendar for room {room_id}: {str(e)}')
+        return {'status': 'failed', 'error': str(e)}
+
+    room.update(update_event_index(blob_service_client, container_name, room_id, content, digest, index_metadata, timings,
+                                   index=result['index'], rebuilt=rebuilt))
+    return room
+
+
+def store_summary(blob_service_client, container_name: str, summary: dict):
+    """Write refresh-summary.json. Its metadata lets DebugStatus judge freshness from a blob listing alone."""
+    rooms = summary['rooms']
+    try:
+        summary_blob = blob_service_client.get_blob_client(
+            container=container_name,
+            blob=SUMMARY_BLOB
+        )
+        summary_blob.upload_blob(
+            json.dumps(summary, indent=2).encode('utf-8'),
+            overwrite=True,
+            content_settings=content_settings('application/json'),
+            metadata={
+                'last_refresh': summary['last_refresh'],
+                'failed_rooms': ','.join(sorted(room_id for room_id, room in rooms.items() if room['status'] in ('failed', 'skipped')))
+            }
+        )
+    except Exception as e:
+        logging.error(f'Failed to store summary: {str(e)}')
+
+
+def summary_is_due(previous_summary: dict, summary: dict, now: datetime.datetime) -> bool:
+    """
+    Whether refresh-summary.json needs rewriting, given the metadata of the
+    stored one: a room was updated, the failing rooms differ from the ones
+    it lists, or it is older than SUMMARY_MAX_AGE.
+    """
+    rooms = summary['rooms']
+    if any(room['status'] == 'updated' for room in rooms.values()):
+        return True
+    failed = {room_id for room_id, room in rooms.items() if room['status'] in ('failed', 'skipped')}
+    if failed != {room_id for room_id in previous_summary.get('failed_rooms', '').split(',') if room_id}:
+        return True
+    last_refresh = parse_time(previous_summary.get('last_refresh'))
+    return last_refresh is None or now - last_refresh >= SUMMARY_MAX_AGE
+
+
+def is_due(room_state: dict, now: datetime.datetime) -> bool:
+    """Whether a scheduled run fetches the room: its breaker is not open and it is due or being retried."""
+    breaker, _ = circuit_breaker.check(room_state, now)
+    return breaker == 'half-open' or (breaker == 'closed' and scheduler.is_due(room_state, now))
+
+
+def refresh_is_due(blob_service_client, container_name: str, room_ids, now: datetime.datetime) -> bool:
+    """
+    Whether a scheduled run has anything to do: a room is due or
+    refresh-summary.json is older than SUMMARY_MAX_AGE. Costs two reads,
+    so the timer can return early without taking the refresh lock.
+    """
+    feed_state, _ = circuit_breaker.load_state(blob_service_client, container_name)
+    if any(is_due(feed_state.get(room_id), now) for room_id in room_ids):
+        return True
+    try:
+        properties = blob_service_client.get_blob_client(container=container_name, blob=SUMMARY_BLOB).get_blob_properties()
+    except Exception:
+        return True
+    last_refresh = parse_time((properties.metadata or {}).get('last_refresh'))
+    return last_refresh is None or now - last_refresh >= SUMMARY_MAX_AGE
+
+
+def run_refresh(blob_service_client, container_name: str, calendars, utc_timestamp: str, full_run: bool = True, scheduled: bool = False) -> dict:
+    """
+    Fetch and store every (room_id, url) in `calendars`.
+
+    Returns the summary, which includes a per-room status of 'updated',
+    'unchanged', 'failed', 'skipped' or 'deferred' with the room's phase
+    timings, and writes it to refresh-summary.json when summary_is_due().
+    Runs that fetched a room are also appended to the metrics history.
+
+    A `scheduled` run (the timer) only fetches rooms that are due according
+    to their adaptive interval; the others are reported as 'deferred'.
+
+    A targeted run over only some rooms (`full_run=False`) does not replace
+    refresh-summary.json, which describes the last run over every room.
+    """
+    started = time.monotonic()
+    now = datetime.datetime.fromisoformat(utc_timestamp)
+    calendars = list(calendars)
+    container_client = blob_service_client.get_container_client(container_name)
+    previous = load_blob_metadata(container_client)
+    feed_state, feed_state_etag = circuit_breaker.load_state(blob_service_client, container_name)
+    stored_state = dict(feed_state)
+
+    rooms = {}
+    rebuilt = {}
+    requests_to_send = []
+    for room_id, url in calendars:
+        breaker, deadline = circuit_breaker.check(feed_state.get(room_id), now)
+        if breaker == 'open':
+            room_state = feed_state[room_id]
+            logging.warning(f'Skipping room {room_id}: circuit open after {room_state["failures"]} failures, next attempt {room_state.get("next_attempt")}')
+            rooms[room_id] = {
+                'status': 'skipped',
+                'error': room_state.get('last_error'),
+                'next_attempt': room_state.get('next_attempt'),
+                'timings': {}
+            }
+            continue
+
+        if scheduled and not is_due(feed_state.get(room_id), now):
+            rooms[room_id] = {'status': 'deferred', 'next_check': scheduler.next_check(feed_state[room_id]), 'timings': {}}
+            continue
+
+        metadata = previous.get(f'{room_id}.ics', {})
+        validators = {
+            'etag': metadata.get('source_etag'),
+            'last_modified': metadata.get('source_last_modified')
+        }
+        requests_to_send.append((room_id, url, validators, deadline))
+
+    for result in fetch_all(requests_to_send, parse=True):
+        room_id = result['room_id']
+        processing_started = time.monotonic()
+        timings = dict(result.get('timings', {}))
+        room = store_result(blob_service_client, container_name, result, previous, utc_timestamp, timings, rebuilt)
+        timings['total'] = round(result['elapsed'] + time.monotonic() - processing_started, 3)
+        room['timings'] = timings
+        rooms[room_id] = room
+
+        # Only the feed's own failures count towards its breaker, not storage errors
+        if result['ok']:
+            feed_state[room_id] = circuit_breaker.record_success(feed_state.get(room_id, {}), now)
+            if room['status'] != 'failed':
+                feed_state[room_id] = scheduler.record_check(feed_state[room_id], room.get('changed', False), now)
+        else:
+            feed_state[room_id] = circuit_breaker.record_failure(feed_state.get(room_id, {}), result['error'], now)
+
+    if feed_state != stored_state:
+        circuit_breaker.save_state(blob_service_client, container_name, feed_state, feed_state_etag)
+    publish_updates(blob_service_client, container_name, rooms, utc_timestamp)
+    publish_aggregates(blob_service_client, container_name, rebuilt, utc_timestamp)
+
+    statuses = [room['status'] for room in rooms.values()]
+    updated = statuses.count('updated')
+    unchanged = statuses.count('unchanged')
+    failed = statuses.count('failed')
+    skipped = statuses.count('skipped')
+    deferred = statuses.count('deferred')
+
+    summary = {
+        'last_refresh': utc_timestamp,
+        'successful_updates': updated + unchanged,
+        'failed_updates': failed + skipped,
+        'total_calendars': len(calendars),
+        'updated': updated,
+        'unchanged': unchanged,
+        'failed': failed,
+        'skipped': skipped,
+        'deferred': deferred,
+        'duration': round(time.monotonic() - started, 3),
+        'rooms': rooms
+    }
+
+    if full_run and summary_is_due(previous.get(SUMMARY_BLOB, {}), summary, now):
+        store_summary(blob_service_client, container_name, summary)
+
+    if requests_to_send:
+        record_refresh(blob_service_client, container_name, summary)
+
+    return summary
@@ -0,0 +1,146 @@
+"""
+Single-flight refresh using a blob lease as a lock.
+
+Only one refresh (timer or manual) runs at a time. The runner holds a
+lease on `refresh.lock`, renewing it in the background, and before
+releasing it writes its summary into the lock blob. A caller that finds
+the lease taken waits for it to be released and then takes that summary
+as its own result, provided the run covered the rooms it asked for.
+Otherwise it runs its own refresh. Either way, callers that overlap share
+one set of upstream fetches and blob writes instead of each doing them.
+
+If a runner dies, its lease expires after LEASE_SECONDS and the next
+caller takes over.
+
+Settings:
+- REFRESH_LOCK_WAIT: seconds a caller waits for a running refresh before giving up (default 120)
+"""
+
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+
+from shared_code.storage import content_settings
+
+LOCK_BLOB = 'refresh.lock'
+LEASE_SECONDS = 60
+RENEW_INTERVAL = 20
+POLL_INTERVAL = 2
+WAIT_TIMEOUT = float(os.environ.get('REFRESH_LOCK_WAIT', '120'))
+
+
+class RefreshInProgress(Exception):
+    """Another refresh held the lock for longer than the caller was willing to wait."""
+
+
+def _ensure_lock_blob(blob_client):
+    from azure.core.exceptions import HttpResponseError, ResourceExistsError
+
+    try:
+        blob_client.upload_blob(b'{}', overwrite=False, content_settings=content_settings('application/json'))
+    except ResourceExistsError:
+        pass
+    except HttpResponseError as e:
+        # 412: the blob exists and is leased by a running refresh
+        if e.status_code != 412:
+            raise
+
+
+def _try_acquire(blob_client):
+    """Return a lease on the lock blob, or None if another refresh holds it."""
+    from azure.core.exceptions import HttpResponseError
+
+    try:
+        return blob_client.acquire_lease(lease_duration=LEASE_SECONDS)
+    except HttpResponseError as e:
+        if e.status_code == 409:
+            return None
+        raise
+
+
+def _is_locked(blob_client) -> bool:
+    return blob_client.get_blob_properties().lease.state == 'leased'
+
+
+def _read_result(blob_client, since: datetime.datetime, room_ids):
+    """The summary left by a run that finished after `since` and covered `room_ids`, or None."""
+    from azure.core.exceptions import ResourceNotFoundError
+
+    try:
+        downloader = blob_client.download_blob()
+    except ResourceNotFoundError:
+        return None
+    if downloader.properties.last_modified < since:
+        return None
+    summary = json.loads(downloader.readall() or b'{}')
+    covered = {room_id for room_id, room in summary.get('rooms', {}).items() if room['status'] != 'deferred'}
+    if not set(room_ids) <= covered:
+        return None
+    return summary
+
+
+def _renew_until(lease, stop: threading.Event):
+    while not stop.wait(RENEW_INTERVAL):
+        try:
+            lease.renew()
+        except Exception as e:
+            logging.warning(f'Could not renew refresh lock: {e}')
+
+
+def single_flight(blob_service_client, container_name: str, room_ids, run):
+    """
+    Run `run()` (which returns a refresh summary) under the refresh lock.
+
+    Returns (summary, shared): `shared` is True when the summary came from a
+    refresh another caller was already running. Raises RefreshInProgress if
+    the lock is still held after REFRESH_LOCK_WAIT seconds.
+    """
+    blob_client = blob_service_client.get_blob_client(container=container_name, blob=LOCK_BLOB)
+    _ensure_lock_blob(blob_client)
+
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    waiting_since = None
+    while True:
+        lease = _try_acquire(blob_client)
+        if lease is not None:
+            break
+
+        if waiting_since is None:
+            # Blob times have one-second resolution; allow for that when matching the result
+            waiting_since = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=1)
+            logging.info('A refresh is already running; waiting for its result')
+
+        while _is_locked(blob_client):
+            if time.monotonic() > deadline:
+                raise RefreshInProgress(f'refresh still running after {WAIT_TIMEOUT:.0f}s')
+            time.sleep(POLL_INTERVAL)
+
+        summary = _read_result(blob_client, waiting_since, room_ids)
+        if summary is not None:
+            return summary, True
+        # The run we waited for covered other rooms (or failed); take the lock ourselves
+
+    stop = threading.Event()
+    renewer = threading.Thread(target=_renew_until, args=(lease, stop), daemon=True)
+    renewer.start()
+    try:
+        summary = run()
+        try:
+            blob_client.upload_blob(
+                json.dumps(summary).encode('utf-8'),
+                overwrite=True,
+                lease=lease,
+                content_settings=content_settings('application/json')
+            )
+        except Exception as e:
+            logging.error(f'Failed to publish refresh result to waiting callers: {str(e)}')
+        return summary, False
+    finally:
+        stop.set()
+        try:
+            lease.release()
+        except Exception as e:
+            logging.warning(f'Could not release refresh lock (it will expire): {e}')
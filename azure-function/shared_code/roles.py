@@ -0,0 +1,144 @@
+"""
+Entra ID group -> application role mapping for GetUserRoles.
+
+The mapping lives in `roles.json` next to this module (override the path
+with ROLE_MAP_PATH):
+
+    {"claim_types": ["roles", "groups"],
+     "groups": {"FBS_StaffAll": ["staff"], "FBS_Community": ["community"]},
+     "default_roles": ["authenticated"]}
+
+It is parsed once per worker. A user's group claims are collected into a
+set in one pass and the mapped groups are looked up in it, so users with
+hundreds of group claims cost no more than a few set lookups.
+
+Resolved roles are cached per worker, keyed by a SHA-256 of the
+x-ms-client-principal header (the raw header is not kept), so repeat
+lookups for the same login skip the decoding entirely.
+
+Settings:
+- ROLE_MAP_PATH: path of the group-to-role table (default roles.json here)
+- ROLE_CACHE_TTL: seconds a resolved principal is cached (default 300)
+- ROLE_CACHE_MAX_ENTRIES: principals cached per worker (default 1024)
+"""
+
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+ROLE_MAP_PATH = os.environ.get(
+    'ROLE_MAP_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'roles.json')
+)
+CACHE_TTL = float(os.environ.get('ROLE_CACHE_TTL', '300'))
+CACHE_MAX_ENTRIES = int(os.environ.get('ROLE_CACHE_MAX_ENTRIES', '1024'))
+DEFAULT_ROLES = ['authenticated']
+
+_role_map = None
+_role_map_lock = threading.Lock()
+
+
+def load_role_map() -> dict:
+    """
+    Return the parsed role table, loading it on first use.
+
+    The result has `claim_types` (a frozenset), `groups` ({group: [roles]},
+    in file order) and `default_roles`.
+    """
+    global _role_map
+    if _role_map is None:
+        with _role_map_lock:
+            if _role_map is None:
+                with open(ROLE_MAP_PATH, encoding='utf-8') as f:
+                    data = json.load(f)
+                _role_map = {
+                    'claim_types': frozenset(data.get('claim_types', ['roles', 'groups'])),
+                    'groups': {group: list(roles) for group, roles in data['groups'].items()},
+                    'default_roles': list(data.get('default_roles', DEFAULT_ROLES))
+                }
+    return _role_map
+
+
+def fallback_roles() -> list:
+    """
+    Roles to grant when resolving a principal failed: the table's default
+    roles if it has been loaded, else DEFAULT_ROLES. Never reads the table,
+    which may be what failed.
+    """
+    return list(_role_map['default_roles'] if _role_map is not None else DEFAULT_ROLES)
+
+
+def decode_principal(header: str) -> dict:
+    """Decode the base64 JSON x-ms-client-principal header."""
+    return json.loads(base64.b64decode(header))
+
+
+def resolve_roles(principal: dict) -> list:
+    """Application roles for a decoded client principal, in role table order."""
+    role_map = load_role_map()
+    claim_types = role_map['claim_types']
+    groups = {claim.get('val') for claim in principal.get('claims') or [] if claim.get('typ') in claim_types}
+
+    roles = []
+    for group, group_roles in role_map['groups'].items():
+        if group in groups:
+            roles.extend(role for role in group_roles if role not in roles)
+    roles.extend(role for role in role_map['default_roles'] if role not in roles)
+    return roles
+
+
+class RoleCache:
+    """Thread-safe LRU of {principal hash: (roles, expiry)}."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(header: str) -> str:
+        return hashlib.sha256(header.encode('utf-8')).hexdigest()
+
+    def get(self, key: str):
+        """Cached roles for a principal hash, or None."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: str, roles: list):
+        with self._lock:
+            self._entries[key] = (roles, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+role_cache = RoleCache()
+
+
+def roles_for_header(header: str):
+    """
+    Return (roles, cache_status) for an x-ms-client-principal header.
+
+    `cache_status` is HIT or MISS. Raises ValueError if the header cannot be
+    decoded.
+    """
+    key = RoleCache.key(header)
+    roles = role_cache.get(key)
+    if roles is not None:
+        return roles, 'HIT'
+    roles = resolve_roles(decode_principal(header))
+    role_cache.put(key, roles)
+    return roles, 'MISS'
@@ -0,0 +1,99 @@
+"""
+Room registry: the one place room IDs, names and calendar URLs are defined.
+
+The registry lives in `rooms.json` next to this module (override the path
+with ROOM_REGISTRY_PATH). It is parsed once per worker into dicts, so room
+lookups are O(1). The refresh functions, the HTTP functions and the
+GitHub Actions fetcher (`fetch-calendars.py`) all read it. The fetcher
+also writes the dashboard's room list from it (`calendars/rooms.js`, see
+dashboard_buildings), so adding a room here is all it takes.
+"""
+
+import json
+import os
+import threading
+
+REGISTRY_PATH = os.environ.get(
+    'ROOM_REGISTRY_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rooms.json')
+)
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def load_registry() -> dict:
+    """
+    Return the parsed registry, loading it on first use.
+
+    The result has `rooms` ({room_id: room}, in file order) and
+    `buildings` ({building_id: building}).
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                with open(REGISTRY_PATH, encoding='utf-8') as f:
+                    data = json.load(f)
+
+                rooms = {}
+                for room in data['rooms']:
+                    if room['id'] in rooms:
+                        raise ValueError(f"Duplicate room id in registry: {room['id']}")
+                    rooms[room['id']] = room
+
+                _registry = {
+                    'rooms': rooms,
+                    'buildings': {building['id']: building for building in data.get('buildings', [])}
+                }
+    return _registry
+
+
+def get_room(room_id: str):
+    """Registry entry for a room, or None if it is not a known room."""
+    return load_registry()['rooms'].get(room_id)
+
+
+def room_ids(bookable_only: bool = False) -> list:
+    """All registered room IDs; `bookable_only` leaves out feeds like staff-ooo."""
+    return [
+        room_id for room_id, room in load_registry()['rooms'].items()
+        if not bookable_only or room.get('bookable', True)
+    ]
+
+
+def parse_room_list(rooms_param: str):
+    """
+    Split a `rooms=a,b,c` query parameter into (known room IDs, unknown IDs).
+
+    An empty parameter means every bookable room.
+    """
+    if not rooms_param:
+        return room_ids(bookable_only=True), []
+    requested = [room_id.strip() for room_id in rooms_param.split(',') if room_id.strip()]
+    rooms = load_registry()['rooms']
+    return [room_id for room_id in requested if room_id in rooms], [room_id for room_id in requested if room_id not in rooms]
+
+
+def calendars(selected=None) -> list:
+    """(room_id, url) pairs to refresh: every room, or just the IDs in `selected`."""
+    rooms = load_registry()['rooms']
+    if selected is None:
+        return [(room_id, room['url']) for room_id, room in rooms.items()]
+    return [(room_id, rooms[room_id]['url']) for room_id in selected if room_id in rooms]
+
+
+def dashboard_buildings() -> list:
+    """
+    The bookable rooms grouped by building, in registry order, in the
+    shape of `DashboardConfig.buildings` in config.js.
+    """
+    registry = load_registry()
+    buildings = {
+        building_id: {'name': building['name'], 'id': building_id, 'rooms': []}
+        for building_id, building in registry['buildings'].items()
+    }
+    for room_id, room in registry['rooms'].items():
+        if room.get('bookable', True) and room.get('building') in buildings:
+            buildings[room['building']]['rooms'].append({'name': room['name'], 'id': room_id, 'icsFile': room_id})
+    return [building for building in buildings.values() if building['rooms']]
@@ -0,0 +1,85 @@
+"""
+Adaptive per-room refresh scheduling.
+
+The CalendarRefresh timer fires every REFRESH_PERIOD (5 minutes), but each
+run only fetches the rooms that are due. How often a room is due depends
+on how often its calendar has actually changed: busy rooms are checked
+as often as every REFRESH_MIN_INTERVAL_MINUTES, rooms that never change
+drift out to REFRESH_MAX_INTERVAL_MINUTES.
+
+A room's change rate is an exponentially decayed count of observed
+changes (time constant CHANGE_RATE_WINDOW), in changes per hour. The
+interval is chosen so that about TARGET_CHANGES changes are expected
+between two checks, then clamped to the bounds. New rooms start at the
+old fixed 15-minute cadence and adapt from there.
+
+Schedule fields (`interval`, `change_rate`, `last_checked`,
+`recent_changes`) are kept per room in feed-state.json next to the
+circuit breaker's fields.
+
+Settings:
+- REFRESH_MIN_INTERVAL_MINUTES: shortest interval between checks of a room (default 5)
+- REFRESH_MAX_INTERVAL_MINUTES: longest interval between checks of a room (default 120)
+"""
+
+import datetime
+import math
+import os
+
+from shared_code.freshness import REFRESH_PERIOD, parse_time
+
+MIN_INTERVAL = float(os.environ.get('REFRESH_MIN_INTERVAL_MINUTES', '5')) * 60
+MAX_INTERVAL = float(os.environ.get('REFRESH_MAX_INTERVAL_MINUTES', '120')) * 60
+DEFAULT_INTERVAL = 15 * 60
+CHANGE_RATE_WINDOW = 24 * 3600
+TARGET_CHANGES = 0.5
+RECENT_CHANGES = 10
+
+
+def clamp_interval(seconds: float) -> int:
+    return round(min(MAX_INTERVAL, max(MIN_INTERVAL, seconds)))
+
+
+def interval_for(change_rate: float) -> int:
+    """Check interval in seconds for a change rate in changes per hour."""
+    if change_rate <= 0:
+        return clamp_interval(MAX_INTERVAL)
+    return clamp_interval(TARGET_CHANGES / change_rate * 3600)
+
+
+def is_due(room_state: dict, now: datetime.datetime) -> bool:
+    """True if the room has never been checked or its interval has (nearly) passed."""
+    last_checked = parse_time((room_state or {}).get('last_checked'))
+    if last_checked is None:
+        return True
+    interval = room_state.get('interval', DEFAULT_INTERVAL)
+    # Half a timer period of slack, so a room is not pushed to the next run by timer jitter
+    return (now - last_checked).total_seconds() >= interval - REFRESH_PERIOD / 2
+
+
+def next_check(room_state: dict) -> str:
+    last_checked = parse_time(room_state.get('last_checked'))
+    if last_checked is None:
+        return None
+    return (last_checked + datetime.timedelta(seconds=room_state.get('interval', DEFAULT_INTERVAL))).isoformat()
+
+
+def record_check(room_state: dict, changed: bool, now: datetime.datetime) -> dict:
+    """Fold one successful check into the room's change rate and pick its next interval."""
+    room_state = dict(room_state)
+    last_checked = parse_time(room_state.get('last_checked'))
+    if 'change_rate' in room_state and last_checked is not None:
+        elapsed = max(0.0, (now - last_checked).total_seconds())
+        change_rate = room_state['change_rate'] * math.exp(-elapsed / CHANGE_RATE_WINDOW)
+    else:
+        # Prior that reproduces the old fixed cadence until there is history
+        change_rate = TARGET_CHANGES / (DEFAULT_INTERVAL / 3600)
+
+    if changed:
+        change_rate += 3600 / CHANGE_RATE_WINDOW
+        room_state['recent_changes'] = (room_state.get('recent_changes', []) + [now.isoformat()])[-RECENT_CHANGES:]
+
+    room_state['change_rate'] = round(change_rate, 4)
+    room_state['interval'] = interval_for(change_rate)
+    room_state['last_checked'] = now.isoformat()
+    return room_state
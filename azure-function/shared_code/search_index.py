@@ -0,0 +1,207 @@
+"""
+Cross-room event search.
+
+The refresh keeps an inverted index of every room's events in
+`search-index.json`, so "where is the XYZ seminar" is answered from one
+cached document instead of every room's calendar. Each room's part is
+rebuilt from its event index whenever that is rebuilt:
+
+    {"version": 1, "generated": "...",
+     "rooms": {"confa": {
+        "generated": "...", "max_duration": 7200,
+        "entries": [["Faculty Affairs", "FBS-SeminarRoom-L039", "Jane Doe"], ...],
+        "times": [[1736935200, 1736942400, 1737540000, 1737547200], ...],
+        "tokens": ["affairs", "doe", "faculty", ...],
+        "postings": [[0], [0, 4], [0], ...]}}}
+
+An entry is one distinct (summary, location, organizer); `times` holds
+its occurrences as flat start/end pairs (UTC epoch seconds) in start
+order, so recurring events and repeated titles are stored once. `tokens`
+is sorted and `postings[i]` lists the entries containing `tokens[i]`, so
+each query word (matched as a prefix) costs two binary searches per room.
+
+Words are lowercased with accents removed, and mixed-case or alphanumeric
+words are also indexed by their parts (FBS-GreatHall-100 gives fbs,
+greathall, great, hall and 100).
+"""
+
+import bisect
+import logging
+import re
+import unicodedata
+
+from shared_code.storage import load_json_blob, update_json_blob
+
+SEARCH_INDEX_BLOB = 'search-index.json'
+SEARCH_INDEX_VERSION = 1
+
+STOP_WORDS = frozenset(['a', 'an', 'and', 'at', 'for', 'in', 'of', 'on', 'or', 'the', 'to', 'with'])
+
+_WORD = re.compile(r'[^\W_]+')
+_WORD_PARTS = re.compile(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+')
+
+
+def fold(text: str) -> str:
+    """Strip accents (é -> e) so queries need not match them."""
+    return ''.join(char for char in unicodedata.normalize('NFKD', text) if not unicodedata.combining(char))
+
+
+def index_tokens(text: str) -> set:
+    """Tokens to index for a field value."""
+    tokens = set()
+    for word in _WORD.findall(fold(text)):
+        tokens.add(word.lower())
+        for part in _WORD_PARTS.findall(word):
+            tokens.add(part.lower())
+    return {token for token in tokens if token not in STOP_WORDS and (len(token) > 1 or token.isdigit())}
+
+
+def query_terms(query: str) -> list:
+    """The words of a search query, lowercased, without stop words."""
+    terms = [word.lower() for word in _WORD.findall(fold(query))]
+    return [term for term in dict.fromkeys(terms) if term not in STOP_WORDS]
+
+
+def room_postings(index: dict) -> dict:
+    """The search index entry for one room's event index."""
+    fields = index['series_fields']
+    columns = [fields.index(field) for field in ('summary', 'location', 'organizer')]
+
+    entry_ids = {}
+    entries = []
+    times = []
+    for start, end, series_id in index['events']:
+        series = index['series'][series_id]
+        key = tuple(series[column] or '' for column in columns)
+        if key not in entry_ids:
+            entry_ids[key] = len(entries)
+            entries.append(list(key))
+            times.append([])
+        times[entry_ids[key]] += [start, end]
+
+    postings = {}
+    for entry_id, entry in enumerate(entries):
+        for token in index_tokens(' '.join(entry)):
+            postings.setdefault(token, []).append(entry_id)
+    tokens = sorted(postings)
+
+    return {
+        'generated': index['generated'],
+        'max_duration': index.get('max_duration') or max((end - start for start, end, _ in index['events']), default=0),
+        'entries': entries,
+        'times': times,
+        'tokens': tokens,
+        'postings': [postings[token] for token in tokens]
+    }
+
+
+def empty_search_index() -> dict:
+    return {'version': SEARCH_INDEX_VERSION, 'generated': None, 'rooms': {}}
+
+
+def load_search_index(blob_service_client, container_name: str):
+    """Return (search index, etag); no rooms if nothing has been published yet."""
+    return load_json_blob(blob_service_client, container_name, SEARCH_INDEX_BLOB, empty_search_index)
+
+
+def publish_search_index(blob_service_client, container_name: str, indexes: dict, timestamp: str):
+    """
+    Replace the entries of every room in `indexes` ({room_id: event index})
+    in search-index.json, keeping the other rooms' entries.
+
+    Returns True if written. Never raises.
+    """
+    if not indexes:
+        return False
+
+    try:
+        rooms = {room_id: room_postings(index) for room_id, index in indexes.items()}
+    except Exception as e:
+        logging.error(f'Failed to build search postings: {str(e)}')
+        return False
+
+    def replace_rooms(search_index: dict):
+        search_index['version'] = SEARCH_INDEX_VERSION
+        search_index['generated'] = timestamp
+        search_index['rooms'].update(rooms)
+
+    try:
+        update_json_blob(blob_service_client, container_name, SEARCH_INDEX_BLOB, replace_rooms, empty_search_index)
+    except Exception as e:
+        logging.error(f'Failed to publish search index: {str(e)}')
+        return False
+    return True
+
+
+def matching_entries(room: dict, terms: list) -> list:
+    """Entry IDs of a room containing every term (each as a word prefix)."""
+    tokens = room['tokens']
+    matched = None
+    for term in terms:
+        entries = set()
+        position = bisect.bisect_left(tokens, term)
+        while position < len(tokens) and tokens[position].startswith(term):
+            entries.update(room['postings'][position])
+            position += 1
+        matched = entries if matched is None else matched & entries
+        if not matched:
+            return []
+    return sorted(matched)
+
+
+def entry_occurrences(room: dict, entry_id: int, start: int = None, end: int = None) -> list:
+    """(start, end) pairs of one entry overlapping [start, end)."""
+    times = room['times'][entry_id]
+    # Start lists are derived once per decoded (cached) search index
+    if '_starts' not in room:
+        room['_starts'] = [entry_times[0::2] for entry_times in room['times']]
+    starts = room['_starts'][entry_id]
+    lo = 0 if start is None else bisect.bisect_left(starts, start - room['max_duration'])
+    hi = len(starts) if end is None else bisect.bisect_left(starts, end)
+    return [
+        (times[2 * i], times[2 * i + 1])
+        for i in range(lo, hi)
+        if start is None or times[2 * i + 1] > start
+    ]
+
+
+def search(search_index: dict, query: str, room_ids=None, start: int = None, end: int = None, limit: int = 20) -> dict:
+    """
+    Occurrences of events matching every word of `query`, in start order.
+
+    Raises ValueError if the query has no searchable words.
+    """
+    terms = query_terms(query)
+    if not terms:
+        raise ValueError('the query has no searchable words')
+
+    rooms = search_index['rooms']
+    results = []
+    counts = {}
+    for room_id in (room_ids if room_ids is not None else sorted(rooms)):
+        room = rooms.get(room_id)
+        if room is None:
+            continue
+        for entry_id in matching_entries(room, terms):
+            summary, location, organizer = room['entries'][entry_id]
+            for occurrence_start, occurrence_end in entry_occurrences(room, entry_id, start, end):
+                results.append({
+                    'room_id': room_id,
+                    'summary': summary,
+                    'location': location,
+                    'organizer': organizer,
+                    'start': occurrence_start,
+                    'end': occurrence_end
+                })
+                counts[room_id] = counts.get(room_id, 0) + 1
+
+    results.sort(key=lambda result: (result['start'], result['room_id']))
+    return {
+        'terms': terms,
+        'start': start,
+        'end': end,
+        'total': len(results),
+        'more': len(results) > limit,
+        'rooms': counts,
+        'results': results[:limit]
+    }
@@ -0,0 +1,168 @@
+"""
+Blob Storage access shared by the calendar functions.
+
+The BlobServiceClient is created once per worker and reused, and blob reads
+use the properties returned with the download instead of a second
+get_blob_properties() round trip.
+
+azure-storage-blob is imported on first use rather than at module load:
+the Python worker imports every function module when it starts, and the
+SDK is the bulk of that import time. Functions that never touch storage
+(GetUserRoles) or only need it on some requests start faster for it.
+
+The JSON documents several refreshes update together (metrics, change
+logs, room versions, utilization, search index) go through
+update_json_blob(), a conditional read-modify-write.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from shared_code.compression import ENCODINGS, compress_variants
+
+CONTAINER_NAME = 'calendar-cache'
+MAX_WRITE_ATTEMPTS = 3
+
+_client = None
+_client_lock = threading.Lock()
+_ready_containers = set()
+
+
+def get_blob_service_client():
+    """Return the worker-wide BlobServiceClient, or None if storage is not configured."""
+    global _client
+    if _client is None:
+        connection_string = os.environ.get('AzureWebJobsStorage')
+        if not connection_string:
+            return None
+        with _client_lock:
+            if _client is None:
+                from azure.storage.blob import BlobServiceClient
+                _client = BlobServiceClient.from_connection_string(connection_string)
+    return _client
+
+
+def use_blob_service_client(client):
+    """Make `client` the worker-wide client, e.g. a local stand-in for benchmarks."""
+    global _client
+    with _client_lock:
+        _client = client
+        _ready_containers.clear()
+
+
+def ensure_container(blob_service_client, container_name: str = CONTAINER_NAME):
+    """Create the container unless this worker already saw it exist."""
+    from azure.core.exceptions import ResourceExistsError
+
+    if container_name in _ready_containers:
+        return
+    try:
+        blob_service_client.create_container(container_name)
+        logging.info(f'Created container {container_name}')
+    except ResourceExistsError:
+        pass
+    except Exception as e:
+        # Not remembered, so the next run tries again
+        logging.warning(f'Could not create container {container_name}: {str(e)}')
+        return
+    _ready_containers.add(container_name)
+
+
+def content_settings(content_type: str, content_encoding: str = None):
+    """ContentSettings for an upload, importing the SDK on first use."""
+    from azure.storage.blob import ContentSettings
+    return ContentSettings(content_type=content_type, content_encoding=content_encoding)
+
+
+def read_blob(blob_name: str, blob_service_client=None):
+    """Download a blob. Returns (bytes, properties) in a single request."""
+    blob_service_client = blob_service_client or get_blob_service_client()
+    blob_client = blob_service_client.get_blob_client(container=CONTAINER_NAME, blob=blob_name)
+    downloader = blob_client.download_blob()
+    return downloader.readall(), downloader.properties
+
+
+def upload_with_variants(blob_service_client, container_name: str, blob_name: str, data: bytes, content_type: str, metadata: dict, digest: str = None) -> str:
+    """
+    Upload a blob plus its pre-compressed `.gz` / `.br` variants.
+
+    Every copy carries `content_sha256` (of the uncompressed bytes) in its
+    metadata, which GetCalendar turns into a strong ETag. Variants are written
+    first so the uncompressed blob is never newer than its variants; if any
+    upload fails the exception propagates and the next refresh retries.
+    Pass `digest` if the caller already hashed `data`. Returns the content hash.
+    """
+    digest = digest or hashlib.sha256(data).hexdigest()
+    metadata = dict(metadata, content_sha256=digest)
+
+    for encoding, compressed in compress_variants(data).items():
+        blob_service_client.get_blob_client(
+            container=container_name,
+            blob=f'{blob_name}{ENCODINGS[encoding]}'
+        ).upload_blob(
+            compressed,
+            overwrite=True,
+            content_settings=content_settings(content_type, encoding),
+            metadata=metadata
+        )
+
+    blob_service_client.get_blob_client(container=container_name, blob=blob_name).upload_blob(
+        data,
+        overwrite=True,
+        content_settings=content_settings(content_type),
+        metadata=metadata
+    )
+    return digest
+
+
+def load_json_blob(blob_service_client, container_name: str, blob_name: str, default):
+    """Return (document, etag); `default()` and no ETag if the blob does not exist yet."""
+    from azure.core.exceptions import ResourceNotFoundError
+
+    blob_client = blob_service_client.get_blob_client(container=container_name, blob=blob_name)
+    try:
+        downloader = blob_client.download_blob()
+    except ResourceNotFoundError:
+        return default(), None
+    return json.loads(downloader.readall()), downloader.properties.etag
+
+
+def update_json_blob(blob_service_client, container_name: str, blob_name: str, mutate, default, metadata=None):
+    """
+    Read-modify-write a JSON blob that several refreshes may update at once.
+
+    `mutate(document)` changes the loaded document (or `default()`) in
+    place; if it returns False the blob is left as it is. The upload is
+    conditional on the ETag that was read (or on the blob still not
+    existing), and a concurrent write starts the cycle over, at most
+    MAX_WRITE_ATTEMPTS times. `metadata(document)`, if given, returns the
+    blob's metadata.
+
+    Returns the document. Raises if the blob could not be read or written.
+    """
+    from azure.core import MatchConditions
+    from azure.core.exceptions import ResourceExistsError, ResourceModifiedError
+
+    blob_client = blob_service_client.get_blob_client(container=container_name, blob=blob_name)
+    for attempt in range(MAX_WRITE_ATTEMPTS):
+        document, etag = load_json_blob(blob_service_client, container_name, blob_name, default)
+        if mutate(document) is False:
+            return document
+
+        data = json.dumps(document, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        settings = content_settings('application/json')
+        blob_metadata = metadata(document) if metadata else None
+        try:
+            if etag:
+                blob_client.upload_blob(data, overwrite=True, content_settings=settings, metadata=blob_metadata,
+                                        etag=etag, match_condition=MatchConditions.IfNotModified)
+            else:
+                blob_client.upload_blob(data, overwrite=False, content_settings=settings, metadata=blob_metadata)
+            return document
+        except (ResourceModifiedError, ResourceExistsError):
+            if attempt == MAX_WRITE_ATTEMPTS - 1:
+                logging.warning(f'Gave up updating {blob_name} after concurrent updates')
+                raise
@@ -0,0 +1,268 @@
+"""
+Room utilization aggregates for the analytics dashboard.
+
+Each room keeps its booked minutes per local hour, one 24-value array per
+day, in `{room_id}.utilization.json`:
+
+    {"room_id": "confa", "timezone": "America/New_York", "generated": "...",
+     "days": {"2025-01-15": [0, 0, 0, 0, 0, 0, 0, 0, 60, 60, 30, 0, ...], ...}}
+
+Whenever the refresh rebuilds a room's event index, the days the index
+covers are recomputed from its merged busy time (see
+shared_code.availability) and older days are kept as they were, so the
+history keeps growing after events scroll out of the feed and out of the
+index window. Days older than HISTORY_DAYS are dropped.
+
+utilization.json then gets the room's aggregates: for each period in
+PERIODS, the number of completed days per weekday and the booked minutes
+per weekday and hour, plus the booked minutes of every day. Sums of
+minutes and day counts (rather than averages) can be added across rooms,
+so describe() derives occupancy, booked hours per weekday, the hourly
+profile and the weekday x hour heatmap for one room or any set of rooms
+without touching the per-day arrays. GetUtilization serves that document,
+so the dashboard makes one small request whatever the history length.
+
+Hours are local to DEFAULT_TIMEZONE (see shared_code.ics_parser), which
+has whole-hour UTC offsets, so local hours line up with UTC hours.
+
+Settings:
+- UTILIZATION_HISTORY_DAYS: days of history kept per room (default 400)
+- UTILIZATION_FUTURE_DAYS: days of upcoming bookings in the daily series (default 30)
+- UTILIZATION_OPEN_HOURS: local opening hours occupancy is measured against (default 8-18)
+"""
+
+import datetime
+import json
+import logging
+import os
+
+from shared_code.availability import busy_intervals
+from shared_code.ics_parser import DEFAULT_TIMEZONE, get_timezone
+from shared_code.storage import content_settings, load_json_blob, update_json_blob
+
+UTILIZATION_BLOB = 'utilization.json'
+HISTORY_DAYS = int(os.environ.get('UTILIZATION_HISTORY_DAYS', '400'))
+FUTURE_DAYS = int(os.environ.get('UTILIZATION_FUTURE_DAYS', '30'))
+OPEN_HOURS = tuple(int(hour) for hour in os.environ.get('UTILIZATION_OPEN_HOURS', '8-18').split('-'))
+PERIODS = (7, 30, 90, 365)
+# Monday to Friday; occupancy is measured on these days only
+OPEN_WEEKDAYS = range(5)
+
+
+def utilization_blob(room_id: str) -> str:
+    return f'{room_id}.utilization.json'
+
+
+def hourly_minutes(busy: list, zone) -> dict:
+    """{local date: [booked minutes in each local hour]} for merged busy intervals."""
+    days = {}
+    for start, end in busy:
+        hour = start - start % 3600
+        while hour < end:
+            local = datetime.datetime.fromtimestamp(hour, zone)
+            day = days.setdefault(local.date().isoformat(), [0.0] * 24)
+            # On the autumn DST change two UTC hours share one local hour
+            day[local.hour] = min(60.0, day[local.hour] + (min(end, hour + 3600) - max(start, hour)) / 60)
+            hour += 3600
+    return days
+
+
+def index_days(index: dict, today: datetime.date, zone) -> dict:
+    """Booked minutes per hour for every local day the index fully covers, up to FUTURE_DAYS ahead."""
+    first_day = datetime.datetime.fromtimestamp(index['window'][0], zone).date() + datetime.timedelta(days=1)
+    last_day = min(
+        today + datetime.timedelta(days=FUTURE_DAYS),
+        datetime.datetime.fromtimestamp(index['window'][1], zone).date() - datetime.timedelta(days=1)
+    )
+    if last_day < first_day:
+        return {}
+
+    start = int(datetime.datetime.combine(first_day, datetime.time(), zone).timestamp())
+    end = int(datetime.datetime.combine(last_day + datetime.timedelta(days=1), datetime.time(), zone).timestamp())
+    booked = hourly_minutes(busy_intervals(index, start, end), zone)
+
+    days = {}
+    day = first_day
+    while day <= last_day:
+        key = day.isoformat()
+        days[key] = [round(minutes) for minutes in booked.get(key, [0] * 24)]
+        day += datetime.timedelta(days=1)
+    return days
+
+
+def load_room_utilization(blob_service_client, container_name: str, room_id: str):
+    """The room's stored per-day arrays, or None if it has none yet."""
+    from azure.core.exceptions import ResourceNotFoundError
+
+    blob_client = blob_service_client.get_blob_client(container=container_name, blob=utilization_blob(room_id))
+    try:
+        return json.loads(blob_client.download_blob().readall())
+    except ResourceNotFoundError:
+        return None
+
+
+def record_utilization(blob_service_client, container_name: str, room_id: str, index: dict):
+    """
+    Merge a freshly built event index into the room's per-day arrays.
+
+    Returns the stored document, or None if it could not be updated.
+    Never raises; the index itself is already stored.
+    """
+    try:
+        zone = get_timezone()
+        today = datetime.datetime.now(zone).date()
+        previous = load_room_utilization(blob_service_client, container_name, room_id) or {}
+        oldest = (today - datetime.timedelta(days=HISTORY_DAYS)).isoformat()
+
+        days = {day: hours for day, hours in previous.get('days', {}).items() if day >= oldest}
+        days.update(index_days(index, today, zone))
+        document = {
+            'room_id': room_id,
+            'timezone': DEFAULT_TIMEZONE,
+            'generated': index['generated'],
+            'days': dict(sorted(days.items()))
+        }
+        blob_service_client.get_blob_client(container=container_name, blob=utilization_blob(room_id)).upload_blob(
+            json.dumps(document, separators=(',', ':')).encode('utf-8'),
+            overwrite=True,
+            content_settings=content_settings('application/json')
+        )
+        return document
+    except Exception as e:
+        logging.error(f'Failed to update utilization for room {room_id}: {str(e)}')
+        return None
+
+
+def empty_aggregate() -> dict:
+    return {'days': [0] * 7, 'minutes': [[0] * 24 for _ in range(7)]}
+
+
+def add_aggregate(total: dict, aggregate: dict) -> dict:
+    """Add one aggregate's day counts and minutes into `total` (in place) and return it."""
+    for weekday in range(7):
+        total['days'][weekday] += aggregate['days'][weekday]
+        row = total['minutes'][weekday]
+        for hour, minutes in enumerate(aggregate['minutes'][weekday]):
+            row[hour] += minutes
+    return total
+
+
+def room_aggregates(document: dict, today: datetime.date) -> dict:
+    """
+    The utilization.json entry for one room: a summed aggregate per period
+    (completed days only) and the booked minutes of every stored day.
+    """
+    days = document['days']
+    periods = {}
+    for period in PERIODS:
+        aggregate = empty_aggregate()
+        day = today - datetime.timedelta(days=period)
+        while day < today:
+            hours = days.get(day.isoformat())
+            if hours is not None:
+                weekday = day.weekday()
+                aggregate['days'][weekday] += 1
+                row = aggregate['minutes'][weekday]
+                for hour, minutes in enumerate(hours):
+                    row[hour] += minutes
+            day += datetime.timedelta(days=1)
+        periods[str(period)] = aggregate
+
+    # One value per calendar day from the first stored day; None where a day is missing
+    open_start, open_end = OPEN_HOURS
+    first_day = min(days) if days else None
+    daily = {'start': first_day, 'minutes': [], 'open_minutes': []}
+    if first_day:
+        day = datetime.date.fromisoformat(first_day)
+        last_day = datetime.date.fromisoformat(max(days))
+        while day <= last_day:
+            hours = days.get(day.isoformat())
+            daily['minutes'].append(sum(hours) if hours is not None else None)
+            daily['open_minutes'].append(sum(hours[open_start:open_end]) if hours is not None else None)
+            day += datetime.timedelta(days=1)
+
+    return {
+        'updated': document['generated'],
+        'first_day': first_day,
+        'periods': periods,
+        'daily': daily
+    }
+
+
+def empty_utilization() -> dict:
+    return {'generated': None, 'rooms': {}}
+
+
+def load_utilization(blob_service_client, container_name: str):
+    """Return (document, etag); no rooms if nothing has been published yet."""
+    return load_json_blob(blob_service_client, container_name, UTILIZATION_BLOB, empty_utilization)
+
+
+def publish_utilization(blob_service_client, container_name: str, documents: dict, timestamp: str):
+    """
+    Write the aggregates of every room in `documents` ({room_id: per-day
+    document}) into utilization.json, keeping the other rooms' entries.
+
+    Returns True if written. Never raises.
+    """
+    if not documents:
+        return False
+
+    today = datetime.datetime.now(get_timezone()).date()
+    rooms = {room_id: room_aggregates(document, today) for room_id, document in documents.items()}
+
+    def replace_rooms(utilization: dict):
+        utilization.update({
+            'generated': timestamp,
+            'timezone': DEFAULT_TIMEZONE,
+            'open_hours': list(OPEN_HOURS),
+            'periods': list(PERIODS)
+        })
+        utilization['rooms'].update(rooms)
+
+    try:
+        update_json_blob(blob_service_client, container_name, UTILIZATION_BLOB, replace_rooms, empty_utilization)
+    except Exception as e:
+        logging.error(f'Failed to publish utilization: {str(e)}')
+        return False
+    return True
+
+
+def describe(aggregate: dict, open_hours=OPEN_HOURS) -> dict:
+    """
+    Dashboard statistics from a summed aggregate.
+
+    `occupancy` and `hourly` are fractions of the open hours on open
+    weekdays; `heatmap` is the booked fraction of each weekday (Monday
+    first) and hour; `weekday_hours` are total booked hours per weekday.
+    """
+    open_start, open_end = open_hours
+    days = aggregate['days']
+    minutes = aggregate['minutes']
+
+    heatmap = [
+        [round(value / (60 * days[weekday]), 3) if days[weekday] else 0 for value in minutes[weekday]]
+        for weekday in range(7)
+    ]
+    open_days = sum(days[weekday] for weekday in OPEN_WEEKDAYS)
+    hourly = [
+        round(sum(minutes[weekday][hour] for weekday in OPEN_WEEKDAYS) / (60 * open_days), 3) if open_days else 0
+        for hour in range(24)
+    ]
+    open_booked = sum(sum(minutes[weekday][open_start:open_end]) for weekday in OPEN_WEEKDAYS)
+    open_capacity = open_days * (open_end - open_start) * 60
+    weekday_minutes = [sum(row) for row in minutes]
+
+    peak_weekday, peak_hour = max(((weekday, hour) for weekday in range(7) for hour in range(24)),
+                                  key=lambda cell: heatmap[cell[0]][cell[1]])
+    return {
+        'days': sum(days),
+        'booked_hours': round(sum(weekday_minutes) / 60, 1),
+        'occupancy': round(open_booked / open_capacity, 3) if open_capacity else None,
+        'weekday_hours': [round(total / 60, 1) for total in weekday_minutes],
+        'weekday_average_hours': [round(weekday_minutes[weekday] / 60 / days[weekday], 2) if days[weekday] else 0 for weekday in range(7)],
+        'hourly': hourly,
+        'peak_hour': max(range(24), key=lambda hour: hourly[hour]) if any(hourly) else None,
+        'peak': {'weekday': peak_weekday, 'hour': peak_hour, 'occupancy': heatmap[peak_weekday][peak_hour]} if any(weekday_minutes) else None,
+        'heatmap': heatmap
+    }
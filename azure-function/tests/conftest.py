@@ -0,0 +1,28 @@
+"""
+Shared fixtures. Run from azure-function/ with `python -m pytest tests`.
+
+Storage is the in-memory stand-in from benchmarks/blob_standin.py, so the
+tests need azure-core but no storage account.
+"""
+
+import os
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(HERE)), 'benchmarks'))
+os.environ.setdefault('AzureWebJobsStorage', 'UseDevelopmentStorage=true')
+
+CONTAINER = 'calendar-cache'
+
+
+@pytest.fixture
+def blob_service():
+    """An empty in-memory blob service with the calendar container created."""
+    from blob_standin import BlobServiceClient
+
+    client = BlobServiceClient()
+    client.create_container(CONTAINER)
+    return client
@@ -0,0 +1,99 @@
+import datetime
+
+from shared_code.availability import (
+    common_free,
+    find_slots,
+    free_intervals,
+    intersect_intervals,
+    merge_intervals,
+    opening_hours,
+    room_availability,
+)
+from shared_code.ics_parser import SERIES_FIELDS, get_timezone
+
+HOUR = 3600
+
+
+def local(*args) -> int:
+    return int(datetime.datetime(*args, tzinfo=get_timezone()).timestamp())
+
+
+def make_index(*events, window=None) -> dict:
+    """An index of (start, end, status) rows."""
+    return {
+        'window': list(window or (local(2025, 1, 1), local(2025, 2, 1))),
+        'series_fields': SERIES_FIELDS,
+        'series': [['Event', '', '', f'uid-{i}', 0, status, 0] for i, (_, _, status) in enumerate(events)],
+        'max_duration': max((end - start for start, end, _ in events), default=0),
+        'events': [[start, end, i] for i, (start, end, _) in enumerate(events)]
+    }
+
+
+def test_merge_intervals():
+    assert merge_intervals([(5, 8), (1, 3), (2, 4), (4, 5), (10, 12)]) == [[1, 8], [10, 12]]
+    assert merge_intervals([]) == []
+
+
+def test_free_intervals():
+    assert free_intervals([[2, 4], [6, 8]], 0, 10) == [[0, 2], [4, 6], [8, 10]]
+    assert free_intervals([[0, 10]], 2, 8) == []
+    assert free_intervals([], 2, 8) == [[2, 8]]
+
+
+def test_intersect_intervals():
+    assert intersect_intervals([[0, 5], [8, 12]], [[3, 9], [11, 20]]) == [[3, 5], [8, 9], [11, 12]]
+    assert intersect_intervals([[0, 5]], [[5, 9]]) == []
+
+
+def test_opening_hours_are_local():
+    start, end = local(2025, 1, 15), local(2025, 1, 17)
+    assert opening_hours(start, end, 8, 18) == [
+        [local(2025, 1, 15, 8), local(2025, 1, 15, 18)],
+        [local(2025, 1, 16, 8), local(2025, 1, 16, 18)],
+    ]
+
+
+def test_find_slots():
+    free = [[0, HOUR], [2 * HOUR, 2 * HOUR + 1800], [3 * HOUR, 5 * HOUR]]
+    assert find_slots(free, HOUR) == [[0, HOUR], [3 * HOUR, 5 * HOUR]]
+    assert find_slots(free, HOUR, limit=1) == [[0, HOUR]]
+
+
+def test_room_availability_ignores_free_events():
+    day = local(2025, 1, 15)
+    index = make_index((day + 9 * HOUR, day + 10 * HOUR, 'BUSY'), (day + 11 * HOUR, day + 12 * HOUR, 'FREE'))
+    result = room_availability(index, day + 8 * HOUR, day + 13 * HOUR)
+    assert result['busy'] == [[day + 9 * HOUR, day + 10 * HOUR]]
+    assert result['free'] == [[day + 8 * HOUR, day + 9 * HOUR], [day + 10 * HOUR, day + 13 * HOUR]]
+    assert result['free_at_start'] is True
+    assert result['free_all_window'] is False
+
+
+def test_free_all_window_within_opening_hours():
+    day = local(2025, 1, 15)
+    # Busy only before opening; the room is free for all of its opening hours
+    index = make_index((day + 6 * HOUR, day + 7 * HOUR, 'BUSY'))
+    result = room_availability(index, day, day + 24 * HOUR, hours=(8, 18))
+    assert result['free'] == [[day + 8 * HOUR, day + 18 * HOUR]]
+    assert result['free_at_start'] is False
+    assert result['free_all_window'] is True
+
+
+def test_time_outside_index_window_is_unknown():
+    window = (local(2025, 1, 1), local(2025, 1, 15))
+    index = make_index(window=window)
+    result = room_availability(index, local(2025, 1, 14), local(2025, 1, 16))
+    assert result['unknown'] == [[window[1], local(2025, 1, 16)]]
+    assert result['free_all_window'] is False
+
+    result = room_availability(index, local(2025, 2, 1), local(2025, 2, 2))
+    assert result['free_at_start'] is None
+    assert result['unknown'] == [[local(2025, 2, 1), local(2025, 2, 2)]]
+
+
+def test_common_free():
+    day = local(2025, 1, 15)
+    first = room_availability(make_index((day + 9 * HOUR, day + 10 * HOUR, 'BUSY')), day + 8 * HOUR, day + 12 * HOUR)
+    second = room_availability(make_index((day + 11 * HOUR, day + 12 * HOUR, 'BUSY')), day + 8 * HOUR, day + 12 * HOUR)
+    assert common_free([first, second]) == [[day + 8 * HOUR, day + 9 * HOUR], [day + 10 * HOUR, day + 11 * HOUR]]
+    assert common_free([]) == []
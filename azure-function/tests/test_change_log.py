@@ -0,0 +1,100 @@
+from conftest import CONTAINER
+from shared_code.change_log import changes_since, diff_indexes, load_change_log, record_changes
+from shared_code.ics_parser import SERIES_FIELDS
+
+HOUR = 3600
+
+
+def make_index(events, window=(0, 100 * HOUR), fields=SERIES_FIELDS) -> dict:
+    """An index of (start, end, uid, summary) events."""
+    series = {}
+    rows = []
+    for start, end, uid, summary in events:
+        values = {'summary': summary, 'location': '', 'organizer': '', 'uid': uid, 'all_day': 0, 'status': 'BUSY', 'sequence': 0}
+        key = tuple(values[field] for field in fields)
+        series.setdefault(key, len(series))
+        rows.append([start, end, series[key]])
+    return {
+        'version': 1,
+        'room_id': 'confa',
+        'generated': '2025-01-15T12:00:00+00:00',
+        'window': list(window),
+        'series_fields': list(fields),
+        'series': [list(key) for key in series],
+        'events': rows
+    }
+
+
+def summaries(events) -> list:
+    return [(event['uid'], event['start'], event['summary']) for event in events]
+
+
+def test_diff_finds_added_modified_and_removed():
+    old = make_index([(HOUR, 2 * HOUR, 'a', 'Standup'), (3 * HOUR, 4 * HOUR, 'b', 'Review'), (5 * HOUR, 6 * HOUR, 'c', 'Retro')])
+    new = make_index([(HOUR, 2 * HOUR, 'a', 'Standup'), (3 * HOUR, 4 * HOUR, 'b', 'Review (moved online)'), (7 * HOUR, 8 * HOUR, 'd', 'Lunch')])
+    changes = diff_indexes(old, new)
+    assert summaries(changes['added']) == [('d', 7 * HOUR, 'Lunch')]
+    assert summaries(changes['modified']) == [('b', 3 * HOUR, 'Review (moved online)')]
+    assert summaries(changes['removed']) == [('c', 5 * HOUR, 'Retro')]
+
+
+def test_diff_of_identical_indexes_is_empty():
+    events = [(HOUR, 2 * HOUR, 'a', 'Standup')]
+    assert diff_indexes(make_index(events), make_index(events)) == {'added': [], 'modified': [], 'removed': []}
+
+
+def test_moved_event_is_removed_and_added():
+    changes = diff_indexes(make_index([(HOUR, 2 * HOUR, 'a', 'Standup')]), make_index([(3 * HOUR, 4 * HOUR, 'a', 'Standup')]))
+    assert [event['start'] for event in changes['removed']] == [HOUR]
+    assert [event['start'] for event in changes['added']] == [3 * HOUR]
+
+
+def test_changed_end_is_a_modification():
+    changes = diff_indexes(make_index([(HOUR, 2 * HOUR, 'a', 'Standup')]), make_index([(HOUR, 3 * HOUR, 'a', 'Standup')]))
+    assert [event['end'] for event in changes['modified']] == [3 * HOUR]
+
+
+def test_window_movement_is_not_a_change():
+    old = make_index([(HOUR, 2 * HOUR, 'a', 'Old'), (50 * HOUR, 51 * HOUR, 'b', 'Kept')], window=(0, 100 * HOUR))
+    new = make_index([(50 * HOUR, 51 * HOUR, 'b', 'Kept'), (110 * HOUR, 111 * HOUR, 'c', 'New')], window=(10 * HOUR, 120 * HOUR))
+    assert diff_indexes(old, new) == {'added': [], 'modified': [], 'removed': []}
+
+
+def test_new_series_field_is_not_a_change():
+    events = [(HOUR, 2 * HOUR, 'a', 'Standup')]
+    old = make_index(events, fields=[field for field in SERIES_FIELDS if field != 'sequence'])
+    assert diff_indexes(old, make_index(events)) == {'added': [], 'modified': [], 'removed': []}
+
+
+def test_events_without_uid_are_keyed_by_title():
+    old = make_index([(HOUR, 2 * HOUR, '', 'Standup'), (HOUR, 2 * HOUR, '', 'Review')])
+    new = make_index([(HOUR, 2 * HOUR, '', 'Standup')])
+    assert summaries(diff_indexes(old, new)['removed']) == [('', HOUR, 'Review')]
+
+
+def test_record_changes_appends_versions(blob_service):
+    first = make_index([(HOUR, 2 * HOUR, 'a', 'Standup')])
+    second = make_index([(HOUR, 2 * HOUR, 'a', 'Standup'), (3 * HOUR, 4 * HOUR, 'b', 'Review')])
+    assert record_changes(blob_service, CONTAINER, 'confa', first, first, 't0') == (0, 0)
+    assert record_changes(blob_service, CONTAINER, 'confa', first, second, 't1') == (1, 1)
+    assert record_changes(blob_service, CONTAINER, 'confa', second, first, 't2') == (2, 1)
+
+    log, _ = load_change_log(blob_service, CONTAINER, 'confa')
+    assert [entry['version'] for entry in log['entries']] == [1, 2]
+    properties = blob_service.get_blob_client(container=CONTAINER, blob='confa.changes.json').get_blob_properties()
+    assert properties.metadata['version'] == '2'
+
+
+def test_changes_since():
+    log = {'room_id': 'confa', 'version': 5, 'entries': [{'version': version} for version in (3, 4, 5)]}
+    assert [entry['version'] for entry in changes_since(log, 3)['changes']] == [4, 5]
+    assert changes_since(log, 5)['changes'] == []
+    assert changes_since(log, 2)['reset'] is False
+    # Older than the log reaches, or ahead of it
+    assert changes_since(log, 1)['reset'] is True
+    assert changes_since(log, 6)['reset'] is True
+
+    page = changes_since(log, 2, limit=2)
+    assert [entry['version'] for entry in page['changes']] == [3, 4]
+    assert page['more'] is True
+    assert page['version'] == 4
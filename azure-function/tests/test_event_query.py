@@ -0,0 +1,94 @@
+import datetime
+
+import pytest
+
+from shared_code.event_query import parse_time_param, query_index, room_status, window_rows
+from shared_code.ics_parser import SERIES_FIELDS
+
+HOUR = 3600
+
+
+def make_index(*events) -> dict:
+    """An index of (start, end, status) rows, one series each."""
+    return {
+        'version': 1,
+        'room_id': 'confa',
+        'generated': '2025-01-15T12:00:00+00:00',
+        'window': [0, 100 * HOUR],
+        'series_fields': SERIES_FIELDS,
+        'series': [[f'Event {i}', '', '', f'uid-{i}', 0, status, 0] for i, (_, _, status) in enumerate(events)],
+        'max_duration': max(end - start for start, end, _ in events),
+        'events': [[start, end, i] for i, (start, end, _) in enumerate(events)]
+    }
+
+
+@pytest.fixture
+def index():
+    return make_index(
+        (0, 10 * HOUR, 'BUSY'),         # long event starting well before the window
+        (2 * HOUR, 3 * HOUR, 'BUSY'),   # ends before the window
+        (4 * HOUR, 6 * HOUR, 'BUSY'),   # overlaps the window start
+        (5 * HOUR, 5 * HOUR + 1800, 'FREE'),
+        (7 * HOUR, 8 * HOUR, 'BUSY'),   # starts exactly at the window end
+    )
+
+
+def test_window_rows_returns_overlapping_rows(index):
+    assert [row[2] for row in window_rows(index, 5 * HOUR, 7 * HOUR)] == [0, 2, 3]
+
+
+def test_window_rows_is_half_open(index):
+    # An event ending at `start` or starting at `end` does not overlap
+    assert [row[2] for row in window_rows(index, 3 * HOUR, 4 * HOUR)] == [0]
+
+
+def test_window_rows_open_ended(index):
+    assert [row[2] for row in window_rows(index)] == [0, 1, 2, 3, 4]
+    assert [row[2] for row in window_rows(index, start=6 * HOUR)] == [0, 4]
+    assert [row[2] for row in window_rows(index, end=HOUR)] == [0]
+
+
+def test_window_rows_limit(index):
+    assert [row[2] for row in window_rows(index, 0, 10 * HOUR, limit=2)] == [0, 1]
+
+
+def test_window_rows_without_stored_max_duration(index):
+    del index['max_duration']
+    assert [row[2] for row in window_rows(index, 5 * HOUR, 7 * HOUR)] == [0, 2, 3]
+
+
+def test_query_index_renumbers_series(index):
+    result = query_index(index, 7 * HOUR, 9 * HOUR)
+    assert result['events'] == [[0, 10 * HOUR, 0], [7 * HOUR, 8 * HOUR, 1]]
+    assert [series[0] for series in result['series']] == ['Event 0', 'Event 4']
+    assert result['query']['truncated'] is False
+
+
+def test_query_index_truncates(index):
+    result = query_index(index, 0, 10 * HOUR, limit=3)
+    assert len(result['events']) == 3
+    assert result['query']['truncated'] is True
+
+
+def test_room_status_ignores_free_events():
+    index = make_index((HOUR, 2 * HOUR, 'FREE'), (3 * HOUR, 4 * HOUR, 'BUSY'))
+    status = room_status(index, HOUR + 60)
+    assert status['busy'] is False
+    assert status['next']['summary'] == 'Event 1'
+
+    status = room_status(index, 3 * HOUR)
+    assert status['busy'] is True
+    assert status['busy_until'] == 4 * HOUR
+    assert status['next'] is None
+
+
+def test_parse_time_param():
+    assert parse_time_param('1736935200') == 1736935200
+    assert parse_time_param('2025-01-15T10:00:00Z') == 1736935200
+    # Local (Eastern) time without an offset
+    assert parse_time_param('2025-01-15T05:00:00') == 1736935200
+    assert parse_time_param('2025-01-15') == 1736917200
+    now = datetime.datetime.now(datetime.timezone.utc).timestamp()
+    assert abs(parse_time_param('now') - now) < 5
+    with pytest.raises(ValueError):
+        parse_time_param('tomorrow')
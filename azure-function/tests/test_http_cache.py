@@ -0,0 +1,42 @@
+import datetime
+
+from shared_code.http_cache import etag_matches, http_date, is_not_modified, make_etag
+
+CONTENT_HASH = 'ab' * 32
+
+
+def test_make_etag():
+    assert make_etag(CONTENT_HASH) == f'"{"ab" * 16}"'
+    assert make_etag(CONTENT_HASH, 'gzip') == f'"{"ab" * 16}-gzip"'
+    assert make_etag(CONTENT_HASH, weak=True) == f'W/"{"ab" * 16}"'
+
+
+def test_etag_matches_only_the_same_encoding():
+    plain, gzip, br = (make_etag(CONTENT_HASH, encoding) for encoding in (None, 'gzip', 'br'))
+    assert etag_matches(gzip, gzip)
+    assert not etag_matches(plain, gzip)
+    assert not etag_matches(br, gzip)
+    assert not etag_matches(gzip, plain)
+
+
+def test_etag_matches_lists_weak_tags_and_wildcard():
+    etag = make_etag(CONTENT_HASH, 'br')
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches(etag, f'W/{etag}')
+    assert etag_matches('*', etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches('', etag)
+
+
+def test_if_none_match_wins_over_if_modified_since():
+    modified = datetime.datetime(2025, 1, 15, 10, tzinfo=datetime.timezone.utc)
+    headers = {'If-None-Match': '"other"', 'If-Modified-Since': http_date(modified)}
+    assert not is_not_modified(headers, make_etag(CONTENT_HASH), modified)
+
+
+def test_if_modified_since():
+    modified = datetime.datetime(2025, 1, 15, 10, 0, 0, 500000, tzinfo=datetime.timezone.utc)
+    etag = make_etag(CONTENT_HASH)
+    assert is_not_modified({'If-Modified-Since': http_date(modified)}, etag, modified)
+    assert not is_not_modified({'If-Modified-Since': http_date(modified - datetime.timedelta(hours=1))}, etag, modified)
+    assert not is_not_modified({'If-Modified-Since': 'yesterday'}, etag, modified)
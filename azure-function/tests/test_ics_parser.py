@@ -0,0 +1,158 @@
+import datetime
+import re
+
+from shared_code.ics_parser import build_event_index, iter_byte_lines, iter_index_events, parse_duration, unfold_lines
+
+NOW = datetime.datetime(2025, 1, 15, 12, tzinfo=datetime.timezone.utc)
+
+
+def calendar(*vevents: str) -> bytes:
+    body = ''.join(f'BEGIN:VEVENT\n{event.strip()}\nEND:VEVENT\n' for event in vevents)
+    # Drop the source indentation; a folded line keeps the whitespace beyond it
+    body = re.sub(r'\n(?: {8}| {4})', '\n', body)
+    return f'BEGIN:VCALENDAR\nVERSION:2.0\n{body}END:VCALENDAR\n'.replace('\n', '\r\n').encode('utf-8')
+
+
+def events(ics_data) -> list:
+    return list(iter_index_events(build_event_index(ics_data, 'confa', now=NOW)))
+
+
+def utc(*args) -> int:
+    return int(datetime.datetime(*args, tzinfo=datetime.timezone.utc).timestamp())
+
+
+WEEKLY = '''UID:weekly
+    DTSTART;TZID=Eastern Standard Time:20250106T100000
+    DTEND;TZID=Eastern Standard Time:20250106T110000
+    RRULE:FREQ=WEEKLY;COUNT=4
+    SUMMARY:Staff Meeting'''
+
+
+def test_single_event():
+    [event] = events(calendar('''UID:one
+        DTSTART:20250120T150000Z
+        DTEND:20250120T160000Z
+        SUMMARY:Budget Review
+        LOCATION:Conference Room A'''))
+    assert event['start'] == utc(2025, 1, 20, 15)
+    assert event['end'] == utc(2025, 1, 20, 16)
+    assert event['summary'] == 'Budget Review'
+    assert event['location'] == 'Conference Room A'
+    assert event['status'] == 'BUSY'
+    assert event['all_day'] == 0
+
+
+def test_folded_lines_and_escapes():
+    [event] = events(calendar('''UID:folded
+        DTSTART:20250120T150000Z
+        DURATION:PT30M
+        SUMMARY:Faculty Affairs\\, Budget
+          and Planning
+        ORGANIZER;CN="Doe, Jane":mailto:jane@example.com'''))
+    assert event['summary'] == 'Faculty Affairs, Budget and Planning'
+    assert event['organizer'] == 'Doe, Jane'
+    assert event['end'] - event['start'] == 1800
+
+
+def test_unfold_lines_keeps_tabs_and_strips_crlf():
+    assert list(unfold_lines(['SUMMARY:a\r\n', ' b\r\n', '\tc', 'UID:x'])) == ['SUMMARY:abc', 'UID:x']
+
+
+def test_timezone_is_resolved_from_windows_name():
+    # 10:00 Eastern in January is 15:00 UTC
+    first = events(calendar(WEEKLY))[0]
+    assert first['start'] == utc(2025, 1, 6, 15)
+    assert first['end'] == utc(2025, 1, 6, 16)
+
+
+def test_recurrence_keeps_local_time_across_dst():
+    [event] = [event for event in events(calendar('''UID:daily
+        DTSTART;TZID=America/New_York:20250307T090000
+        DTEND;TZID=America/New_York:20250307T100000
+        RRULE:FREQ=DAILY;COUNT=3''')) if event['start'] >= utc(2025, 3, 9)]
+    # 09:00 EDT on 9 March, after that night's switch
+    assert event['start'] == utc(2025, 3, 9, 13)
+
+
+def test_exdate_removes_occurrence():
+    starts = [event['start'] for event in events(calendar(
+        WEEKLY + '\nEXDATE;TZID=Eastern Standard Time:20250113T100000,20250120T100000'))]
+    assert starts == [utc(2025, 1, 6, 15), utc(2025, 1, 27, 15)]
+
+
+def test_recurrence_id_override_replaces_occurrence():
+    result = events(calendar(WEEKLY, '''UID:weekly
+        RECURRENCE-ID;TZID=Eastern Standard Time:20250113T100000
+        DTSTART;TZID=Eastern Standard Time:20250113T140000
+        DTEND;TZID=Eastern Standard Time:20250113T150000
+        SUMMARY:Staff Meeting (moved)'''))
+    assert [event['start'] for event in result] == [utc(2025, 1, 6, 15), utc(2025, 1, 13, 19), utc(2025, 1, 20, 15), utc(2025, 1, 27, 15)]
+    assert result[1]['summary'] == 'Staff Meeting (moved)'
+
+
+def test_cancelled_override_removes_occurrence():
+    result = events(calendar(WEEKLY, '''UID:weekly
+        RECURRENCE-ID;TZID=Eastern Standard Time:20250120T100000
+        DTSTART;TZID=Eastern Standard Time:20250120T100000
+        STATUS:CANCELLED'''))
+    assert utc(2025, 1, 20, 15) not in [event['start'] for event in result]
+    assert len(result) == 3
+
+
+def test_all_day_event_spans_local_day():
+    [event] = events(calendar('''UID:holiday
+        DTSTART;VALUE=DATE:20250120
+        DTEND;VALUE=DATE:20250121
+        SUMMARY:MLK Day
+        TRANSP:TRANSPARENT'''))
+    assert event['all_day'] == 1
+    assert event['start'] == utc(2025, 1, 20, 5)
+    assert event['end'] == utc(2025, 1, 21, 5)
+    assert event['status'] == 'FREE'
+
+
+def test_window_bounds_expansion():
+    index = build_event_index(calendar('''UID:forever
+        DTSTART:20200101T150000Z
+        DTEND:20200101T160000Z
+        RRULE:FREQ=DAILY'''), 'confa', now=NOW)
+    window_start, window_end = index['window']
+    assert index['events']
+    assert all(window_start < end and start < window_end for start, end, _ in index['events'])
+    # One series row, however many occurrences
+    assert len(index['series']) == 1
+
+
+def test_nested_alarm_is_ignored():
+    [event] = events(calendar('''UID:alarm
+        DTSTART:20250120T150000Z
+        DTEND:20250120T160000Z
+        SUMMARY:Review
+        BEGIN:VALARM
+        ACTION:DISPLAY
+        DESCRIPTION:Reminder
+        END:VALARM'''))
+    assert event['summary'] == 'Review'
+
+
+def test_streamed_chunks_match_whole_document():
+    data = calendar(WEEKLY, '''UID:one
+        DTSTART:20250120T150000Z
+        DTEND:20250120T160000Z
+        SUMMARY:Café – Lunch''')
+    # Split inside lines, CRLF pairs and multi-byte characters
+    chunks = [data[i:i + 7] for i in range(0, len(data), 7)]
+    assert build_event_index(iter(chunks), 'confa', now=NOW) == build_event_index(data, 'confa', now=NOW)
+
+
+def test_iter_byte_lines_handles_split_characters():
+    text = 'SUMMARY:Café\r\nUID:x'.encode('utf-8')
+    chunks = [text[:12], text[12:]]
+    assert [line.rstrip('\r') for line in iter_byte_lines(chunks)] == ['SUMMARY:Café', 'UID:x']
+
+
+def test_parse_duration():
+    assert parse_duration('PT1H30M') == datetime.timedelta(hours=1, minutes=30)
+    assert parse_duration('P1W') == datetime.timedelta(weeks=1)
+    assert parse_duration('P1DT2H') == datetime.timedelta(days=1, hours=2)
+    assert parse_duration('-PT15M') == -datetime.timedelta(minutes=15)
@@ -0,0 +1,112 @@
+import datetime
+
+import pytest
+
+from conftest import CONTAINER
+from shared_code import refresh
+from shared_code.change_log import load_change_log
+from shared_code.ics_parser import iter_index_events
+from shared_code.notify import load_versions, publish_updates
+
+
+def feed(summary: str) -> bytes:
+    start = (datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=2)).strftime('%Y%m%dT100000Z')
+    return (
+        'BEGIN:VCALENDAR\r\n'
+        'BEGIN:VEVENT\r\n'
+        'UID:meeting-1\r\n'
+        f'DTSTART:{start}\r\n'
+        'DURATION:PT1H\r\n'
+        f'SUMMARY:{summary}\r\n'
+        'END:VEVENT\r\n'
+        'END:VCALENDAR\r\n'
+    ).encode('utf-8')
+
+
+def fetched(content: bytes, etag: str = None) -> dict:
+    return {
+        'room_id': 'confa', 'url': 'https://example.com/confa.ics', 'ok': True, 'not_modified': False,
+        'content': content, 'sha256': None, 'index': None, 'etag': etag, 'last_modified': None, 'elapsed': 0.1
+    }
+
+
+def store(blob_service, result: dict) -> dict:
+    previous = refresh.load_blob_metadata(blob_service.get_container_client(CONTAINER))
+    now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    return refresh.store_result(blob_service, CONTAINER, result, previous, now, {})
+
+
+def index_summary(blob_service) -> str:
+    index = refresh.load_event_index(blob_service, CONTAINER, 'confa')
+    return next(iter_index_events(index))['summary']
+
+
+def test_first_index_counts_as_changed(blob_service):
+    room = store(blob_service, fetched(feed('Standup')))
+    assert room['status'] == 'updated'
+    assert room['changed'] is True
+    assert room['events'] == 1
+
+
+def test_rewritten_feed_with_same_events_is_not_changed(blob_service):
+    store(blob_service, fetched(feed('Standup')))
+    room = store(blob_service, fetched(feed('Standup') + b'\r\n'))
+    assert room['status'] == 'updated'
+    assert room['changed'] is False
+
+
+def test_changed_events_are_logged(blob_service):
+    store(blob_service, fetched(feed('Standup')))
+    room = store(blob_service, fetched(feed('Retro')))
+    assert room['changed'] is True
+    assert room['changes_version'] == 1
+    assert index_summary(blob_service) == 'Retro'
+
+
+def test_failed_change_log_write_keeps_previous_index(blob_service, monkeypatch):
+    store(blob_service, fetched(feed('Standup')))
+    monkeypatch.setattr(refresh, 'record_changes', lambda *args: (None, 1))
+
+    room = store(blob_service, fetched(feed('Retro')))
+    assert room['status'] == 'updated'
+    assert room['changed'] is True
+    assert 'changes_version' not in room
+    # Not published under the old version, which would tell clients they are current
+    assert index_summary(blob_service) == 'Standup'
+    assert publish_updates(blob_service, CONTAINER, {'confa': room}, '2025-01-01T00:00:00+00:00') == 1
+
+
+def test_next_refresh_logs_the_missed_changes(blob_service, monkeypatch):
+    store(blob_service, fetched(feed('Standup')))
+    with monkeypatch.context() as patch:
+        patch.setattr(refresh, 'record_changes', lambda *args: (None, 1))
+        store(blob_service, fetched(feed('Retro')))
+
+    # Same content again: the .ics is unchanged, but its index still lags
+    room = store(blob_service, fetched(feed('Retro')))
+    assert room['status'] == 'unchanged'
+    assert room['changed'] is True
+    assert room['changes_version'] == 1
+    assert index_summary(blob_service) == 'Retro'
+    log, _ = load_change_log(blob_service, CONTAINER, 'confa')
+    assert log['version'] == 1
+
+    publish_updates(blob_service, CONTAINER, {'confa': room}, '2025-01-01T00:00:00+00:00')
+    versions, _ = load_versions(blob_service, CONTAINER)
+    assert versions['rooms']['confa']['changes_version'] == 1
+
+
+@pytest.mark.parametrize('status', ['unchanged', 'updated'])
+def test_unchanged_events_do_not_bump_versions(blob_service, status):
+    rooms = {'confa': {'status': status, 'changed': False}}
+    assert publish_updates(blob_service, CONTAINER, rooms, '2025-01-01T00:00:00+00:00') is None
+
+
+def test_same_content_saves_new_validators(blob_service):
+    store(blob_service, fetched(feed('Standup'), etag='"v1"'))
+    room = store(blob_service, fetched(feed('Standup'), etag='"v2"'))
+    assert room['status'] == 'unchanged'
+
+    previous = refresh.load_blob_metadata(blob_service.get_container_client(CONTAINER))
+    assert previous['confa.ics']['source_etag'] == '"v2"'
+    assert previous['confa.ics']['content_sha256']
@@ -0,0 +1,65 @@
+import json
+
+import pytest
+from azure.core.exceptions import ResourceModifiedError
+
+from conftest import CONTAINER
+from shared_code.storage import MAX_WRITE_ATTEMPTS, load_json_blob, update_json_blob
+
+
+def counter() -> dict:
+    return {'count': 0}
+
+
+def increment(document: dict):
+    document['count'] += 1
+
+
+def test_update_creates_missing_blob(blob_service):
+    document = update_json_blob(blob_service, CONTAINER, 'counter.json', increment, counter)
+    assert document == {'count': 1}
+    assert load_json_blob(blob_service, CONTAINER, 'counter.json', counter)[0] == {'count': 1}
+
+
+def test_update_retries_after_concurrent_write(blob_service):
+    update_json_blob(blob_service, CONTAINER, 'counter.json', increment, counter)
+    blob_client = blob_service.get_blob_client(container=CONTAINER, blob='counter.json')
+    calls = []
+
+    def increment_racing(document: dict):
+        calls.append(document['count'])
+        if len(calls) == 1:
+            # Another refresh writes between this one's read and write
+            blob_client.upload_blob(json.dumps({'count': 5}).encode('utf-8'), overwrite=True)
+        document['count'] += 1
+
+    assert update_json_blob(blob_service, CONTAINER, 'counter.json', increment_racing, counter) == {'count': 6}
+    assert calls == [1, 5]
+
+
+def test_update_gives_up_after_max_attempts(blob_service):
+    update_json_blob(blob_service, CONTAINER, 'counter.json', increment, counter)
+    blob_client = blob_service.get_blob_client(container=CONTAINER, blob='counter.json')
+    calls = []
+
+    def increment_always_racing(document: dict):
+        calls.append(document['count'])
+        blob_client.upload_blob(json.dumps({'count': 0}).encode('utf-8'), overwrite=True)
+        document['count'] += 1
+
+    with pytest.raises(ResourceModifiedError):
+        update_json_blob(blob_service, CONTAINER, 'counter.json', increment_always_racing, counter)
+    assert len(calls) == MAX_WRITE_ATTEMPTS
+
+
+def test_update_skipped_when_mutate_returns_false(blob_service):
+    document = update_json_blob(blob_service, CONTAINER, 'counter.json', lambda document: False, counter)
+    assert document == {'count': 0}
+    assert load_json_blob(blob_service, CONTAINER, 'counter.json', counter)[1] is None
+
+
+def test_update_sets_metadata(blob_service):
+    update_json_blob(blob_service, CONTAINER, 'counter.json', increment, counter,
+                     metadata=lambda document: {'count': str(document['count'])})
+    properties = blob_service.get_blob_client(container=CONTAINER, blob='counter.json').get_blob_properties()
+    assert properties.metadata == {'count': '1'}
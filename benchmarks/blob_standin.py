@@ -0,0 +1,273 @@
+"""
+In-memory stand-in for the Azure Blob Storage client.
+
+Implements the part of azure-storage-blob the functions use:
+BlobServiceClient.get_blob_client / get_container_client / create_container,
+ContainerClient.list_blobs, and BlobClient.upload_blob / download_blob /
+get_blob_properties / set_blob_metadata / acquire_lease. Conditional reads and writes (ETag with
+MatchConditions), overwrite=False, metadata and leases behave like the real
+service and raise the same azure.core exceptions, so the refresh pipeline,
+the blob cache and the lock run unchanged on top of it.
+
+Every call can be given a simulated round-trip latency, so results are
+closer to a real storage account than a bare dict would be. snapshot() and
+from_snapshot() copy a store into another process (cold_start.py seeds
+each fresh interpreter that way).
+"""
+
+import base64
+import datetime
+import itertools
+import threading
+import time
+import types
+
+from azure.core import MatchConditions
+from azure.core.exceptions import (
+    HttpResponseError,
+    ResourceExistsError,
+    ResourceModifiedError,
+    ResourceNotFoundError,
+    ResourceNotModifiedError,
+)
+
+
+class _Blob:
+    def __init__(self, data: bytes, metadata: dict, content_settings, etag: str):
+        self.data = data
+        self.metadata = dict(metadata or {})
+        self.content_settings = content_settings
+        self.etag = etag
+        self.last_modified = datetime.datetime.now(datetime.timezone.utc)
+        self.lease_id = None
+        self.lease_expires = 0.0
+
+
+class _Downloader:
+    def __init__(self, blob: _Blob):
+        self._data = blob.data
+        self.properties = _properties(blob)
+
+    def readall(self) -> bytes:
+        return self._data
+
+    def chunks(self):
+        return iter([self._data])
+
+
+class _Lease:
+    def __init__(self, store, name: str, lease_id: str, duration: float):
+        self._store = store
+        self._name = name
+        self.id = lease_id
+        self._duration = duration
+
+    def renew(self):
+        with self._store.lock:
+            blob = self._store.blobs.get(self._name)
+            if blob is None or blob.lease_id != self.id:
+                raise _http_error(409, 'LeaseIdMismatchWithLeaseOperation')
+            blob.lease_expires = time.monotonic() + self._duration
+
+    def release(self):
+        with self._store.lock:
+            blob = self._store.blobs.get(self._name)
+            if blob is not None and blob.lease_id == self.id:
+                blob.lease_id = None
+
+
+def _http_error(status_code: int, message: str) -> HttpResponseError:
+    error = HttpResponseError(message=message)
+    error.status_code = status_code
+    return error
+
+
+def _properties(blob: _Blob):
+    leased = blob.lease_id is not None and blob.lease_expires > time.monotonic()
+    return types.SimpleNamespace(
+        etag=blob.etag,
+        last_modified=blob.last_modified,
+        metadata=dict(blob.metadata),
+        size=len(blob.data),
+        content_settings=blob.content_settings,
+        lease=types.SimpleNamespace(state='leased' if leased else 'available')
+    )
+
+
+class _Store:
+    def __init__(self, latency: float):
+        self.blobs = {}
+        self.lock = threading.Lock()
+        self.latency = latency
+        self.operations = 0
+        self._etags = itertools.count(1)
+
+    def round_trip(self):
+        with self.lock:
+            self.operations += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def next_etag(self) -> str:
+        return f'"0x{next(self._etags):016X}"'
+
+
+class BlobClient:
+    def __init__(self, store: _Store, container: str, blob: str):
+        self._store = store
+        self.container_name = container
+        self.blob_name = blob
+        self._key = (container, blob)
+
+    def upload_blob(self, data, overwrite: bool = False, metadata: dict = None, content_settings=None,
+                    etag: str = None, match_condition=None, lease=None, **kwargs):
+        if hasattr(data, 'read'):
+            data = data.read()
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        data = bytes(data)
+        self._store.round_trip()
+        with self._store.lock:
+            blob = self._store.blobs.get(self._key)
+            if blob is not None:
+                if not overwrite:
+                    raise ResourceExistsError('The specified blob already exists.')
+                if match_condition == MatchConditions.IfNotModified and blob.etag != etag:
+                    raise ResourceModifiedError('The condition specified using HTTP conditional header(s) is not met.')
+                if blob.lease_id is not None and blob.lease_expires > time.monotonic():
+                    if lease is None or getattr(lease, 'id', lease) != blob.lease_id:
+                        raise _http_error(412, 'There is currently a lease on the blob and no lease ID was specified.')
+            elif match_condition == MatchConditions.IfNotModified:
+                raise ResourceModifiedError('The condition specified using HTTP conditional header(s) is not met.')
+
+            new_blob = _Blob(data, metadata, content_settings, self._store.next_etag())
+            if blob is not None:
+                new_blob.lease_id, new_blob.lease_expires = blob.lease_id, blob.lease_expires
+            self._store.blobs[self._key] = new_blob
+            return {'etag': new_blob.etag, 'last_modified': new_blob.last_modified}
+
+    def download_blob(self, etag: str = None, match_condition=None, **kwargs):
+        self._store.round_trip()
+        with self._store.lock:
+            blob = self._store.blobs.get(self._key)
+            if blob is None:
+                raise ResourceNotFoundError('The specified blob does not exist.')
+            if match_condition == MatchConditions.IfModified and blob.etag == etag:
+                raise ResourceNotModifiedError('Not modified')
+            if match_condition == MatchConditions.IfNotModified and blob.etag != etag:
+                raise ResourceModifiedError('The condition specified using HTTP conditional header(s) is not met.')
+            return _Downloader(blob)
+
+    def get_blob_properties(self, **kwargs):
+        self._store.round_trip()
+        with self._store.lock:
+            blob = self._store.blobs.get(self._key)
+            if blob is None:
+                raise ResourceNotFoundError('The specified blob does not exist.')
+            return _properties(blob)
+
+    def set_blob_metadata(self, metadata: dict = None, etag: str = None, match_condition=None, **kwargs):
+        self._store.round_trip()
+        with self._store.lock:
+            blob = self._store.blobs.get(self._key)
+            if blob is None:
+                raise ResourceNotFoundError('The specified blob does not exist.')
+            if match_condition == MatchConditions.IfNotModified and blob.etag != etag:
+                raise ResourceModifiedError('The condition specified using HTTP conditional header(s) is not met.')
+            blob.metadata = dict(metadata or {})
+            blob.etag = self._store.next_etag()
+            blob.last_modified = datetime.datetime.now(datetime.timezone.utc)
+            return {'etag': blob.etag, 'last_modified': blob.last_modified}
+
+    def acquire_lease(self, lease_duration: int = -1, **kwargs):
+        self._store.round_trip()
+        with self._store.lock:
+            blob = self._store.blobs.get(self._key)
+            if blob is None:
+                raise ResourceNotFoundError('The specified blob does not exist.')
+            if blob.lease_id is not None and blob.lease_expires > time.monotonic():
+                raise _http_error(409, 'There is already a lease present.')
+            duration = lease_duration if lease_duration > 0 else float('inf')
+            blob.lease_id = f'lease-{self._store.next_etag()}'
+            blob.lease_expires = time.monotonic() + duration
+            return _Lease(self._store, self._key, blob.lease_id, duration)
+
+
+class ContainerClient:
+    def __init__(self, store: _Store, container: str):
+        self._store = store
+        self.container_name = container
+
+    def get_blob_client(self, blob: str) -> BlobClient:
+        return BlobClient(self._store, self.container_name, blob)
+
+    def list_blobs(self, name_starts_with: str = None, include=None, **kwargs):
+        self._store.round_trip()
+        with self._store.lock:
+            blobs = sorted(
+                (name, blob) for (container, name), blob in self._store.blobs.items()
+                if container == self.container_name and (not name_starts_with or name.startswith(name_starts_with))
+            )
+            return [
+                types.SimpleNamespace(
+                    name=name,
+                    size=len(blob.data),
+                    etag=blob.etag,
+                    last_modified=blob.last_modified,
+                    content_settings=blob.content_settings,
+                    metadata=dict(blob.metadata) if include and 'metadata' in include else None
+                )
+                for name, blob in blobs
+            ]
+
+
+class BlobServiceClient:
+    """Drop-in for azure.storage.blob.BlobServiceClient, holding every blob in memory."""
+
+    def __init__(self, latency: float = 0.0):
+        self._store = _Store(latency)
+        self._containers = set()
+
+    @property
+    def operations(self) -> int:
+        """Storage calls made so far."""
+        return self._store.operations
+
+    def create_container(self, name: str):
+        self._store.round_trip()
+        if name in self._containers:
+            raise ResourceExistsError('The specified container already exists.')
+        self._containers.add(name)
+
+    def get_container_client(self, container: str) -> ContainerClient:
+        return ContainerClient(self._store, container)
+
+    def get_blob_client(self, container: str, blob: str) -> BlobClient:
+        return BlobClient(self._store, container, blob)
+
+    def snapshot(self) -> list:
+        """JSON-serializable copy of every blob (data, metadata and content type)."""
+        with self._store.lock:
+            return [
+                {
+                    'container': container,
+                    'name': name,
+                    'data': base64.b64encode(blob.data).decode('ascii'),
+                    'metadata': blob.metadata,
+                    'content_type': getattr(blob.content_settings, 'content_type', None),
+                    'content_encoding': getattr(blob.content_settings, 'content_encoding', None)
+                }
+                for (container, name), blob in self._store.blobs.items()
+            ]
+
+    @classmethod
+    def from_snapshot(cls, blobs: list, latency: float = 0.0) -> 'BlobServiceClient':
+        """A client holding the blobs of an earlier snapshot()."""
+        client = cls(latency=latency)
+        for blob in blobs:
+            settings = types.SimpleNamespace(content_type=blob['content_type'], content_encoding=blob['content_encoding'])
+            client._containers.add(blob['container'])
+            client._store.blobs[(blob['container'], blob['name'])] = _Blob(
+                base64.b64decode(blob['data']), blob['metadata'], settings, client._store.next_etag()
+            )
+        return client
@@ -0,0 +1,203 @@
+"""
+Cold-start report for the function app.
+
+Every function is imported in a fresh interpreter, the way a new worker
+loads it, and then called twice against the blob stand-in. Per function
+this records
+
+- import_ms: importing the function module (after azure.functions)
+- heavy_modules: SDKs that import pulled in (should be empty; see
+  shared_code/__init__.py)
+- first_request_ms / second_request_ms: the first call on the cold worker
+  and the next one, once clients, registries and caches exist
+- first_request_modules: SDKs the first call imported
+
+plus the time to import all function modules in one worker and each SDK on
+its own. With the stand-in, first_request_ms leaves out the storage SDK
+import and connection setup that a real worker pays on its first storage
+call (sdk_import_ms['azure.storage.blob'] covers the import).
+
+Run it through run_benchmarks.py:
+
+    python benchmarks/run_benchmarks.py --only cold_start --output cold-start.json
+
+This module is also the child process each measurement runs in.
+"""
+
+import base64
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+FUNCTION_APP = Path(__file__).resolve().parent.parent / 'azure-function'
+
+# Imports that dominate a worker's startup time if loaded eagerly
+HEAVY_MODULES = ('azure.storage.blob', 'azure.core', 'requests')
+
+PRINCIPAL = base64.b64encode(json.dumps({
+    'userId': 'cold-start',
+    'claims': [{'typ': 'groups', 'val': 'FBS_StaffAll'}]
+}).encode('utf-8')).decode('ascii')
+
+
+class Timer:
+    """Stand-in for func.TimerRequest."""
+    past_due = False
+
+
+def function_names() -> list:
+    return sorted(path.parent.name for path in FUNCTION_APP.glob('*/function.json'))
+
+
+def sample_request(name: str, room_id: str):
+    """(method, params, headers) of a representative request, or None to only time the import."""
+    return {
+        'GetCalendar': ('GET', {'room': room_id}, {'Accept-Encoding': 'gzip'}),
+        'GetCalendars': ('GET', {'rooms': room_id}, {}),
+        'GetAvailability': ('GET', {'rooms': room_id}, {}),
+        'GetChanges': ('GET', {'room': room_id}, {}),
+        'GetUtilization': ('GET', {'rooms': room_id}, {}),
+        'SearchEvents': ('GET', {'q': 'meeting', 'start': '2000-01-01'}, {}),
+        'GetUserRoles': ('GET', {}, {'x-ms-client-principal': PRINCIPAL}),
+        'DebugStatus': ('GET', {}, {}),
+        'WaitForUpdates': ('GET', {'rooms': room_id}, {}),
+        'ManualRefresh': ('POST', {'room': room_id}, {}),
+        'CalendarRefresh': ('TIMER', {}, {})
+    }.get(name)
+
+
+def loaded(before: set) -> list:
+    return [module for module in HEAVY_MODULES if module in sys.modules and module not in before]
+
+
+def child(name: str, room_id: str, snapshot_path: str, storage_latency: float) -> dict:
+    """Measure one function in this (fresh) interpreter."""
+    started = time.perf_counter()
+    import azure.functions as func
+    result = {'runtime_import_ms': round((time.perf_counter() - started) * 1000, 2)}
+
+    sys.path.insert(0, str(FUNCTION_APP))
+    before = set(sys.modules)
+    started = time.perf_counter()
+    import importlib
+    module = importlib.import_module(name)
+    result['import_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    result['heavy_modules'] = loaded(before)
+
+    request = sample_request(name, room_id)
+    if request is None:
+        return result
+
+    # The stand-in itself imports azure.core, so it is set up before the baseline is taken
+    from blob_standin import BlobServiceClient
+    from shared_code.storage import use_blob_service_client
+    with open(snapshot_path, encoding='utf-8') as f:
+        use_blob_service_client(BlobServiceClient.from_snapshot(json.load(f), latency=storage_latency))
+
+    method, params, headers = request
+    before = set(sys.modules)
+    for attempt in ('first', 'second'):
+        if method == 'TIMER':
+            argument = Timer()
+        else:
+            argument = func.HttpRequest(method, f'/api/{name}', params=params, headers=headers, body=b'')
+        started = time.perf_counter()
+        response = module.main(argument)
+        if hasattr(response, '__await__'):
+            import asyncio
+            response = asyncio.run(response)
+        result[f'{attempt}_request_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        result[f'{attempt}_status'] = getattr(response, 'status_code', None)
+        if attempt == 'first':
+            result['first_request_modules'] = loaded(before)
+    return result
+
+
+def worker_child() -> dict:
+    """Import every function module in one interpreter, as a worker does at startup."""
+    started = time.perf_counter()
+    import azure.functions  # noqa: F401
+    import importlib
+    sys.path.insert(0, str(FUNCTION_APP))
+    for name in function_names():
+        importlib.import_module(name)
+    return {'worker_import_ms': round((time.perf_counter() - started) * 1000, 2), 'heavy_modules': loaded(set())}
+
+
+def run_child(*args) -> dict:
+    output = subprocess.run(
+        [sys.executable, __file__, *args],
+        capture_output=True, text=True, check=True, env=os.environ.copy()
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def median_result(runs: list) -> dict:
+    """Median of every timing over repeated runs; other fields from the first run."""
+    result = dict(runs[0])
+    for key, value in runs[0].items():
+        if key.endswith('_ms'):
+            result[key] = round(statistics.median(run[key] for run in runs), 2)
+    return result
+
+
+def sdk_import_ms(module: str) -> float:
+    code = f'import time; started = time.perf_counter(); import {module}; print(json.dumps((time.perf_counter() - started) * 1000))'
+    output = subprocess.run([sys.executable, '-c', 'import json; ' + code], capture_output=True, text=True, check=True).stdout
+    return round(json.loads(output), 2)
+
+
+def bench_cold_start(snapshot: list, room_id: str, storage_latency: float, repeat: int) -> dict:
+    """
+    Run the report. `snapshot` is a blob_standin snapshot of a refreshed
+    store and `room_id` a room in it; ROOM_REGISTRY_PATH must point at a
+    registry whose feeds are being served, for the refresh functions.
+    """
+    import tempfile
+
+    handle, snapshot_path = tempfile.mkstemp(prefix='cold-start-', suffix='.json')
+    with os.fdopen(handle, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f)
+
+    try:
+        functions = {}
+        for name in function_names():
+            runs = [run_child('--function', name, '--room', room_id, '--snapshot', snapshot_path,
+                              '--storage-latency', str(storage_latency)) for _ in range(repeat)]
+            functions[name] = median_result(runs)
+        worker = median_result([run_child('--worker') for _ in range(repeat)])
+    finally:
+        os.unlink(snapshot_path)
+
+    return {
+        'functions': functions,
+        'worker_import_ms': worker['worker_import_ms'],
+        'worker_heavy_modules': worker['heavy_modules'],
+        'sdk_import_ms': {module: sdk_import_ms(module) for module in HEAVY_MODULES}
+    }
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Child process of the cold-start report (see run_benchmarks.py --only cold_start).')
+    parser.add_argument('--function')
+    parser.add_argument('--worker', action='store_true')
+    parser.add_argument('--room')
+    parser.add_argument('--snapshot')
+    parser.add_argument('--storage-latency', type=float, default=0)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = worker_child()
+    else:
+        result = child(args.function, args.room, args.snapshot, args.storage_latency)
+    print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Outlook calendar feeds.
+
+Serves the recorded feeds in `calendars/` (by room ID, e.g. /confa.ics)
+and `ics/` (e.g. /ConfA.ics) like Outlook does: with an ETag and
+Last-Modified, answering conditional requests with 304. Latency and
+failures can be injected, so refresh timings can be measured without the
+real feeds and the circuit breaker can be exercised on purpose.
+
+Run on its own:
+
+    python benchmarks/feed_server.py --port 8765 --latency 150 --jitter 50 --error-rate 0.1
+
+or start it in-process with start_feed_server() (run_benchmarks.py does).
+Bumping `server.revision` changes every feed's body (a trailing
+X-BENCHMARK-REVISION line outside the VCALENDAR), so the next refresh
+sees every room as updated.
+"""
+
+import argparse
+import email.utils
+import hashlib
+import http.server
+import random
+import threading
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+FEED_DIRECTORIES = (REPO_ROOT / 'calendars', REPO_ROOT / 'ics')
+
+
+class FeedServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = 503, directories=FEED_DIRECTORIES):
+        super().__init__(address, FeedHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.revision = 0
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(0)
+        self._files = {}
+        for directory in directories:
+            for path in sorted(Path(directory).glob('*.ics')):
+                self._files.setdefault(path.name, path.read_bytes())
+        self.mtime = time.time()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def feeds(self) -> list:
+        return sorted(self._files)
+
+    def feed(self, name: str):
+        """(body, etag) of a feed at the current revision, or None."""
+        data = self._files.get(name)
+        if data is None:
+            return None
+        if self.revision:
+            data += f'X-BENCHMARK-REVISION:{self.revision}\r\n'.encode('ascii')
+        return data, '"' + hashlib.sha1(data).hexdigest()[:20] + '"'
+
+    def draw(self):
+        """(delay in seconds, whether to fail) for one request."""
+        with self._lock:
+            self.requests += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            fail = self._random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        return delay, fail
+
+
+class FeedHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        delay, fail = server.draw()
+        if delay:
+            time.sleep(delay)
+
+        if fail:
+            self.send_error(server.error_status, 'Injected failure')
+            return
+
+        feed = server.feed(self.path.split('?', 1)[0].lstrip('/'))
+        if feed is None:
+            self.send_error(404, 'Feed not found')
+            return
+        data, etag = feed
+
+        last_modified = email.utils.formatdate(server.mtime + server.revision, usegmt=True)
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/calendar; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', last_modified)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_feed_server(port: int = 0, bind: str = '127.0.0.1', **options) -> FeedServer:
+    """Start a FeedServer on a background thread; port 0 picks a free port."""
+    server = FeedServer((bind, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the recorded calendar feeds with injected latency and errors.')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--bind', default='127.0.0.1')
+    parser.add_argument('--latency', type=float, default=0, help='mean response delay in milliseconds')
+    parser.add_argument('--jitter', type=float, default=0, help='uniform +/- jitter on the delay in milliseconds')
+    parser.add_argument('--error-rate', type=float, default=0, help='fraction of requests that fail (0-1)')
+    parser.add_argument('--error-status', type=int, default=503, help='HTTP status of injected failures')
+    args = parser.parse_args()
+
+    server = FeedServer(
+        (args.bind, args.port),
+        latency=args.latency / 1000,
+        jitter=args.jitter / 1000,
+        error_rate=args.error_rate,
+        error_status=args.error_status
+    )
+    print(f'Serving {len(server.feeds)} feeds on {server.url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Offline benchmarks for the calendar functions.
+
+Runs the real function code against local stand-ins: feed_server.py in
+place of the Outlook feeds and blob_standin.py in place of the storage
+account, so no network access or Azure resources are needed. Measures
+
+- parse: ICS -> event index time per feed and per MB
+- refresh: CalendarRefresh and ManualRefresh end to end, on an empty store,
+  with every feed unchanged (304s), and with every feed changed
+- get_calendar: GetCalendar throughput and latency (p50/p95/p99) with
+  concurrent clients, for raw ICS, the event index, window queries and
+  conditional (304) requests
+- cold_start: per-function import time and first/second request latency,
+  each function in a fresh interpreter (see cold_start.py)
+
+and writes the results to a JSON file for tracking regressions:
+
+    python benchmarks/run_benchmarks.py --output bench-results.json
+    python benchmarks/run_benchmarks.py --feed-latency 200 --feed-error-rate 0.1 --storage-latency 5
+
+Requires the function app's requirements (azure-functions,
+azure-storage-blob, requests, python-dateutil).
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from blob_standin import BlobServiceClient
+from feed_server import FEED_DIRECTORIES, REPO_ROOT, start_feed_server
+
+FUNCTION_APP = REPO_ROOT / 'azure-function'
+
+
+class Timer:
+    """Stand-in for func.TimerRequest."""
+    past_due = False
+
+
+def registry_for(feed_url: str, feeds) -> str:
+    """Write a copy of the room registry whose URLs point at the local feed server; returns its path."""
+    with open(FUNCTION_APP / 'shared_code' / 'rooms.json', encoding='utf-8') as f:
+        registry = json.load(f)
+    registry['rooms'] = [
+        dict(room, url=f'{feed_url}/{room["id"]}.ics')
+        for room in registry['rooms']
+        if f'{room["id"]}.ics' in feeds
+    ]
+    handle, path = tempfile.mkstemp(prefix='rooms-', suffix='.json')
+    with os.fdopen(handle, 'w', encoding='utf-8') as f:
+        json.dump(registry, f)
+    return path
+
+
+def latency_stats(seconds: list) -> dict:
+    from shared_code.metrics import percentile
+    if not seconds:
+        return {}
+    return {
+        'count': len(seconds),
+        'mean_ms': round(sum(seconds) / len(seconds) * 1000, 3),
+        'p50_ms': round(percentile(seconds, 50) * 1000, 3),
+        'p95_ms': round(percentile(seconds, 95) * 1000, 3),
+        'p99_ms': round(percentile(seconds, 99) * 1000, 3),
+        'max_ms': round(max(seconds) * 1000, 3)
+    }
+
+
+def bench_parse(repeat: int) -> dict:
+    from shared_code.ics_parser import build_event_index
+
+    files = {}
+    total_bytes = 0
+    total_seconds = 0.0
+    for directory in FEED_DIRECTORIES:
+        for path in sorted(Path(directory).glob('*.ics')):
+            data = path.read_bytes()
+            runs = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                index = build_event_index(data, path.stem)
+                runs.append(time.perf_counter() - started)
+            best = min(runs)
+            files[f'{directory.name}/{path.name}'] = {
+                'bytes': len(data),
+                'events': len(index['events']),
+                'best_s': round(best, 5),
+                'median_s': round(sorted(runs)[len(runs) // 2], 5)
+            }
+            total_bytes += len(data)
+            total_seconds += best
+
+    megabytes = total_bytes / (1024 * 1024)
+    return {
+        'files': files,
+        'total_bytes': total_bytes,
+        'total_s': round(total_seconds, 4),
+        's_per_mb': round(total_seconds / megabytes, 4) if megabytes else None,
+        'mb_per_s': round(megabytes / total_seconds, 3) if total_seconds else None
+    }
+
+
+def run_refresh_scenario(name: str, run, storage: BlobServiceClient, feeds, summaries: list) -> dict:
+    """Time one refresh; `summaries` collects what run_refresh returned (nothing if the timer found no room due)."""
+    operations = storage.operations
+    requests = feeds.requests
+    summaries.clear()
+    started = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - started
+
+    summary = summaries[-1] if summaries else {}
+    result = {
+        'wall_s': round(elapsed, 4),
+        'summary_duration_s': summary.get('duration'),
+        'feed_requests': feeds.requests - requests,
+        'storage_operations': storage.operations - operations
+    }
+    for status in ('updated', 'unchanged', 'failed', 'skipped', 'deferred'):
+        result[status] = summary.get(status, 0)
+    logging.warning(f'refresh/{name}: {result["wall_s"]}s ({result["updated"]} updated, {result["unchanged"]} unchanged, {result["failed"]} failed)')
+    return result
+
+
+def bench_refresh(feeds, storage_latency: float) -> dict:
+    import azure.functions as func
+    import CalendarRefresh
+    import ManualRefresh
+    from shared_code.blob_cache import blob_cache
+    from shared_code.storage import use_blob_service_client
+
+    def manual():
+        response = ManualRefresh.main(func.HttpRequest('POST', '/api/ManualRefresh', params={}, body=b''))
+        assert response.status_code == 200, response.get_body()
+
+    def timer():
+        CalendarRefresh.main(Timer())
+
+    # The functions do not return the summary, and it is not rewritten on every run
+    summaries = []
+    for module in (CalendarRefresh, ManualRefresh):
+        def recording(*args, run_refresh=module.run_refresh, **kwargs):
+            summaries.append(run_refresh(*args, **kwargs))
+            return summaries[-1]
+        module.run_refresh = recording
+
+    results = {}
+
+    # ManualRefresh fetches every room regardless of the schedule
+    storage = BlobServiceClient(latency=storage_latency)
+    use_blob_service_client(storage)
+    results['manual_cold'] = run_refresh_scenario('manual_cold', manual, storage, feeds, summaries)
+    results['manual_unchanged'] = run_refresh_scenario('manual_unchanged', manual, storage, feeds, summaries)
+    feeds.revision += 1
+    results['manual_changed'] = run_refresh_scenario('manual_changed', manual, storage, feeds, summaries)
+
+    # The timer on an empty store finds every room due; on the next run only failed rooms are
+    storage = BlobServiceClient(latency=storage_latency)
+    use_blob_service_client(storage)
+    blob_cache.invalidate()
+    results['timer_cold'] = run_refresh_scenario('timer_cold', timer, storage, feeds, summaries)
+    results['timer_next_run'] = run_refresh_scenario('timer_next_run', timer, storage, feeds, summaries)
+    return results
+
+
+def bench_get_calendar(room_ids, clients: int, requests_per_client: int) -> dict:
+    import azure.functions as func
+    import GetCalendar
+
+    def request(params, headers=None):
+        return func.HttpRequest('GET', '/api/GetCalendar', params=params, headers=headers or {}, body=b'')
+
+    # Prime each room's ETag for the conditional scenario
+    etags = {}
+    for room_id in room_ids:
+        response = GetCalendar.main(request({'room': room_id}, {'Accept-Encoding': 'gzip'}))
+        etags[room_id] = response.headers.get('ETag')
+
+    scenarios = {
+        'ics_gzip': lambda room_id: request({'room': room_id}, {'Accept-Encoding': 'gzip, br'}),
+        'events': lambda room_id: request({'room': room_id, 'format': 'events'}, {'Accept-Encoding': 'gzip, br'}),
+        'window_today': lambda room_id: request({'room': room_id, 'start': 'now', 'end': (datetime.date.today() + datetime.timedelta(days=1)).isoformat()}),
+        'conditional_304': lambda room_id: request({'room': room_id}, {'Accept-Encoding': 'gzip', 'If-None-Match': etags[room_id]})
+    }
+
+    results = {}
+    for name, make_request in scenarios.items():
+        def client(index):
+            samples = []
+            for i in range(requests_per_client):
+                room_id = room_ids[(index + i) % len(room_ids)]
+                req = make_request(room_id)
+                started = time.perf_counter()
+                response = GetCalendar.main(req)
+                samples.append((time.perf_counter() - started, response.status_code, response.headers.get('X-Cache'), len(response.get_body())))
+            return samples
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            samples = [sample for samples in pool.map(client, range(clients)) for sample in samples]
+        elapsed = time.perf_counter() - started
+
+        statuses = {}
+        for _, status, _, _ in samples:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        results[name] = dict(
+            latency_stats([sample[0] for sample in samples]),
+            requests_per_s=round(len(samples) / elapsed, 1),
+            statuses=statuses,
+            cache_hit_ratio=round(sum(1 for sample in samples if sample[2] == 'HIT') / len(samples), 3),
+            mean_response_bytes=round(sum(sample[3] for sample in samples) / len(samples))
+        )
+        logging.warning(f'get_calendar/{name}: {results[name]["requests_per_s"]} req/s, p95 {results[name]["p95_ms"]}ms')
+    return results
+
+
+def bench_cold_start(room_id: str, storage_latency: float, repeat: int) -> dict:
+    import azure.functions as func
+    import ManualRefresh
+    from cold_start import bench_cold_start as run_cold_start
+    from shared_code.storage import use_blob_service_client
+
+    # Each child process starts from a copy of a refreshed store
+    storage = BlobServiceClient()
+    use_blob_service_client(storage)
+    response = ManualRefresh.main(func.HttpRequest('POST', '/api/ManualRefresh', params={}, body=b''))
+    assert response.status_code == 200, response.get_body()
+
+    results = run_cold_start(storage.snapshot(), room_id, storage_latency, repeat)
+    for name, result in results['functions'].items():
+        logging.warning(f'cold_start/{name}: import {result["import_ms"]}ms, first request {result.get("first_request_ms", "-")}ms')
+    logging.warning(f'cold_start: all functions {results["worker_import_ms"]}ms')
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark refresh and GetCalendar against local feed and storage stand-ins.')
+    parser.add_argument('--output', default='bench-results.json', help='JSON file to write the results to')
+    parser.add_argument('--only', choices=['parse', 'refresh', 'get_calendar', 'cold_start'], action='append', help='run only these benchmarks (repeatable)')
+    parser.add_argument('--feed-latency', type=float, default=100, help='mean feed response delay in milliseconds')
+    parser.add_argument('--feed-jitter', type=float, default=50, help='uniform +/- jitter on the feed delay in milliseconds')
+    parser.add_argument('--feed-error-rate', type=float, default=0, help='fraction of feed requests that fail (0-1)')
+    parser.add_argument('--storage-latency', type=float, default=2, help='simulated storage round trip in milliseconds')
+    parser.add_argument('--parse-repeat', type=int, default=5, help='parses per feed file')
+    parser.add_argument('--clients', type=int, default=8, help='concurrent GetCalendar clients')
+    parser.add_argument('--requests', type=int, default=200, help='GetCalendar requests per client and scenario')
+    parser.add_argument('--cold-start-repeat', type=int, default=3, help='fresh interpreters per function for the cold-start report')
+    args = parser.parse_args()
+    selected = set(args.only or ['parse', 'refresh', 'get_calendar', 'cold_start'])
+
+    logging.basicConfig(level=logging.WARNING, format='%(message)s')
+    feeds = start_feed_server(
+        latency=args.feed_latency / 1000,
+        jitter=args.feed_jitter / 1000,
+        error_rate=args.feed_error_rate
+    )
+
+    # Must be set before the function modules read them at import time
+    os.environ['ROOM_REGISTRY_PATH'] = registry_for(feeds.url, feeds.feeds)
+    os.environ.setdefault('AzureWebJobsStorage', 'UseDevelopmentStorage=true')
+    sys.path.insert(0, str(FUNCTION_APP))
+    from shared_code.rooms import room_ids
+
+    results = {
+        'meta': {
+            'time': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'options': vars(args)
+        }
+    }
+
+    if 'parse' in selected:
+        results['parse'] = bench_parse(args.parse_repeat)
+        logging.warning(f'parse: {results["parse"]["s_per_mb"]}s per MB')
+
+    if 'refresh' in selected or 'get_calendar' in selected:
+        results['refresh'] = bench_refresh(feeds, args.storage_latency / 1000)
+        if 'refresh' not in selected:
+            del results['refresh']
+
+    if 'get_calendar' in selected:
+        results['get_calendar'] = bench_get_calendar(room_ids(), args.clients, args.requests)
+
+    if 'cold_start' in selected:
+        results['cold_start'] = bench_cold_start(room_ids()[0], args.storage_latency / 1000, args.cold_start_repeat)
+
+    feeds.shutdown()
+    os.unlink(os.environ['ROOM_REGISTRY_PATH'])
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f'Results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+// Generated by fetch-calendars.py from azure-function/shared_code/rooms.json; do not edit.
+// Loaded after config.js.
+window.DashboardConfig.buildings = [
+    {
+        "name": "Garrett Hall",
+        "id": "garrett",
+        "rooms": [
+            {
+                "name": "Conference Room A L014",
+                "id": "confa",
+                "icsFile": "confa"
+            },
+            {
+                "name": "Great Hall 100",
+                "id": "greathall",
+                "icsFile": "greathall"
+            },
+            {
+                "name": "Seminar Room L039",
+                "id": "seminar",
+                "icsFile": "seminar"
+            },
+            {
+                "name": "Student Lounge 206",
+                "id": "studentlounge206",
+                "icsFile": "studentlounge206"
+            }
+        ]
+    },
+    {
+        "name": "Pavilion X",
+        "id": "pavilionx",
+        "rooms": [
+            {
+                "name": "Pavilion X Upper Garden",
+                "id": "pavx-upper",
+                "icsFile": "pavx-upper"
+            },
+            {
+                "name": "Pavilion X Basement Room 1",
+                "id": "pavx-b1",
+                "icsFile": "pavx-b1"
+            },
+            {
+                "name": "Pavilion X Basement Room 2",
+                "id": "pavx-b2",
+                "icsFile": "pavx-b2"
+            },
+            {
+                "name": "Pavilion X Basement Exhibit",
+                "id": "pavx-exhibit",
+                "icsFile": "pavx-exhibit"
+            }
+        ]
+    }
+];
@@ -8,73 +8,11 @@ window.DashboardConfig = {
 
 
     // Room organization by building/location
-    // Each building can have multiple rooms with their ICS files
-    buildings: [
-        {
-            name: "Garrett Hall",
-            id: "garrett",
-            rooms: [
-                {
-                    name: "Conference Room A L014",
-                    id: "confa",
-                    icsFile: "confa"
-                },
-                {
-                    name: "Great Hall 100",
-                    id: "greathall",
-                    icsFile: "greathall"
-                },
-                {
-                    name: "Seminar Room L039",
-                    id: "seminar",
-                    icsFile: "seminar"
-                },
-                {
-                    name: "Student Lounge 206",
-                    id: "studentlounge206",
-                    icsFile: "studentlounge206"
-                }
-            ]
-        },
-        {
-            name: "Pavilion X",
-            id: "pavilionx",
-            rooms: [
-                {
-                    name: "Pavilion X Upper Garden",
-                    id: "pavx-upper",
-                    icsFile: "pavx-upper"
-                },
-                {
-                    name: "Pavilion X Basement Room 1",
-                    id: "pavx-b1",
-                    icsFile: "pavx-b1"
-                },
-                {
-                    name: "Pavilion X Basement Room 2",
-                    id: "pavx-b2",
-                    icsFile: "pavx-b2"
-                },
-                {
-                    name: "Pavilion X Basement Exhibit",
-                    id: "pavx-exhibit",
-                    icsFile: "pavx-exhibit"
-                }
-            ]
-        }
-        // Future buildings can be added here:
-        // {
-        //     name: "West Complex",
-        //     id: "westcomplex",
-        //     rooms: [
-        //         {
-        //             name: "West Meeting Room 1",
-        //             id: "west-1",
-        //             icsFile: "ics/WestRoom1.ics"
-        //         }
-        //     ]
-        // }
-    ],
+    // Rooms are defined in azure-function/shared_code/rooms.json, which the Azure
+    // Functions and fetch-calendars.py read. fetch-calendars.py generates the list
+    // from it into calendars/rooms.js, which fills this in; load it after this file.
+    // To regenerate it without fetching: python fetch-calendars.py --rooms-only
+    buildings: [],
     
     // External event calendars for contextual information
     eventCalendars: [
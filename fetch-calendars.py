@@ -2,89 +2,268 @@
 """
 Fetch calendar ICS files and save them as static files.
 This script is run by GitHub Actions every 15 minutes.
+
+Each run builds a snapshot of `calendars/`:
+- {room}.ics: the raw feed
+- {room}.events.json: the pre-parsed event index (same layout as GetCalendar?format=events)
+- manifest.json: SHA-256 and size of every file plus per-room content state
+- last-update.json: run summary
+- rooms.js: the dashboard's room list (DashboardConfig.buildings), built
+  from the room registry so config.js does not repeat it; --rooms-only
+  writes just this file
+
+Feeds are fetched concurrently with conditional requests. Every file is
+written to a temporary file and swapped in with os.replace, so a reader
+never sees a half-written file. The manifest is replaced last.
+
+The snapshot is committed by the workflow, so it only changes when a
+calendar does: a feed that differs only in its DTSTAMPs is left alone (see
+content_hash), and the manifest holds no run timestamps or per-run status.
+Validators and the last run's status go to .fetch-state.json, which is not
+committed; the workflow carries it from run to run with actions/cache.
+Without it (a fresh checkout) every feed is simply downloaded in full.
+
+With --compress, missing .gz / .br copies of every file are written at the
+end, for a host that serves pre-compressed files; run it there at deploy
+time or locally. They are not committed (see .gitignore), so the workflow
+does not pass it, and a file's copies are deleted whenever it is rewritten.
 """
 
-import requests
+import argparse
+import hashlib
+import json
 import os
-from datetime import datetime
-
-# Calendar URLs from config.js
-CALENDARS = {
-    'confa': 'https://outlook.office365.com/owa/calendar/4207f27aa0d54d318d660537325a3856@virginia.edu/64228c013c3c425ca3ec6682642a970e8523251041637520167/calendar.ics',
-    'greathall': 'https://outlook.office365.com/owa/calendar/cf706332e50c45009e2b3164e0b68ca0@virginia.edu/6960c19164584f9cbb619329600a490a16019380931273154626/calendar.ics',
-    'seminar': 'https://outlook.office365.com/owa/calendar/4cedc3f0284648fcbee80dd7f6563bab@virginia.edu/211f4d478ee94feb8fe74fa4ed82a0b22636302730039956374/calendar.ics',
-    'studentlounge206': 'https://outlook.office365.com/owa/calendar/bfd63ea7933c4c3d965a632e5d6b703d@virginia.edu/05f41146b7274347a5e374b91f0e7eda6953039659626971784/calendar.ics',
-    'pavx-upper': 'https://outlook.office365.com/owa/calendar/52b9b2d41868473fac5d3e9963512a9b@virginia.edu/311e34fd14384759b006ccf185c1db677813060047149602177/calendar.ics',
-    'pavx-b1': 'https://outlook.office365.com/owa/calendar/fa3ecb9b47824ac0a36733c7212ccc97@virginia.edu/d23afabf93da4fa4b49d2be3ce290f7911116129854936607531/calendar.ics',
-    'pavx-b2': 'https://outlook.office365.com/owa/calendar/3f60cb3359dd40f7943b9de3b062b18d@virginia.edu/1e78265cf5eb44da903745ca3d872e6910017444746788834359/calendar.ics',
-    'pavx-exhibit': 'https://outlook.office365.com/owa/calendar/4df4134c83844cef9d9357180ccfb48c@virginia.edu/e46a84ae5d8842d4b33a842ddc5ff66c11207228220277930183/calendar.ics',
-    'staff-ooo': 'https://www.trumba.com/calendars/staff-ooo.ics'
-}
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+# Rooms and calendar URLs come from the shared room registry used by the Azure Functions
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'azure-function'))
+from shared_code.calendar_fetch import content_hash, fetch_all
+from shared_code.compression import ENCODINGS, compress_variants
+from shared_code.ics_parser import build_event_index, dump_event_index
+from shared_code.rooms import calendars, dashboard_buildings
+
+CALENDARS = dict(calendars())
 
 OUTPUT_DIR = 'calendars'
+MANIFEST_FILE = 'manifest.json'
+ROOMS_SCRIPT = 'rooms.js'
+STATE_FILE = '.fetch-state.json'
 
-def fetch_calendar(room_id, url):
-    """Fetch a calendar and save it to a file."""
-    print(f'Fetching {room_id}...')
+# Per-room fields that change from run to run; kept out of the committed manifest
+VOLATILE_FIELDS = ('status', 'error', 'source_etag', 'source_last_modified')
 
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-        'Accept': 'text/calendar,application/calendar,text/plain,*/*',
-        'Cache-Control': 'no-cache'
-    }
+# Rebuild an unchanged room's event index once a day so its rolling window moves
+INDEX_MAX_AGE = timedelta(days=1)
+
+
+def write_atomic(path, data):
+    """Write bytes to `path` via a temporary file in the same directory and os.replace."""
+    directory = os.path.dirname(path) or '.'
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
 
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def remove_file(name, files):
+    path = os.path.join(OUTPUT_DIR, name)
+    if os.path.exists(path):
+        os.remove(path)
+    files.pop(name, None)
+
+
+def load_json(name, default):
     try:
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
+        with open(os.path.join(OUTPUT_DIR, name), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def load_manifest():
+    """Previous run's manifest merged with its local state, or an empty one."""
+    manifest = load_json(MANIFEST_FILE, {'files': {}, 'rooms': {}})
+    manifest.setdefault('rooms', {})
+    for room_id, room_state in load_json(STATE_FILE, {}).items():
+        manifest['rooms'][room_id] = dict(manifest['rooms'].get(room_id, {}), **room_state)
+    return manifest
+
+
+def write_file(name, data, files):
+    """Write a snapshot file, recording it in `files`. Its pre-compressed copies no longer match and are removed first."""
+    for suffix in ENCODINGS.values():
+        remove_file(f'{name}{suffix}', files)
+    write_atomic(os.path.join(OUTPUT_DIR, name), data)
+    files[name] = {'sha256': sha256(data), 'bytes': len(data)}
+
 
-        if response.text:
-            # Save to file
-            output_file = os.path.join(OUTPUT_DIR, f'{room_id}.ics')
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(response.text)
+def compress_snapshot(files):
+    """Write the missing .gz / .br copies of every snapshot file, recording each in `files`."""
+    for name in [name for name in files if not name.endswith(tuple(ENCODINGS.values()))]:
+        missing = [encoding for encoding, suffix in ENCODINGS.items() if not os.path.exists(os.path.join(OUTPUT_DIR, f'{name}{suffix}'))]
+        if not missing:
+            continue
+        with open(os.path.join(OUTPUT_DIR, name), 'rb') as f:
+            variants = compress_variants(f.read())
+        for encoding in missing:
+            if encoding in variants:
+                output_name = f'{name}{ENCODINGS[encoding]}'
+                write_atomic(os.path.join(OUTPUT_DIR, output_name), variants[encoding])
+                files[output_name] = {'sha256': sha256(variants[encoding]), 'bytes': len(variants[encoding])}
 
-            print(f'[OK] {room_id}: {len(response.text)} bytes')
-            return True
-        else:
-            print(f'[FAIL] {room_id}: Empty response')
-            return False
 
-    except Exception as e:
-        print(f'[FAIL] {room_id}: {str(e)}')
-        return False
+def write_rooms_script():
+    """Write rooms.js, which fills in DashboardConfig.buildings for the dashboard pages."""
+    buildings = json.dumps(dashboard_buildings(), indent=4)
+    script = (
+        '// Generated by fetch-calendars.py from azure-function/shared_code/rooms.json; do not edit.\n'
+        '// Loaded after config.js.\n'
+        f'window.DashboardConfig.buildings = {buildings};\n'
+    )
+    write_atomic(os.path.join(OUTPUT_DIR, ROOMS_SCRIPT), script.encode('utf-8'))
+
+
+def index_is_stale(room_state, digest):
+    if room_state.get('events_source_sha256') != digest or 'events_generated' not in room_state:
+        return True
+    generated = datetime.fromisoformat(room_state['events_generated'])
+    return datetime.now(timezone.utc) - generated > INDEX_MAX_AGE
+
+
+def process_result(result, previous, files, timestamp):
+    """Store one fetch result; returns the room's new manifest entry."""
+    room_id = result['room_id']
+    room_state = dict(previous['rooms'].get(room_id, {}))
+    ics_name = f'{room_id}.ics'
+    ics_path = os.path.join(OUTPUT_DIR, ics_name)
+
+    if not result['ok']:
+        print(f'[FAIL] {room_id}: {result["error"]}')
+        room_state['status'] = 'failed'
+        room_state['error'] = result['error']
+        return room_state
+
+    if result['not_modified']:
+        with open(ics_path, 'rb') as f:
+            data = f.read()
+        digest = content_hash(data)
+    else:
+        data = result['content']
+        digest = result['sha256']
+
+    changed = digest != room_state.get('sha256') or not os.path.exists(ics_path)
+    if changed:
+        write_file(ics_name, data, files)
+        room_state.update(last_changed=timestamp, sha256=digest, bytes=len(data))
+        print(f'[OK] {room_id}: {len(data)} bytes')
+    else:
+        print(f'[OK] {room_id}: unchanged')
+
+    if changed or index_is_stale(room_state, digest):
+        index = build_event_index(data, room_id)
+        write_file(f'{room_id}.events.json', dump_event_index(index).encode('utf-8'), files)
+        room_state['events'] = len(index['events'])
+        room_state['events_generated'] = index['generated']
+        room_state['events_source_sha256'] = digest
+
+    room_state.update({
+        'status': 'updated' if changed else 'unchanged',
+        'source_etag': result['etag'] or '',
+        'source_last_modified': result['last_modified'] or ''
+    })
+    room_state.pop('error', None)
+    return room_state
+
 
 def main():
-    """Fetch all calendars."""
-    print(f'Starting calendar fetch at {datetime.utcnow().isoformat()}')
+    """Fetch all calendars and publish a new snapshot."""
+    parser = argparse.ArgumentParser(description='Fetch the room calendars into calendars/.')
+    parser.add_argument('--compress', action='store_true', help='also write .gz / .br copies of every file')
+    parser.add_argument('--rooms-only', action='store_true', help=f'only write {ROOMS_SCRIPT} from the room registry')
+    args = parser.parse_args()
 
-    # Create output directory if it doesn't exist
     os.makedirs(OUTPUT_DIR, exist_ok=True)
+    write_rooms_script()
+    if args.rooms_only:
+        return
 
-    successful = 0
-    failed = 0
+    timestamp = datetime.now(timezone.utc).isoformat()
+    print(f'Starting calendar fetch at {timestamp}')
 
+    previous = load_manifest()
+    # Pre-compressed copies are not committed, so a fresh checkout lacks them
+    files = {name: entry for name, entry in previous.get('files', {}).items() if os.path.exists(os.path.join(OUTPUT_DIR, name))}
+    previous.setdefault('rooms', {})
+
+    requests_to_send = []
     for room_id, url in CALENDARS.items():
-        if fetch_calendar(room_id, url):
-            successful += 1
-        else:
-            failed += 1
+        room_state = previous['rooms'].get(room_id, {})
+        has_file = os.path.exists(os.path.join(OUTPUT_DIR, f'{room_id}.ics'))
+        validators = {
+            'etag': room_state.get('source_etag') if has_file else None,
+            'last_modified': room_state.get('source_last_modified') if has_file else None
+        }
+        requests_to_send.append((room_id, url, validators))
+
+    rooms = {}
+    for result in fetch_all(requests_to_send):
+        try:
+            rooms[result['room_id']] = process_result(result, previous, files, timestamp)
+        except Exception as e:
+            print(f'[FAIL] {result["room_id"]}: {str(e)}')
+            rooms[result['room_id']] = dict(previous['rooms'].get(result['room_id'], {}), status='failed', error=str(e))
+
+    statuses = [room['status'] for room in rooms.values()]
+    successful = statuses.count('updated') + statuses.count('unchanged')
+    failed = statuses.count('failed')
 
-    print(f'\nCompleted: {successful} successful, {failed} failed')
+    print(f'\nCompleted: {successful} successful ({statuses.count("updated")} updated), {failed} failed')
 
     # Write summary file
     summary = {
-        'last_updated': datetime.utcnow().isoformat(),
+        'last_updated': timestamp,
         'successful': successful,
         'failed': failed,
         'total': len(CALENDARS)
     }
-
-    import json
     summary_file = os.path.join(OUTPUT_DIR, 'last-update.json')
-    with open(summary_file, 'w') as f:
-        json.dump(summary, f, indent=2)
+    write_atomic(summary_file, json.dumps(summary, indent=2).encode('utf-8'))
+
+    if args.compress:
+        compress_snapshot(files)
+
+    state = {
+        room_id: {field: room_state[field] for field in VOLATILE_FIELDS if field in room_state}
+        for room_id, room_state in sorted(rooms.items())
+    }
+    write_atomic(os.path.join(OUTPUT_DIR, STATE_FILE), json.dumps(state, indent=2).encode('utf-8'))
+
+    # The manifest goes last: everything it lists is already in place
+    manifest = {
+        'files': dict(sorted(files.items())),
+        'rooms': {
+            room_id: {field: value for field, value in sorted(room_state.items()) if field not in VOLATILE_FIELDS}
+            for room_id, room_state in sorted(rooms.items())
+        }
+    }
+    write_atomic(os.path.join(OUTPUT_DIR, MANIFEST_FILE), json.dumps(manifest, indent=2).encode('utf-8'))
 
     print(f'Summary written to {summary_file}')
 
+
 if __name__ == '__main__':
     main()
@@ -2,64 +2,293 @@
 """
 Simple HTTP server for the Room Booking Dashboard
 Serves files locally to avoid CORS issues
+
+Requests are handled on separate threads, so one slow download does not
+block other clients. Files are kept in an in-memory cache that is
+invalidated when their mtime or size changes, and responses support
+ETag / Last-Modified (304), gzip and byte Range requests. The gzip
+response has its own ETag (suffixed -gzip), and ranges are only served
+from the uncompressed file.
 """
 
+import argparse
+import email.utils
+import gzip
+import hashlib
 import http.server
-import socketserver
-import webbrowser
 import os
 import sys
+import threading
+import webbrowser
+from collections import OrderedDict
 from pathlib import Path
 
 # Configuration
 PORT = 8000
 DIRECTORY = Path(__file__).parent
 
+# Files larger than this are streamed from disk instead of cached
+MAX_CACHED_FILE_SIZE = 8 * 1024 * 1024
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+
+# Smaller bodies are not worth compressing
+MIN_GZIP_SIZE = 1024
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'image/svg+xml')
+
+
+class FileCache:
+    """Thread-safe LRU of file contents keyed by path and validated by mtime and size."""
+
+    def __init__(self, max_bytes=MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path, stat):
+        """Return the cached entry for `path`, (re)loading it if the file changed."""
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+                self._entries.move_to_end(path)
+                return entry
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        entry = {
+            'mtime_ns': stat.st_mtime_ns,
+            'size': len(data),
+            'data': data,
+            'gzip': None,
+            'etag': '"' + hashlib.sha1(data).hexdigest()[:20] + '"',
+            'last_modified': email.utils.formatdate(stat.st_mtime, usegmt=True)
+        }
+
+        with self._lock:
+            old = self._entries.pop(path, None)
+            if old:
+                self.total_bytes -= old['size'] + len(old['gzip'] or b'')
+            self._entries[path] = entry
+            self.total_bytes += entry['size']
+            while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= evicted['size'] + len(evicted['gzip'] or b'')
+        return entry
+
+    def gzipped(self, entry):
+        """gzip the entry's data once and keep the result."""
+        if entry['gzip'] is None:
+            compressed = gzip.compress(entry['data'], compresslevel=6, mtime=0)
+            with self._lock:
+                if entry['gzip'] is None:
+                    entry['gzip'] = compressed
+                    self.total_bytes += len(compressed)
+        return entry['gzip']
+
+
+file_cache = FileCache()
+
+
+def parse_range(header, size):
+    """
+    Parse a single `bytes=` range. Returns (start, end) inclusive, None if the
+    header should be ignored, or 'invalid' if it cannot be satisfied.
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    first, _, last = header[len('bytes='):].strip().partition('-')
+    try:
+        if first == '':
+            length = int(last)
+            if length <= 0:
+                return 'invalid'
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        return 'invalid'
+    return start, min(end, size - 1)
+
+
+def accepts_gzip(header):
+    """Whether an Accept-Encoding header allows gzip, honouring q-values (gzip;q=0 refuses it)."""
+    qualities = {}
+    for item in (header or '').split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    for coding in ('gzip', 'x-gzip', '*'):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
+
+
+def gzip_etag(etag):
+    return etag[:-1] + '-gzip"'
+
+
 class CORSRequestHandler(http.server.SimpleHTTPRequestHandler):
     """HTTP request handler with CORS headers"""
-    
+
+    protocol_version = 'HTTP/1.1'
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, directory=DIRECTORY, **kwargs)
-    
+
     def end_headers(self):
         """Add CORS headers to all responses"""
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
         super().end_headers()
-    
+
     def do_OPTIONS(self):
         """Handle preflight CORS requests"""
         self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        self.serve_file(send_body=True)
+
+    def do_HEAD(self):
+        self.serve_file(send_body=False)
+
+    def serve_file(self, send_body):
+        """Serve a regular file from the cache; directories and large files use the default handler."""
+        path = self.translate_path(self.path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stat = None
+
+        if stat is None or not os.path.isfile(path) or stat.st_size > MAX_CACHED_FILE_SIZE:
+            return super().do_GET() if send_body else super().do_HEAD()
+
+        try:
+            entry = file_cache.get(path, stat)
+        except OSError:
+            self.send_error(404, 'File not found')
+            return
+
+        content_type = self.guess_type(path)
+
+        # Ranges are served from the uncompressed bytes only
+        use_gzip = (entry['size'] >= MIN_GZIP_SIZE
+                    and content_type.startswith(COMPRESSIBLE_TYPES)
+                    and not self.headers.get('Range')
+                    and accepts_gzip(self.headers.get('Accept-Encoding')))
+        etag = gzip_etag(entry['etag']) if use_gzip else entry['etag']
+
+        # Conditional requests: If-None-Match wins over If-Modified-Since
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match:
+            not_modified = etag in [tag.strip().replace('W/', '') for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+        else:
+            not_modified = self.headers.get('If-Modified-Since') == entry['last_modified']
+        if not_modified:
+            self.send_response(304)
+            self.send_validators(entry, etag)
+            self.end_headers()
+            return
+
+        body = entry['data']
+        status = 200
+        extra_headers = {}
+
+        byte_range = None
+        if_range = self.headers.get('If-Range')
+        if not if_range or if_range in (entry['etag'], entry['last_modified']):
+            byte_range = parse_range(self.headers.get('Range'), len(body))
+
+        if byte_range == 'invalid':
+            self.send_response(416)
+            self.send_header('Content-Range', f'bytes */{len(body)}')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        if byte_range:
+            start, end = byte_range
+            body = body[start:end + 1]
+            status = 206
+            extra_headers['Content-Range'] = f'bytes {start}-{end}/{entry["size"]}'
+        elif use_gzip:
+            body = file_cache.gzipped(entry)
+            extra_headers['Content-Encoding'] = 'gzip'
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_validators(entry, etag)
+        for name, value in extra_headers.items():
+            self.send_header(name, value)
         self.end_headers()
 
+        if send_body:
+            self.wfile.write(body)
+
+    def send_validators(self, entry, etag):
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', entry['last_modified'])
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Vary', 'Accept-Encoding')
+
+
+class DashboardServer(http.server.ThreadingHTTPServer):
+    """Threaded server: each connection gets its own thread"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+
 def main():
     """Start the local server"""
+    parser = argparse.ArgumentParser(description='Room Booking Dashboard server')
+    parser.add_argument('--port', type=int, default=PORT, help=f'port to listen on (default {PORT})')
+    parser.add_argument('--bind', default='', help='address to bind (default: all interfaces)')
+    parser.add_argument('--no-browser', action='store_true', help='do not open the dashboard in a browser')
+    args = parser.parse_args()
+    port = args.port
+
     os.chdir(DIRECTORY)
-    
-    with socketserver.TCPServer(("", PORT), CORSRequestHandler) as httpd:
+
+    with DashboardServer((args.bind, port), CORSRequestHandler) as httpd:
         print(f"🚀 Room Booking Dashboard Server")
         print(f"📂 Serving directory: {DIRECTORY}")
-        print(f"🌐 Server running at: http://localhost:{PORT}")
+        print(f"🌐 Server running at: http://localhost:{port}")
         print(f"")
         print(f"📋 Available pages:")
-        print(f"   • Main Dashboard: http://localhost:{PORT}/dashboard.html")
-        print(f"   • Advanced Dashboard: http://localhost:{PORT}/room-dashboard.html")
-        print(f"   • Simple Dashboard: http://localhost:{PORT}/simple-dashboard.html")
-        print(f"   • Basic View: http://localhost:{PORT}/index.html")
+        print(f"   • Main Dashboard: http://localhost:{port}/dashboard.html")
+        print(f"   • Advanced Dashboard: http://localhost:{port}/room-dashboard.html")
+        print(f"   • Simple Dashboard: http://localhost:{port}/simple-dashboard.html")
+        print(f"   • Basic View: http://localhost:{port}/index.html")
         print(f"")
         print(f"💡 Tip: Use Ctrl+C to stop the server")
         print(f"")
-        
+
         # Try to open the main dashboard in browser
-        try:
-            webbrowser.open(f'http://localhost:{PORT}/dashboard.html')
-            print(f"🌐 Opened dashboard in your default browser")
-        except:
-            print(f"⚠️  Could not auto-open browser. Please visit the URL manually.")
-        
+        if not args.no_browser:
+            try:
+                webbrowser.open(f'http://localhost:{port}/dashboard.html')
+                print(f"🌐 Opened dashboard in your default browser")
+            except:
+                print(f"⚠️  Could not auto-open browser. Please visit the URL manually.")
+
         print(f"")
-        
+
         try:
             httpd.serve_forever()
         except KeyboardInterrupt: